@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_indexes(using, **kwargs):
+    from django.db import connections
+    from .search import install_search_indexes
+    install_search_indexes(connections[using])
 
 
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from . import signals
+        signals.connect()
+        post_migrate.connect(ensure_search_indexes, sender=self)
+        from .search import check_fts_tables
+        connection_created.connect(check_fts_tables, dispatch_uid='check_fts_tables')
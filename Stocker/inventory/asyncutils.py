@@ -0,0 +1,12 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+
+# Templates may touch the session, request.user and lazy querysets, all of
+# which need the sync thread; render there instead of on the event loop.
+arender = sync_to_async(render)
+
+
+async def alist(queryset):
+    """Evaluate ``queryset`` with the async ORM."""
+    return [obj async for obj in queryset]
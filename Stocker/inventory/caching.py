@@ -0,0 +1,106 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .routers import reading_from_replica, replica_max_lag
+
+
+LOCK_TIMEOUT = 30
+
+
+def _version_key(name:str):
+    return f'inventory:version:{name}'
+
+
+def get_versions(*names:str):
+    """Current version counter for each name, e.g. ``get_versions('product', 'category')``."""
+    keys = [_version_key(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Start from the clock so an evicted counter never repeats an old value.
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+async def aget_versions(*names:str):
+    keys = [_version_key(name) for name in names]
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            found[key] = await cache.aget(key)
+    return tuple(found[key] for key in keys)
+
+
+def _bump(names):
+    for name in names:
+        key = _version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_versions(*names:str):
+    """Invalidate everything cached against ``names``.
+
+    Bumps now and again on commit, so a reader that fills the cache from
+    pre-commit data is invalidated as well.
+    """
+    _bump(names)
+    transaction.on_commit(lambda: _bump(names))
+
+
+def _timeout(timeout:int):
+    # A replica may not have the write behind the latest version bump yet,
+    # so don't keep what was read from it longer than it may lag.
+    return min(timeout, replica_max_lag()) if reading_from_replica() else timeout
+
+
+def cached_for_versions(key:str, names, compute, timeout:int):
+    """Return ``compute()`` cached under ``key`` until any of ``names`` is bumped.
+
+    When the entry is stale only one caller recomputes; everyone else keeps
+    getting the stale value until it is replaced.
+    """
+    versions = get_versions(*names)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == versions:
+        return entry[1]
+
+    lock = f'{key}:lock'
+    # With no entry to fall back on every caller computes, but only the
+    # lock's owner may release it.
+    locked = entry is not None and cache.add(lock, 1, timeout=LOCK_TIMEOUT)
+    if entry is not None and not locked:
+        return entry[1]
+    try:
+        value = compute()
+        cache.set(key, (versions, value), _timeout(timeout))
+    finally:
+        if locked:
+            cache.delete(lock)
+    return value
+
+
+async def acached_for_versions(key:str, names, acompute, timeout:int):
+    """``cached_for_versions`` for async views; ``acompute`` is a coroutine function."""
+    versions = await aget_versions(*names)
+    entry = await cache.aget(key)
+    if entry is not None and entry[0] == versions:
+        return entry[1]
+
+    lock = f'{key}:lock'
+    locked = entry is not None and await cache.aadd(lock, 1, timeout=LOCK_TIMEOUT)
+    if entry is not None and not locked:
+        return entry[1]
+    try:
+        value = await acompute()
+        await cache.aset(key, (versions, value), _timeout(timeout))
+    finally:
+        if locked:
+            await cache.adelete(lock)
+    return value
@@ -1,6 +1,6 @@
 from django.http import HttpRequest
 
+from .roles import has_group
+
 def is_admin_processor(request:HttpRequest):
-    if request.user.is_authenticated:
-        return {'is_admin': request.user.groups.filter(name='Admin').exists()}
-    return {'is_admin': False}
\ No newline at end of file
+    return {'is_admin': has_group(request, 'Admin')}
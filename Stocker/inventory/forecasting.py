@@ -0,0 +1,102 @@
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Min, Sum
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: the pure Python path gives the same numbers, just slower.
+    np = None
+
+from .models import DailyMovementRollup, Product, ReorderForecast
+
+
+WINDOW_DAYS = 90
+LEAD_TIME_DAYS = 7
+COVER_DAYS = 30
+# One-sided z-score for a ~95% chance of not stocking out during the lead time.
+SERVICE_Z = 1.65
+
+
+def demand_stats(window_days:int=WINDOW_DAYS, today=None):
+    """Per-product ``(ids, stock, consumed, squares, observed_days)`` over the window.
+
+    Read from the daily movement rollups with one ``GROUP BY``, so a year of
+    ledger rows per product never reaches Python.
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=window_days - 1)
+    stats = {
+        row['product_id']: row
+        for row in DailyMovementRollup.objects.filter(period_start__gte=start, period_start__lte=today)
+        .values('product_id').order_by()
+        .annotate(consumed=Sum('quantity_out'), squares=Sum(F('quantity_out') * F('quantity_out')), first=Min('period_start'))
+    }
+    ids, stock, consumed, squares, observed = [], [], [], [], []
+    for product_id, quantity in Product.objects.order_by('pk').values_list('pk', 'quantity_in_stock').iterator(chunk_size=5000):
+        row = stats.get(product_id)
+        ids.append(product_id)
+        stock.append(quantity)
+        consumed.append(row['consumed'] if row else 0)
+        squares.append(row['squares'] if row else 0)
+        # Products that started moving inside the window are averaged over the days they were around.
+        observed.append((today - row['first']).days + 1 if row else window_days)
+    return ids, stock, consumed, squares, observed
+
+
+def _forecast_numpy(stock, consumed, squares, observed, lead_time, cover):
+    stock, consumed, squares, observed = (np.asarray(a, dtype=float) for a in (stock, consumed, squares, observed))
+    velocity = consumed / observed
+    stddev = np.sqrt(np.maximum(squares / observed - velocity ** 2, 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.where(velocity > 0, stock / velocity, np.nan)
+    reorder_point = np.ceil(velocity * lead_time + SERVICE_Z * stddev * math.sqrt(lead_time))
+    suggested = np.maximum(np.ceil(velocity * cover + reorder_point - stock), 0)
+    return zip(
+        velocity.tolist(), stddev.tolist(),
+        [None if math.isnan(d) else d for d in days_left.tolist()],
+        reorder_point.astype(int).tolist(), suggested.astype(int).tolist(),
+    )
+
+
+def _forecast_python(stock, consumed, squares, observed, lead_time, cover):
+    for quantity, used, square, days in zip(stock, consumed, squares, observed):
+        velocity = used / days
+        stddev = math.sqrt(max(square / days - velocity ** 2, 0))
+        reorder_point = math.ceil(velocity * lead_time + SERVICE_Z * stddev * math.sqrt(lead_time))
+        suggested = max(math.ceil(velocity * cover + reorder_point - quantity), 0)
+        yield velocity, stddev, quantity / velocity if velocity > 0 else None, reorder_point, suggested
+
+
+def compute_forecasts(window_days:int=WINDOW_DAYS, lead_time:int=LEAD_TIME_DAYS, cover:int=COVER_DAYS, today=None):
+    """Yield ``ReorderForecast`` rows for every product.
+
+    Velocity is average daily consumption over the window. The reorder point
+    covers the lead time plus safety stock for demand variance. The suggested
+    order brings stock up to ``cover`` days beyond the reorder point.
+    """
+    ids, *columns = demand_stats(window_days, today)
+    forecast = _forecast_numpy if np is not None else _forecast_python
+    computed_at = timezone.now()
+    for product_id, (velocity, stddev, days_left, reorder_point, suggested) in zip(ids, forecast(*columns, lead_time, cover)):
+        yield ReorderForecast(
+            product_id=product_id,
+            daily_velocity=velocity,
+            demand_stddev=stddev,
+            days_to_stockout=days_left,
+            reorder_point=reorder_point,
+            suggested_quantity=suggested,
+            computed_at=computed_at,
+        )
+
+
+def refresh_forecasts(**options):
+    """Replace the forecast table; returns the number of products forecast."""
+    forecasts = list(compute_forecasts(**options))
+    with transaction.atomic():
+        ReorderForecast.objects.all().delete()
+        ReorderForecast.objects.bulk_create(forecasts, batch_size=2000)
+    return len(forecasts)
@@ -5,13 +5,24 @@ from .models import Product, Category, Supplier
 class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['inherits_reorder_level']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['reorder_level'].required = False
+        self.fields['reorder_level'].help_text = "Leave blank to use the category's reorder level."
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # A blank level means the product follows its category.
+        self.instance.set_reorder_level(cleaned_data.get('reorder_level'))
+        return cleaned_data
 
 
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
-        fields = ['name']
+        fields = ['name', 'reorder_level']
 
 
 class SupplierForm(forms.ModelForm):
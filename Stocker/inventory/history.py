@@ -0,0 +1,151 @@
+from datetime import timedelta
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import F, Sum, Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+PERIODS = ('day', 'week')
+HISTORY_BATCH_SIZE = 1000
+
+
+def period_starts(timestamp):
+    """The local day of ``timestamp`` and the Monday of its week."""
+    day = timezone.localdate(timestamp)
+    return day, day - timedelta(days=day.weekday())
+
+
+def _models(apps):
+    return apps.get_model('inventory', 'DailyMovementRollup'), apps.get_model('inventory', 'WeeklyMovementRollup')
+
+
+def rollup_model(period:str):
+    return dict(zip(PERIODS, _models(global_apps)))[period]
+
+
+def _apply(model, buckets:dict):
+    if not buckets:
+        return
+    existing = {
+        (row.product_id, row.period_start): row
+        for row in model.objects.filter(
+            product_id__in={key[0] for key in buckets},
+            period_start__in={key[1] for key in buckets},
+        )
+    }
+    created, updated = [], []
+    for (product_id, start), (quantity_in, quantity_out, movements, closing) in buckets.items():
+        row = existing.get((product_id, start))
+        if row is None:
+            created.append(model(
+                product_id=product_id, period_start=start, quantity_in=quantity_in,
+                quantity_out=quantity_out, movements=movements, closing_quantity=closing,
+            ))
+        else:
+            row.quantity_in = F('quantity_in') + quantity_in
+            row.quantity_out = F('quantity_out') + quantity_out
+            row.movements = F('movements') + movements
+            row.closing_quantity = closing
+            updated.append(row)
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(updated, ['quantity_in', 'quantity_out', 'movements', 'closing_quantity'])
+
+
+def record_movements(movements):
+    """Fold ledger rows of ``(product_id, quantity_change, closing_quantity, timestamp)``
+    into the daily and weekly rollups.
+
+    Call inside the transaction that writes the ledger, while the products'
+    rows are locked, so concurrent writers can't race on the same bucket.
+    """
+    daily, weekly = {}, {}
+    for product_id, quantity_change, closing, timestamp in movements:
+        for buckets, start in zip((daily, weekly), period_starts(timestamp)):
+            bucket = buckets.setdefault((product_id, start), [0, 0, 0, closing])
+            bucket[0] += max(quantity_change, 0)
+            bucket[1] += max(-quantity_change, 0)
+            bucket[2] += 1
+            bucket[3] = closing
+    Daily, Weekly = _models(global_apps)
+    _apply(Daily, daily)
+    _apply(Weekly, weekly)
+
+
+def _kept_periods(checkpoints:dict, field:str, week:bool):
+    # Buckets up to the checkpoint's day (or week) hold archived movements.
+    boundaries = {}
+    for product_id, timestamp in checkpoints.items():
+        boundaries.setdefault(period_starts(timestamp)[week], []).append(product_id)
+    kept = Q(pk__in=[])
+    for start, product_ids in boundaries.items():
+        kept |= Q(product_id__in=product_ids, **{f'{field}__lte': start})
+    return kept
+
+
+def _rebuild_range(ledger, Daily, Weekly, balances:dict, checkpoints:dict):
+    days = (
+        ledger.filter(product_id__in=balances).annotate(day=TruncDate('timestamp'))
+        .exclude(_kept_periods(checkpoints, 'day', week=False)).values('product_id', 'day')
+        .annotate(
+            quantity_in=Sum('quantity_change', filter=Q(quantity_change__gt=0)),
+            quantity_out=Sum('quantity_change', filter=Q(quantity_change__lt=0)),
+            movements=Count('id'),
+        )
+        .order_by('product_id', '-day')
+    )
+    kept_weeks = {product_id: period_starts(timestamp)[1] for product_id, timestamp in checkpoints.items()}
+    daily, weekly = [], {}
+    for row in days.iterator(chunk_size=2000):
+        product_id = row['product_id']
+        quantity_in, quantity_out = row['quantity_in'] or 0, -(row['quantity_out'] or 0)
+        closing = balances[product_id]
+        balances[product_id] -= quantity_in - quantity_out
+        daily.append(Daily(
+            product_id=product_id, period_start=row['day'], quantity_in=quantity_in,
+            quantity_out=quantity_out, movements=row['movements'], closing_quantity=closing,
+        ))
+        week = (product_id, row['day'] - timedelta(days=row['day'].weekday()))
+        if product_id in kept_weeks and week[1] <= kept_weeks[product_id]:
+            continue
+        if week not in weekly:
+            # Days arrive newest first, so the first one seen closes the week.
+            weekly[week] = Weekly(product_id=product_id, period_start=week[1], closing_quantity=closing)
+        weekly[week].quantity_in += quantity_in
+        weekly[week].quantity_out += quantity_out
+        weekly[week].movements += row['movements']
+
+    with transaction.atomic():
+        for model, week in ((Daily, False), (Weekly, True)):
+            model.objects.filter(product_id__in=balances).exclude(_kept_periods(checkpoints, 'period_start', week)).delete()
+        Daily.objects.bulk_create(daily, batch_size=1000)
+        Weekly.objects.bulk_create(weekly.values(), batch_size=1000)
+
+
+def rebuild_history(product_ids=None, apps=global_apps, batch_size:int=HISTORY_BATCH_SIZE):
+    """Recompute movement rollups from the ledger; ``None`` means every product.
+
+    Closing quantities are walked back from each product's current stock.
+    Products go in pk order, ``batch_size`` at a time, each batch in its own
+    transaction, so memory stays bounded however long the ledger is.
+    Movements folded into a checkpoint by ``compact_ledger`` are gone from the
+    ledger, so the rollups up to a product's checkpoint are kept as they are.
+    """
+    Product = apps.get_model('inventory', 'Product')
+    StockUpdate = apps.get_model('inventory', 'StockUpdate')
+    Daily, Weekly = _models(apps)
+    ledger, products = StockUpdate.objects.all(), Product.objects.all()
+    compacted = any(field.name == 'kind' for field in StockUpdate._meta.get_fields())
+    if compacted:
+        ledger = ledger.filter(kind='movement')
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    after = 0
+    while balances := dict(products.filter(pk__gt=after).order_by('pk').values_list('pk', 'quantity_in_stock')[:batch_size]):
+        after = max(balances)
+        checkpoints = dict(
+            StockUpdate.objects.filter(kind='checkpoint', product_id__in=balances).values_list('product_id', 'timestamp')
+        ) if compacted else {}
+        _rebuild_range(ledger, Daily, Weekly, balances, checkpoints)
@@ -0,0 +1,230 @@
+import csv
+import io
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import lots
+from .caching import bump_versions
+from .models import Product, Category, Supplier
+from .rollups import rebuild_rollups
+
+
+IMPORT_BATCH_SIZE = 1000
+
+# Header names accepted for each column; the first spelling matches the CSV export.
+COLUMNS = {
+    'name': ('Product Name', 'name'),
+    'description': ('Description', 'description'),
+    'price': ('Price', 'price'),
+    'category': ('Category', 'category'),
+    'suppliers': ('Suppliers', 'suppliers'),
+    'quantity_in_stock': ('Quantity In Stock', 'quantity_in_stock'),
+    'expiry_date': ('Expiry Date', 'expiry_date'),
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    @property
+    def processed(self):
+        return self.created + self.updated
+
+    def add_error(self, line:int, message:str):
+        self.errors.append((line, message))
+
+
+def _column(row:dict, key:str):
+    for header in COLUMNS[key]:
+        if header in row:
+            return (row[header] or '').strip()
+    return None
+
+
+def _clean_field(name:str, value, label:str):
+    # The model field's own limits (digits, integer range), so a row the
+    # database would reject fails here instead of aborting its batch.
+    try:
+        return Product._meta.get_field(name).clean(value, None)
+    except ValidationError as e:
+        raise RowError(f"{label}: {' '.join(e.messages)}")
+
+
+def parse_row(row:dict):
+    name = _column(row, 'name')
+    if not name:
+        raise RowError("Product name is required.")
+    if len(name) > 100:
+        raise RowError("Product name is longer than 100 characters.")
+
+    category = _column(row, 'category')
+    if not category:
+        raise RowError("Category is required.")
+
+    try:
+        quantity = int(_column(row, 'quantity_in_stock'))
+    except (TypeError, ValueError):
+        raise RowError("Invalid quantity.")
+    if quantity < 0:
+        raise RowError("Quantity can't be negative.")
+    quantity = _clean_field('quantity_in_stock', quantity, "Invalid quantity")
+
+    price = _column(row, 'price') or '0'
+    try:
+        price = Decimal(price)
+    except InvalidOperation:
+        raise RowError("Invalid price.")
+    if not price.is_finite():
+        raise RowError("Invalid price.")
+    if price < 0:
+        raise RowError("Price can't be negative.")
+    price = _clean_field('price', price, "Invalid price")
+
+    expiry_date = _column(row, 'expiry_date')
+    if expiry_date in ('', 'N/A', None):
+        expiry_date = None
+    else:
+        try:
+            expiry_date = date.fromisoformat(expiry_date)
+        except ValueError:
+            raise RowError("Invalid expiry date, expected YYYY-MM-DD.")
+
+    suppliers = _column(row, 'suppliers')
+    if suppliers is not None:
+        suppliers = [s.strip() for s in suppliers.split(',') if s.strip()]
+
+    return {
+        'name': name,
+        'description': _column(row, 'description') or '',
+        'price': price,
+        'category': category,
+        'suppliers': suppliers,
+        'quantity_in_stock': quantity,
+        'expiry_date': expiry_date,
+    }
+
+
+def _import_batch(batch:list, result:ImportResult):
+    category_names = {data['category'] for _, data in batch}
+    categories, levels = {}, {}
+    for name, pk, level in Category.objects.filter(name__in=category_names).values_list('name', 'id', 'reorder_level'):
+        categories[name], levels[pk] = pk, level
+    missing = [Category(name=name) for name in category_names if name not in categories]
+    if missing:
+        Category.objects.bulk_create(missing)
+        categories.update({c.name: c.pk for c in missing})
+        levels.update({c.pk: c.reorder_level for c in missing})
+
+    supplier_names = {name for _, data in batch for name in (data['suppliers'] or [])}
+    suppliers = dict(Supplier.objects.filter(name__in=supplier_names).values_list('name', 'id'))
+
+    # Last row wins when the same product name appears twice in a batch.
+    rows = {}
+    for line, data in batch:
+        unknown = [name for name in (data['suppliers'] or []) if name not in suppliers]
+        if unknown:
+            result.add_error(line, f"Unknown supplier: {', '.join(unknown)}.")
+            continue
+        rows[data['name']] = data
+
+    existing = {p.name: p for p in Product.objects.filter(name__in=rows.keys()).order_by('id')}
+    touched_categories = {p.category_id for p in existing.values()} | set(categories.values())
+    touched_suppliers = set(suppliers.values())
+    to_create, to_update = [], []
+    previous_stock = {p.pk: p.quantity_in_stock for p in existing.values()}
+    for name, data in rows.items():
+        product = existing.get(name) or Product(name=name)
+        product.description = data['description']
+        product.price = data['price']
+        product.category_id = categories[data['category']]
+        if product.inherits_reorder_level:
+            # bulk_create/bulk_update skip Product.save(), which would copy this.
+            product.reorder_level = levels[product.category_id]
+        product.quantity_in_stock = data['quantity_in_stock']
+        product.expiry_date = data['expiry_date']
+        (to_update if product.pk else to_create).append(product)
+
+    Product.objects.bulk_create(to_create)
+    Product.objects.bulk_update(to_update, ['description', 'price', 'category', 'quantity_in_stock', 'expiry_date', 'reorder_level'])
+
+    Through = Product.suppliers.through
+    linked = [p for p in to_create + to_update if rows[p.name]['suppliers'] is not None]
+    touched_suppliers |= set(Through.objects.filter(product_id__in=[p.pk for p in to_update]).values_list('supplier_id', flat=True))
+    Through.objects.filter(product_id__in=[p.pk for p in to_update if rows[p.name]['suppliers'] is not None]).delete()
+    Through.objects.bulk_create([
+        Through(product_id=p.pk, supplier_id=suppliers[name])
+        for p in linked for name in set(rows[p.name]['suppliers'])
+    ], ignore_conflicts=True)
+
+    lots.reconcile([
+        (p.pk, previous_stock.get(p.pk, 0), p.quantity_in_stock, p.expiry_date) for p in to_create + to_update
+    ])
+    rebuild_rollups(category_ids=list(touched_categories), supplier_ids=list(touched_suppliers))
+    bump_versions('product', 'category', 'supplier')
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def import_products(rows, batch_size:int=IMPORT_BATCH_SIZE):
+    """Import product rows (dicts keyed by CSV header) in batches.
+
+    Rows that fail validation are reported in ``ImportResult.errors`` and the
+    rest of the file is still imported.
+    """
+    result = ImportResult()
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            _import_batch(batch, result)
+        batch.clear()
+
+    for line, row in enumerate(rows, start=2):
+        try:
+            batch.append((line, parse_row(row)))
+        except RowError as e:
+            result.add_error(line, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return result
+
+
+def invalid_utf8_line(file):
+    """The first line of the binary ``file`` that isn't UTF-8, or ``None``; leaves it rewound."""
+    try:
+        # A newline byte is never part of a multi-byte character, so lines decode on their own.
+        for line, raw in enumerate(file, start=1):
+            try:
+                raw.decode('utf-8')
+            except UnicodeDecodeError:
+                return line
+        return None
+    finally:
+        file.seek(0)
+
+
+def import_products_csv(file, batch_size:int=IMPORT_BATCH_SIZE):
+    """Import a CSV file; binary files are checked to be UTF-8 before anything is written."""
+    if isinstance(file, io.TextIOBase):
+        text = file
+    else:
+        line = invalid_utf8_line(file)
+        if line:
+            result = ImportResult()
+            result.add_error(line, "The file is not UTF-8 encoded; nothing was imported.")
+            return result
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    return import_products(csv.DictReader(text), batch_size=batch_size)
@@ -0,0 +1,140 @@
+import csv
+import gzip
+import io
+import json
+import os
+from contextlib import contextmanager
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .caching import bump_versions
+from .models import Product, StockUpdate
+
+
+COMPACT_BATCH_SIZE = 1000
+ARCHIVE_FORMATS = ('csv', 'jsonl')
+ARCHIVE_FIELDS = ('id', 'product_id', 'product_name', 'updated_by', 'quantity_change', 'timestamp', 'note', 'kind')
+
+
+def archive_record(update:StockUpdate):
+    return {
+        'id': update.id,
+        'product_id': update.product_id,
+        'product_name': update.product.name,
+        'updated_by': update.updated_by.username if update.updated_by else '',
+        'quantity_change': update.quantity_change,
+        'timestamp': update.timestamp.isoformat(),
+        'note': update.note,
+        'kind': update.kind,
+    }
+
+
+@contextmanager
+def open_archive(path:str, fmt:str='csv'):
+    """Yield a ``write(updates)`` callable appending a batch of ledger rows to a gzipped file.
+
+    Each batch becomes a complete gzip member, synced to disk before ``write``
+    returns, so rows deleted after it can't be lost in a crash. Gzip readers
+    see the members as one file.
+    """
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format {fmt!r}.")
+    with open(path, 'wb') as f:
+        def write(updates):
+            buffer = io.StringIO(newline='')
+            if fmt == 'csv':
+                writer = csv.DictWriter(buffer, fieldnames=ARCHIVE_FIELDS)
+                if not f.tell():
+                    writer.writeheader()
+                writer.writerows(archive_record(update) for update in updates)
+            else:
+                buffer.writelines(json.dumps(archive_record(update), cls=DjangoJSONEncoder) + '\n' for update in updates)
+            f.write(gzip.compress(buffer.getvalue().encode('utf-8')))
+            f.flush()
+            os.fsync(f.fileno())
+        yield write
+
+
+def _fold_into_checkpoints(totals:dict, cutoff):
+    existing = set(
+        StockUpdate.objects.select_for_update()
+        .filter(kind=StockUpdate.CHECKPOINT, product_id__in=totals)
+        .values_list('product_id', flat=True)
+    )
+    if existing:
+        StockUpdate.objects.filter(kind=StockUpdate.CHECKPOINT, product_id__in=existing).update(
+            quantity_change=F('quantity_change') + Case(
+                *[When(product_id=pk, then=Value(totals[pk])) for pk in existing],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+        )
+    created = StockUpdate.objects.bulk_create([
+        StockUpdate(product_id=pk, quantity_change=total, kind=StockUpdate.CHECKPOINT, note="Archived movements")
+        for pk, total in totals.items() if pk not in existing
+    ])
+    # auto_now_add stamped the new rows with now; they belong at the cutoff.
+    StockUpdate.objects.filter(kind=StockUpdate.CHECKPOINT, product_id__in=totals).filter(
+        Q(pk__in=[update.pk for update in created]) | Q(timestamp__lt=cutoff)
+    ).update(timestamp=cutoff)
+
+
+def _set_checkpoint_balances(product_ids, cutoff):
+    later = (
+        StockUpdate.objects.filter(product=OuterRef('pk'), kind=StockUpdate.MOVEMENT, timestamp__gte=cutoff)
+        .values('product').annotate(total=Sum('quantity_change')).values('total')
+    )
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), COMPACT_BATCH_SIZE):
+        with transaction.atomic():
+            # One statement, so the stock and the later movements come from the same snapshot.
+            balances = dict(
+                Product.objects.filter(pk__in=product_ids[start:start + COMPACT_BATCH_SIZE])
+                .annotate(later=Coalesce(Subquery(later, output_field=IntegerField()), 0))
+                .values_list('pk', F('quantity_in_stock') - F('later'))
+            )
+            if balances:
+                StockUpdate.objects.filter(kind=StockUpdate.CHECKPOINT, product_id__in=balances).update(balance=Case(
+                    *[When(product_id=pk, then=Value(balance)) for pk, balance in balances.items()],
+                    output_field=IntegerField(),
+                ))
+
+
+def compact_ledger(cutoff, write=None, batch_size:int=COMPACT_BATCH_SIZE):
+    """Fold movements older than ``cutoff`` into one checkpoint row per product.
+
+    Rows go oldest first in transactions of at most ``batch_size``. Each
+    transaction hands its rows to ``write`` (see ``open_archive``), adds their
+    net change to the product's checkpoint and deletes them. A crash therefore
+    never leaves the ledger half folded, and no lock outlives one batch.
+    Returns the number of rows archived.
+    """
+    candidates = (
+        StockUpdate.objects.filter(kind=StockUpdate.MOVEMENT, timestamp__lt=cutoff)
+        .select_related('product', 'updated_by').only(
+            'id', 'product_id', 'product__name', 'updated_by__username', 'quantity_change', 'timestamp', 'note', 'kind',
+        )
+        .order_by('id')
+    )
+    archived, touched = 0, set()
+    while True:
+        with transaction.atomic():
+            batch = list(candidates[:batch_size])
+            if not batch:
+                break
+            if write:
+                # On disk before the delete below can commit.
+                write(batch)
+            totals = {}
+            for update in batch:
+                totals[update.product_id] = totals.get(update.product_id, 0) + update.quantity_change
+            _fold_into_checkpoints(totals, cutoff)
+            StockUpdate.objects.filter(pk__in=[update.pk for update in batch]).delete()
+            bump_versions('stockupdate')
+        archived += len(batch)
+        touched.update(totals)
+    _set_checkpoint_balances(touched, cutoff)
+    return archived
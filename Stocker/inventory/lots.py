@@ -0,0 +1,51 @@
+from django.db.models import F
+
+from .models import StockLot
+
+
+# Earliest expiry first; lots that never expire go last, oldest receipt first among equals.
+FEFO_ORDER = (F('expiry_date').asc(nulls_last=True), 'received_at', 'id')
+
+
+def receive(receipts):
+    """Add a lot for each ``(product_id, quantity, expiry_date)``; empty receipts are skipped."""
+    StockLot.objects.bulk_create([
+        StockLot(product_id=product_id, quantity=quantity, expiry_date=expiry_date)
+        for product_id, quantity, expiry_date in receipts if quantity > 0
+    ])
+
+
+def deplete(quantities:dict):
+    """Take ``{product_id: quantity}`` out of each product's lots, first expired first out.
+
+    Call inside the transaction that lowers the products' stock, while their
+    rows are locked, so two writers never draw on the same lot. Returns the
+    ``(lot, taken)`` pairs in the order they were drawn.
+    """
+    remaining = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not remaining:
+        return []
+    drawn, emptied, reduced = [], [], []
+    for lot in StockLot.objects.filter(product_id__in=remaining).order_by('product_id', *FEFO_ORDER):
+        wanted = remaining[lot.product_id]
+        if not wanted:
+            continue
+        taken = min(wanted, lot.quantity)
+        remaining[lot.product_id] -= taken
+        lot.quantity -= taken
+        (reduced if lot.quantity else emptied).append(lot)
+        drawn.append((lot, taken))
+    StockLot.objects.filter(pk__in=[lot.pk for lot in emptied]).delete()
+    StockLot.objects.bulk_update(reduced, ['quantity'])
+    return drawn
+
+
+def reconcile(changes):
+    """Bring lots in line with stock set directly, from ``(product_id, old_quantity, new_quantity, expiry_date)``.
+
+    Increases arrive as a new lot expiring on ``expiry_date``; decreases are
+    drawn first expired first out.
+    """
+    changes = [change for change in changes if change[1] != change[2]]
+    receive([(product_id, new - old, expiry_date) for product_id, old, new, expiry_date in changes if new > old])
+    deplete({product_id: old - new for product_id, old, new, _ in changes if new < old})
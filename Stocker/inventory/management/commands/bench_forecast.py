@@ -0,0 +1,64 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from inventory import forecasting
+from inventory.models import Category, DailyMovementRollup, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Time refresh_forecasts over synthetic products with a year of daily movement rollups, "
+        "with and without numpy. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--density', type=float, default=0.1, help="Share of days each product moves stock.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        today = timezone.localdate()
+        with transaction.atomic():
+            start = time.perf_counter()
+            category = Category.objects.create(name='Benchmark')
+            products = Product.objects.bulk_create([
+                Product(name=f'Bench {i}', description='', category=category, quantity_in_stock=rng.randint(0, 500))
+                for i in range(options['products'])
+            ], batch_size=5000)
+            batch, rows = [], 0
+            for product in products:
+                for day in range(options['days']):
+                    if rng.random() < options['density']:
+                        batch.append(DailyMovementRollup(
+                            product_id=product.id, period_start=today - timedelta(days=day),
+                            quantity_out=rng.randint(1, 20), movements=1,
+                        ))
+                if len(batch) >= 50_000:
+                    DailyMovementRollup.objects.bulk_create(batch, batch_size=5000)
+                    rows += len(batch)
+                    batch = []
+            DailyMovementRollup.objects.bulk_create(batch, batch_size=5000)
+            rows += len(batch)
+            self.stdout.write(f"Seeded {len(products)} products, {rows} daily rollups in {time.perf_counter() - start:.1f}s")
+
+            start = time.perf_counter()
+            ids, *columns = forecasting.demand_stats()
+            self.stdout.write(f"load demand stats: {time.perf_counter() - start:.2f}s")
+            paths = [('pure Python', forecasting._forecast_python)]
+            if forecasting.np is not None:
+                paths.insert(0, ('numpy', forecasting._forecast_numpy))
+            for label, forecast in paths:
+                start = time.perf_counter()
+                list(forecast(*columns, forecasting.LEAD_TIME_DAYS, forecasting.COVER_DAYS))
+                self.stdout.write(f"forecast math ({label}): {time.perf_counter() - start:.3f}s")
+            start = time.perf_counter()
+            count = forecasting.refresh_forecasts()
+            self.stdout.write(f"refresh_forecasts for {count} products: {time.perf_counter() - start:.2f}s")
+            transaction.set_rollback(True)
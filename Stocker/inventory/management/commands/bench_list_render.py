@@ -0,0 +1,66 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from inventory.models import Product, Category, Supplier
+
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time product list and detail renders without fragment caching and with a warm "
+        "fragment cache. Synthetic rows are inserted inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--suppliers', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(User.objects.create_superuser(username='bench-list-render', password=None))
+            categories = Category.objects.bulk_create([Category(name=f'Bench {i}') for i in range(options['categories'])])
+            Supplier.objects.bulk_create([
+                Supplier(name=f'Bench {i}', email=f'bench{i}@example.com', phone='0') for i in range(options['suppliers'])
+            ])
+            products = Product.objects.bulk_create([
+                Product(name=f'Bench {i}', description='', category=categories[i % len(categories)], quantity_in_stock=i)
+                for i in range(options['products'])
+            ])
+            urls = [
+                reverse('users:product_list'),
+                reverse('users:product_list') + '?page=2',
+                reverse('users:product_detail', args=[products[0].id]),
+            ]
+
+            self.stdout.write(f"{'url':<32}{'uncached ms':>13}{'queries':>9}{'cached ms':>11}{'queries':>9}")
+            for url in urls:
+                with override_settings(CACHES=NO_CACHE):
+                    uncached, uncached_queries = self.time(client, url, options['repeat'])
+                cache.clear()
+                client.get(url)
+                cached, cached_queries = self.time(client, url, options['repeat'])
+                self.stdout.write(f"{url:<32}{uncached:>13.2f}{uncached_queries:>9}{cached:>11.2f}{cached_queries:>9}")
+            transaction.set_rollback(True)
+
+    def time(self, client, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.status_code
+        return statistics.median(timings), len(ctx)
@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import Product, Category
+
+
+WORDS = [
+    'fresh', 'milk', 'organic', 'green', 'tea', 'chocolate', 'bar', 'gel', 'pen', 'black', 'smart', 'tv',
+    'leather', 'chair', 'wooden', 'table', 'gold', 'bangle', 'speaker', 'mini', 'yogurt', 'body', 'wash',
+    'cheese', 'bread', 'rice', 'coffee', 'juice', 'orange', 'apple', 'soap', 'shampoo', 'notebook', 'lamp',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare product search latency between the full-text index and name__icontains. "
+        "Synthetic rows are inserted inside a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--queries', nargs='+', default=['milk', 'green tea', 'choc', 'leather chair', 'zzz'])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            category = Category.objects.create(name='Benchmark')
+            inserted = 0
+            for size in sorted(options['sizes']):
+                self.insert(rng, category, size - inserted)
+                inserted = size
+                self.stdout.write(f"\n{size} rows")
+                self.stdout.write(f"{'query':<16}{'icontains ms':>14}{'fts ms':>10}{'matches':>10}")
+                for query in options['queries']:
+                    baseline = self.time(lambda: self.page(Product.objects.filter(name__icontains=query)), options['repeat'])
+                    indexed = self.time(lambda: self.page(Product.objects.search(query)), options['repeat'])
+                    matches = Product.objects.search(query).count()
+                    self.stdout.write(f"{query:<16}{baseline:>14.2f}{indexed:>10.2f}{matches:>10}")
+            transaction.set_rollback(True)
+
+    def insert(self, rng, category, count):
+        batch = []
+        for _ in range(count):
+            words = rng.sample(WORDS, 3)
+            batch.append(Product(
+                name=' '.join(words).title(),
+                description=' '.join(rng.sample(WORDS, 8)),
+                category=category,
+                quantity_in_stock=rng.randint(0, 500),
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+    def page(self, queryset):
+        # What a list view does: count for the paginator, then the first page.
+        queryset.count()
+        return list(queryset.order_by('name', 'id')[:10])
+
+    def time(self, fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,49 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from inventory.models import Product, Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare receiving N items through the per-item update_stock view and the batch "
+        "stock_movements endpoint. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, nargs='+', default=[10, 100, 500])
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(User.objects.create_superuser(username='bench-stock-movements', password=None))
+            category = Category.objects.create(name='Benchmark')
+
+            self.stdout.write(f"{'items':>6}{'per-item s':>12}{'batch s':>10}{'per-item/s':>12}{'batch/s':>10}")
+            for count in options['items']:
+                products = Product.objects.bulk_create([
+                    Product(name=f'Bench {count}-{i}', description='', category=category, quantity_in_stock=100)
+                    for i in range(count)
+                ])
+
+                start = time.perf_counter()
+                for product in products:
+                    client.post(reverse('inventory:update_stock', args=[product.id]), {'quantity_change': 12, 'note': 'received'})
+                per_item = time.perf_counter() - start
+
+                body = json.dumps({'movements': [
+                    {'product_id': product.id, 'quantity_change': 12, 'note': 'received'} for product in products
+                ]})
+                start = time.perf_counter()
+                response = client.post(reverse('inventory:stock_movements'), body, content_type='application/json')
+                batch = time.perf_counter() - start
+                assert response.status_code == 200, response.content
+
+                self.stdout.write(f"{count:>6}{per_item:>12.3f}{batch:>10.3f}{count / per_item:>12.0f}{count / batch:>10.0f}")
+            transaction.set_rollback(True)
@@ -0,0 +1,149 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import Category, Product, StockUpdate, Supplier
+from inventory.profiling import percentile
+
+
+def scenarios(product:Product, category_id:int, supplier_id:int, word:str):
+    """``(name, method, url, data)`` for the views the benchmark drives."""
+    movements = json.dumps({'movements': [{'product_id': product.id, 'quantity_change': 1}, {'product_id': product.id, 'quantity_change': -1}]})
+    return [
+        ('product_list', 'get', reverse('users:product_list'), None),
+        ('product_list_page_50', 'get', reverse('users:product_list') + '?page=50', None),
+        ('product_list_category', 'get', reverse('users:product_list') + f'?category={category_id}', None),
+        ('product_list_supplier', 'get', reverse('users:product_list') + f'?supplier={supplier_id}', None),
+        ('product_list_search', 'get', reverse('users:product_list') + f'?q={word}', None),
+        ('employee_product_list', 'get', reverse('inventory:product_list'), None),
+        ('product_detail', 'get', reverse('users:product_detail', args=[product.id]), None),
+        ('stock_history', 'get', reverse('inventory:stock_history', args=[product.id]), None),
+        ('update_stock', 'post', reverse('users:update_stock', args=[product.id]), {'quantity_change': 1, 'note': 'bench'}),
+        ('stock_movements', 'json', reverse('inventory:stock_movements'), movements),
+        ('admin_dashboard', 'get', reverse('users:admin_dashboard'), None),
+        ('inventory_report', 'get', reverse('users:inventory_report'), None),
+        ('supplier_report', 'get', reverse('users:supplier_report'), None),
+        ('expiring_report', 'get', reverse('users:expiring_report'), None),
+        ('inventory_report_csv', 'get', reverse('users:inventory_report_csv'), None),
+        ('supplier_report_csv', 'get', reverse('users:supplier_report_csv'), None),
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main views through the test client against the current database and record "
+        "latency percentiles and query counts as JSON. Writes are rolled back. Use --compare "
+        "with an earlier result to see regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--output', help="Write the results here as JSON.")
+        parser.add_argument('--compare', help="Earlier results to diff against.")
+        parser.add_argument('--only', nargs='*', help="Run only these scenarios.")
+
+    def handle(self, *args, **options):
+        product = Product.objects.order_by('pk').first()
+        category_id = Category.objects.order_by('pk').values_list('pk', flat=True).first()
+        supplier_id = Supplier.objects.order_by('pk').values_list('pk', flat=True).first()
+        if product is None or category_id is None or supplier_id is None:
+            raise CommandError("The catalog is empty; run generate_dataset first.")
+        word = product.name.split()[0]
+
+        results = {}
+        with transaction.atomic():
+            user = User.objects.create_superuser(username='bench-views', password=None)
+            user.groups.add(Group.objects.get_or_create(name='Employee')[0])
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+            for name, method, url, data in scenarios(product, category_id, supplier_id, word):
+                if options['only'] and name not in options['only']:
+                    continue
+                results[name] = self.run(client, method, url, data, options['repeat'])
+                self.stdout.write(
+                    f"{name:<24}p50 {results[name]['p50_ms']:>8.2f}ms  p95 {results[name]['p95_ms']:>8.2f}ms  "
+                    f"p99 {results[name]['p99_ms']:>8.2f}ms  {results[name]['queries']:>4} queries"
+                )
+            transaction.set_rollback(True)
+        # Versions bumped inside the rolled back transaction would otherwise outlive it.
+        cache.clear()
+
+        report = {
+            'commit': git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'repeat': options['repeat'],
+            'dataset': {
+                'products': Product.objects.count(),
+                'categories': Category.objects.count(),
+                'suppliers': Supplier.objects.count(),
+                'stock_updates': StockUpdate.objects.count(),
+            },
+            'scenarios': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), report)
+
+    def request(self, client, method, url, data):
+        if method == 'json':
+            response = client.post(url, data, content_type='application/json')
+        else:
+            response = getattr(client, method)(url, data or {})
+        if response.streaming:
+            b"".join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(f"{method.upper()} {url} returned {response.status_code}.")
+        return response
+
+    def run(self, client, method, url, data, repeat):
+        # One warm-up request fills per-session state and the template cache.
+        self.request(client, method, url, data)
+        timings, queries = [], []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                self.request(client, method, url, data)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(ctx))
+        timings.sort()
+        return {
+            'url': url,
+            'method': method.upper(),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': max(queries),
+        }
+
+    def compare(self, before, after):
+        self.stdout.write(f"\nAgainst {before.get('commit') or 'earlier run'}:")
+        for name, result in after['scenarios'].items():
+            old = before.get('scenarios', {}).get(name)
+            if old is None:
+                self.stdout.write(f"{name:<24}new")
+                continue
+            change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            line = f"{name:<24}p95 {old['p95_ms']:>8.2f} -> {result['p95_ms']:>8.2f}ms ({change:+.0f}%)  queries {old['queries']} -> {result['queries']}"
+            self.stdout.write(self.style.WARNING(line) if change > 20 or result['queries'] > old['queries'] else line)
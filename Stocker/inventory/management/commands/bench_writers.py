@@ -0,0 +1,152 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from inventory.models import Product
+from inventory.profiling import percentile
+from .bench_views import git_commit
+
+
+# Environment overrides for each configuration --configs can compare.
+CONFIGS = {
+    'sqlite-default': {'DATABASE_ENGINE': 'sqlite', 'SQLITE_TUNING': 'False'},
+    'sqlite-wal': {'DATABASE_ENGINE': 'sqlite', 'SQLITE_TUNING': 'True'},
+    'postgres': {'DATABASE_ENGINE': 'postgres', 'DATABASE_POOL': 'False'},
+    'postgres-pool': {'DATABASE_ENGINE': 'postgres', 'DATABASE_POOL': 'True'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run parallel writers POSTing to users:update_stock and report throughput, latency and "
+        "failed writes such as 'database is locked'. Each writer adds and removes one unit, so "
+        "stock ends where it started, but ledger rows are kept: use a scratch database, e.g. one "
+        "filled by generate_dataset. --configs reruns the benchmark once per database "
+        "configuration in a subprocess."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--updates', type=int, default=100, help="Updates per writer.")
+        parser.add_argument('--products', type=int, default=10, help="Spread the writes over this many products.")
+        parser.add_argument(
+            '--endpoint', choices=['update_stock', 'stock_movements'], default='update_stock',
+            help="stock_movements reads the balances before writing, the case deferred SQLite transactions fail on.",
+        )
+        parser.add_argument('--configs', nargs='*', choices=sorted(CONFIGS), help="Compare these configurations.")
+        parser.add_argument('--output', help="Write the results here as JSON.")
+
+    def handle(self, *args, **options):
+        if options['configs']:
+            results = {name: self.run_config(name, options) for name in options['configs']}
+        else:
+            results = {self.describe(): self.run(options)}
+        for name, result in results.items():
+            if 'error' in result:
+                self.stdout.write(self.style.WARNING(f"{name:<16}{result['error']}"))
+                continue
+            self.stdout.write(
+                f"{name:<16}{result['writes_per_s']:>8.1f} writes/s  p50 {result['p50_ms']:>7.1f}ms  "
+                f"p95 {result['p95_ms']:>7.1f}ms  p99 {result['p99_ms']:>7.1f}ms  {result['failed']} failed"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'commit': git_commit(), 'writers': options['writers'], 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
+
+    def describe(self):
+        if connection.vendor == 'sqlite':
+            return 'sqlite-wal' if settings.DATABASES['default'].get('OPTIONS', {}).get('init_command') else 'sqlite-default'
+        pooled = settings.DATABASES['default'].get('OPTIONS', {}).get('pool')
+        return f"{connection.vendor}-pool" if pooled else connection.vendor
+
+    def run_config(self, name, options):
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            command = [
+                sys.executable, 'manage.py', 'bench_writers', '--writers', str(options['writers']),
+                '--updates', str(options['updates']), '--products', str(options['products']),
+                '--endpoint', options['endpoint'], '--output', output.name,
+            ]
+            process = subprocess.run(
+                command, cwd=settings.BASE_DIR, env={**os.environ, **CONFIGS[name]}, capture_output=True, text=True,
+            )
+            if process.returncode:
+                return {'error': (process.stderr.strip().splitlines() or ["failed"])[-1]}
+            return next(iter(json.load(output)['results'].values()))
+
+    def run(self, options):
+        product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True)[:options['products']])
+        if not product_ids:
+            raise CommandError("The catalog is empty; run generate_dataset first.")
+        if connection.vendor == 'sqlite' and not settings.DATABASES['default'].get('OPTIONS', {}).get('init_command'):
+            # WAL mode sticks to the file, so switch back for a true untuned run.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+
+        user = User.objects.create_superuser(username='bench-writers', password=None)
+        timings, failed, lock = [], [0], threading.Lock()
+        barrier = threading.Barrier(options['writers'])
+
+        def writer(n):
+            client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            client.force_login(user)
+            local, errors = [], 0
+            try:
+                barrier.wait()
+                for i in range(options['updates']):
+                    product_id = product_ids[(n + i // 2) % len(product_ids)]
+                    change = 1 if i % 2 == 0 else -1
+                    start = time.perf_counter()
+                    if options['endpoint'] == 'update_stock':
+                        response = client.post(
+                            reverse('users:update_stock', args=[product_id]), {'quantity_change': change, 'note': 'bench_writers'},
+                        )
+                        # Success redirects to the list; errors redirect back to the form or fail.
+                        ok = response.status_code == 302 and response.url == reverse('users:product_list')
+                    else:
+                        response = client.post(
+                            reverse('inventory:stock_movements'),
+                            json.dumps([{'product_id': product_id, 'quantity_change': change, 'note': 'bench_writers'}]),
+                            content_type='application/json',
+                        )
+                        ok = response.status_code == 200
+                    local.append(time.perf_counter() - start)
+                    errors += not ok
+            finally:
+                connections.close_all()
+            with lock:
+                timings.extend(local)
+                failed[0] += errors
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+        user.delete()
+
+        timings = sorted(t * 1000 for t in timings)
+        return {
+            'writes': len(timings) - failed[0],
+            'failed': failed[0],
+            'seconds': round(seconds, 3),
+            'writes_per_s': round((len(timings) - failed[0]) / seconds, 2),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+        }
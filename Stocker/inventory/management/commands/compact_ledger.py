@@ -0,0 +1,42 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.ledger import ARCHIVE_FORMATS, COMPACT_BATCH_SIZE, compact_ledger, open_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive stock movements older than the retention window to a gzipped CSV/JSONL file and "
+        "fold them into one checkpoint row per product."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help="Keep this many days of movements.")
+        parser.add_argument('--format', choices=ARCHIVE_FORMATS, default='csv')
+        parser.add_argument('--output-dir', default=settings.LEDGER_ARCHIVE_DIR)
+        parser.add_argument('--batch-size', type=int, default=COMPACT_BATCH_SIZE)
+        parser.add_argument('--no-archive', action='store_true', help="Fold and delete without writing a file.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['days'])
+        if options['no_archive']:
+            archived = compact_ledger(cutoff, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Folded {archived} movements before {cutoff:%Y-%m-%d}."))
+            return
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        path = os.path.join(
+            options['output_dir'], f"stockupdates-before-{cutoff:%Y%m%d}-{now:%Y%m%d%H%M%S}.{options['format']}.gz",
+        )
+        with open_archive(path, options['format']) as write:
+            archived = compact_ledger(cutoff, write, batch_size=options['batch_size'])
+        if not archived:
+            os.remove(path)
+            self.stdout.write("Nothing to archive.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} movements before {cutoff:%Y-%m-%d} to {path}."))
@@ -0,0 +1,46 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Category, Product, Supplier
+from inventory.synthetic import GENERATE_BATCH_SIZE, clear_catalog, generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill an empty catalog with a deterministic synthetic dataset, e.g. "
+        "--products 1000000 --suppliers 10000 --stock-updates 20000000."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10_000)
+        parser.add_argument('--categories', type=int, default=100)
+        parser.add_argument('--suppliers', type=int, default=200)
+        parser.add_argument('--stock-updates', type=int, default=100_000)
+        parser.add_argument('--days', type=int, default=365, help="Spread stock updates over this many days.")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last day of the ledger, YYYY-MM-DD (default: today).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=GENERATE_BATCH_SIZE)
+        parser.add_argument('--clear', action='store_true', help="Empty the inventory tables first.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_catalog()
+        elif Product.objects.exists() or Category.objects.exists() or Supplier.objects.exists():
+            raise CommandError("The catalog is not empty; pass --clear to replace it.")
+
+        start = time.perf_counter()
+        counts = generate_dataset(
+            products=options['products'],
+            categories=options['categories'],
+            suppliers=options['suppliers'],
+            stock_updates=options['stock_updates'],
+            days=options['days'],
+            end=options['end'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=lambda message: self.stdout.write(f"[{time.perf_counter() - start:7.1f}s] {message}"),
+        )
+        summary = ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Generated {summary} in {time.perf_counter() - start:.1f}s."))
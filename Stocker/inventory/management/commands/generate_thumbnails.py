@@ -0,0 +1,27 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from inventory.models import Product, Supplier
+from inventory.thumbnails import generate_many
+
+
+class Command(BaseCommand):
+    help = "Generate missing WebP/JPEG thumbnails for existing product images and supplier logos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processes to resize with; 1 runs inline.")
+        parser.add_argument('--force', action='store_true', help="Regenerate thumbnails that already exist.")
+
+    def handle(self, *args, **options):
+        names = set(Product.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True))
+        names |= set(Supplier.objects.exclude(logo='').exclude(logo__isnull=True).values_list('logo', flat=True))
+
+        images = written = errors = 0
+        for name, count, error in generate_many(sorted(names), workers=options['workers'], force=options['force']):
+            images += 1
+            written += count
+            if error:
+                errors += 1
+                self.stderr.write(f"{name}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"Checked {images} images, wrote {written} thumbnails, {errors} failed."))
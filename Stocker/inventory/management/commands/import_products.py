@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importer import import_products_csv, IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Import products from a CSV file on disk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            file = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(str(e))
+        with file:
+            result = import_products_csv(file, batch_size=options['batch_size'])
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.processed} products ({result.created} created, {result.updated} updated), {len(result.errors)} errors."
+        ))
@@ -0,0 +1,166 @@
+import http.client
+import importlib.util
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from inventory.models import Product
+from inventory.profiling import percentile
+from .bench_views import git_commit
+
+
+HOST = '127.0.0.1'
+SERVERS = {
+    # One process each, so the comparison is event loop against thread pool.
+    'asgi': lambda port, threads: ['uvicorn', 'stocker.asgi:application', '--host', HOST, '--port', str(port), '--no-access-log', '--log-level', 'warning'],
+    'wsgi': lambda port, threads: ['gunicorn', 'stocker.wsgi:application', '--bind', f'{HOST}:{port}', '--workers', '1', '--threads', str(threads), '--log-level', 'warning'],
+}
+
+
+def read_paths(product_id:int):
+    """The async read views, plus the CSV export."""
+    return [
+        reverse('users:product_list'),
+        reverse('users:product_list') + '?page=20',
+        reverse('users:product_detail', args=[product_id]),
+        reverse('inventory:product_list'),
+        reverse('users:admin_dashboard'),
+        reverse('users:inventory_report'),
+        reverse('users:supplier_report'),
+    ]
+
+
+def wait_for_port(port:int, process, timeout:float=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"The server exited with status {process.returncode}.")
+        try:
+            socket.create_connection((HOST, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"The server did not listen on port {port} within {timeout:.0f}s.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app under uvicorn (ASGI) and gunicorn (WSGI) in turn and hammer the read views "
+        "with concurrent keep-alive clients, then compare throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['asgi', 'wsgi', 'both'], default='both')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=15, help="Seconds of load per server.")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--path', action='append', dest='paths', help="Request this path instead of the default mix; repeatable.")
+        parser.add_argument('--csv', action='store_true', help="Add the inventory CSV export to the mix.")
+        parser.add_argument('--output', help="Write the results here as JSON.")
+
+    def handle(self, *args, **options):
+        product_id = Product.objects.order_by('pk').values_list('pk', flat=True).first()
+        if product_id is None:
+            raise CommandError("The catalog is empty; run generate_dataset first.")
+        paths = options['paths'] or read_paths(product_id)
+        if options['csv']:
+            paths.append(reverse('users:inventory_report_csv'))
+        servers = ['asgi', 'wsgi'] if options['server'] == 'both' else [options['server']]
+        for name in servers:
+            module = SERVERS[name](0, 0)[0]
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f"{module} is not installed; pip install {module}.")
+
+        user = User.objects.create_superuser(username='load-test', password=None)
+        user.groups.add(Group.objects.get_or_create(name='Employee')[0])
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+        results = {}
+        try:
+            for name in servers:
+                results[name] = self.run(name, paths, cookie, options)
+                result = results[name]
+                self.stdout.write(
+                    f"{name}: {result['requests']} requests in {result['seconds']:.1f}s, {result['rps']:.1f} req/s, "
+                    f"p50 {result['p50_ms']:.1f}ms p95 {result['p95_ms']:.1f}ms p99 {result['p99_ms']:.1f}ms, "
+                    f"{result['errors']} errors"
+                )
+        finally:
+            client.logout()
+            user.delete()
+
+        if len(results) == 2 and results['wsgi']['rps']:
+            self.stdout.write(f"ASGI/WSGI throughput: {results['asgi']['rps'] / results['wsgi']['rps']:.2f}x")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'commit': git_commit(), 'concurrency': options['concurrency'], 'paths': paths, 'servers': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
+
+    def run(self, name, paths, cookie, options):
+        port = options['port']
+        command = [sys.executable, '-m', *SERVERS[name](port, options['concurrency'])]
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR)
+        try:
+            wait_for_port(port, process)
+            # Warm up every path once: templates, caches and the connection.
+            self.drive(port, paths, cookie, 1, deadline=None)
+            return self.drive(port, paths, cookie, options['concurrency'], deadline=time.monotonic() + options['duration'])
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def drive(self, port, paths, cookie, concurrency, deadline):
+        timings, errors, lock = [], [0], threading.Lock()
+
+        def worker(offset):
+            connection = http.client.HTTPConnection(HOST, port, timeout=60)
+            local, failed, n = [], 0, offset
+            while True:
+                path = paths[n % len(paths)]
+                n += 1
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers={'Cookie': cookie})
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status >= 400:
+                        failed += 1
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection(HOST, port, timeout=60)
+                local.append(time.perf_counter() - start)
+                if deadline is None and n - offset >= len(paths) or deadline is not None and time.monotonic() >= deadline:
+                    break
+            connection.close()
+            with lock:
+                timings.extend(local)
+                errors[0] += failed
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        seconds = time.monotonic() - start
+
+        timings = sorted(t * 1000 for t in timings)
+        return {
+            'requests': len(timings),
+            'seconds': round(seconds, 3),
+            'rps': round(len(timings) / seconds, 2) if seconds else 0,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'errors': errors[0],
+        }
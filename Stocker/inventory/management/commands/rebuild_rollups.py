@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import CategoryStockRollup, SupplierStockRollup
+from inventory.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-category and per-supplier stock rollups from the catalog."
+
+    def handle(self, *args, **options):
+        rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {CategoryStockRollup.objects.count()} category and {SupplierStockRollup.objects.count()} supplier rollups."
+        ))
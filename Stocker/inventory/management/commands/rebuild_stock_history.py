@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory.history import rebuild_history
+from inventory.models import DailyMovementRollup, WeeklyMovementRollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily and weekly stock movement rollups from the StockUpdate ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, nargs='*', dest='products', help="Only rebuild these product ids.")
+
+    def handle(self, *args, **options):
+        rebuild_history(product_ids=options['products'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f"{DailyMovementRollup.objects.count()} daily and {WeeklyMovementRollup.objects.count()} weekly rollups."
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.forecasting import COVER_DAYS, LEAD_TIME_DAYS, WINDOW_DAYS, np, refresh_forecasts
+
+
+class Command(BaseCommand):
+    help = "Recompute reorder forecasts for every product from recent stock movements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=WINDOW_DAYS, help="Days of history to average over.")
+        parser.add_argument('--lead-time', type=int, default=LEAD_TIME_DAYS, help="Days between ordering and receiving.")
+        parser.add_argument('--cover', type=int, default=COVER_DAYS, help="Days of demand a suggested order should cover.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = refresh_forecasts(window_days=options['window'], lead_time=options['lead_time'], cover=options['cover'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {count} products in {time.perf_counter() - start:.2f}s ({'numpy' if np is not None else 'pure Python'})."
+        ))
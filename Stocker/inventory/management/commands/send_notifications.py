@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.services import drain_outbox, OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS
+
+
+class Command(BaseCommand):
+    help = "Send queued low-stock alerts from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=OUTBOX_MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting once the outbox is empty.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} alerts, {failed} failed.")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
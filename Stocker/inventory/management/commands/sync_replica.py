@@ -0,0 +1,35 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from inventory.routers import REPLICA_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over the replica file, standing in for replication "
+        "when trying read_from_replica locally. Run it again (or on a timer) to catch up."
+    )
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No replica configured; set DATABASE_REPLICA_NAME.")
+        primary, replica = connections['default'], connections[REPLICA_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("Only SQLite replicas can be synced this way; use the database's own replication.")
+
+        start = time.perf_counter()
+        replica.close()
+        # The backup API takes a consistent snapshot even while the primary is being written.
+        source = sqlite3.connect(primary.settings_dict['NAME'])
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {primary.settings_dict['NAME']} to {replica.settings_dict['NAME']} in {time.perf_counter() - start:.1f}s."
+        ))
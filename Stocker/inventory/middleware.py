@@ -0,0 +1,135 @@
+import time
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject
+
+from . import profiling, routers
+from .roles import get_group_names
+
+
+def _shared_user(request):
+    user = request.user
+    user.is_authenticated  # resolve the lazy object here, in the sync thread
+    return user
+
+
+class RoleMiddleware:
+    """Attach ``request.group_names``, loaded on first use.
+
+    Must come after ``AuthenticationMiddleware``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        self.process_request(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_request(self, request):
+        request.group_names = SimpleLazyObject(lambda: get_group_names(request))
+        # Out of the box auser() and the user templates see are loaded
+        # separately; make async views reuse request.user.
+        request.auser = partial(sync_to_async(_shared_user), request)
+
+
+class ProfilingMiddleware:
+    """Time each request and its SQL, report it in a ``Server-Timing`` header
+    and keep rolling per-URL stats for ``users:profiling_stats``.
+
+    Enabled by ``settings.REQUEST_PROFILING``; otherwise Django drops it from
+    the chain at startup, so it costs nothing. Put it first so the timing
+    covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiling.is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'REQUEST_PROFILING_DUPLICATES', profiling.DEFAULT_DUPLICATE_THRESHOLD)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = profiling.QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = profiling.QueryRecorder()
+        start = time.perf_counter()
+        # Connections are per thread and the async ORM runs in the request's
+        # sync thread, so the wrappers have to be installed there.
+        stack = await sync_to_async(recorder.record)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    def finish(self, request, response, recorder, wall):
+        duplicates = recorder.duplicates(self.threshold)
+        match = getattr(request, 'resolver_match', None)
+        name = (match.view_name if match else None) or '<unresolved>'
+        if duplicates:
+            profiling.logger.warning(
+                "%s ran %d queries; repeated: %s", name, recorder.count,
+                "; ".join(f"{count}x {sql[:200]}" for sql, count in duplicates),
+            )
+        profiling.stats.add(name, wall, recorder.count, recorder.duration, duplicates)
+        response['Server-Timing'] = profiling.server_timing(wall, recorder, duplicates)
+        return response
+
+
+class ReadYourWritesMiddleware:
+    """Pin a client that wrote catalog data to the primary for
+    ``DATABASE_REPLICA_MAX_LAG`` seconds, so ``read_from_replica`` views
+    show it its own writes.
+
+    Writes are seen by the router, so a GET that writes counts too. Only
+    installed when a replica is configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not routers.replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routers.track_writes() as writes:
+            response = self.get_response(request)
+        return self.pin(response, writes)
+
+    async def __acall__(self, request):
+        with routers.track_writes() as writes:
+            response = await self.get_response(request)
+        return self.pin(response, writes)
+
+    def pin(self, response, writes):
+        if writes:
+            response.set_cookie(routers.PIN_COOKIE, '1', max_age=routers.replica_max_lag(), httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from inventory.search import install_search_indexes, uninstall_search_indexes
+
+
+def install(apps, schema_editor):
+    install_search_indexes(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_product_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
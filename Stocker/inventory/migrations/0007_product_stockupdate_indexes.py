@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantity_in_stock__lte', 5)), fields=['quantity_in_stock'], name='product_low_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('expiry_date__isnull', False)), fields=['expiry_date'], name='product_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockupdate',
+            index=models.Index(fields=['product', 'timestamp'], name='stockupdate_product_time_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from inventory.rollups import rebuild_rollups
+
+
+def build_rollups(apps, schema_editor):
+    rebuild_rollups(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_lowstocknotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStockRollup',
+            fields=[
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('total_stock', models.BigIntegerField(default=0)),
+                ('low_stock_count', models.PositiveIntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_rollup', serialize=False, to='inventory.category')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplierStockRollup',
+            fields=[
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('total_stock', models.BigIntegerField(default=0)),
+                ('low_stock_count', models.PositiveIntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('supplier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_rollup', serialize=False, to='inventory.supplier')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from inventory.history import rebuild_history
+
+
+def build_history(apps, schema_editor):
+    rebuild_history(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stock_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('quantity_in', models.BigIntegerField(default=0)),
+                ('quantity_out', models.BigIntegerField(default=0)),
+                ('movements', models.PositiveIntegerField(default=0)),
+                ('closing_quantity', models.BigIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'period_start'), name='daily_movement_product_period')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WeeklyMovementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('quantity_in', models.BigIntegerField(default=0)),
+                ('quantity_out', models.BigIntegerField(default=0)),
+                ('movements', models.PositiveIntegerField(default=0)),
+                ('closing_quantity', models.BigIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'period_start'), name='weekly_movement_product_period')],
+            },
+        ),
+        migrations.RunPython(build_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_movement_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockupdate',
+            name='balance',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stockupdate',
+            name='kind',
+            field=models.CharField(choices=[('movement', 'Movement'), ('checkpoint', 'Checkpoint')], default='movement', max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='stockupdate',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'checkpoint')), fields=('product',), name='stockupdate_one_checkpoint_per_product'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_stockupdate_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderForecast',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='inventory.product')),
+                ('daily_velocity', models.FloatField()),
+                ('demand_stddev', models.FloatField()),
+                ('days_to_stockout', models.FloatField(blank=True, null=True)),
+                ('reorder_point', models.PositiveIntegerField()),
+                ('suggested_quantity', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('suggested_quantity__gt', 0)), fields=['days_to_stockout'], name='forecast_stockout_idx')],
+            },
+        ),
+    ]
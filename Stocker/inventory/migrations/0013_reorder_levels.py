@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_reorderforecast'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_low_stock_idx',
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=5, help_text='Low-stock threshold for products without their own.'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='inherits_reorder_level',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_level',
+            field=models.PositiveIntegerField(blank=True, default=5),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantity_in_stock__lte', models.F('reorder_level'))), fields=['quantity_in_stock'], name='product_low_stock_idx'),
+        ),
+    ]
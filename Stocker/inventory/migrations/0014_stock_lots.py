@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_initial_lots(apps, schema_editor):
+    # Existing stock becomes one lot per product, expiring on the product's date.
+    Product = apps.get_model('inventory', 'Product')
+    StockLot = apps.get_model('inventory', 'StockLot')
+    lots = (
+        StockLot(product_id=pk, quantity=quantity, expiry_date=expiry_date)
+        for pk, quantity, expiry_date in Product.objects.filter(quantity_in_stock__gt=0)
+        .values_list('pk', 'quantity_in_stock', 'expiry_date').iterator(chunk_size=2000)
+    )
+    StockLot.objects.bulk_create(lots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_reorder_levels'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='inventory.product')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('expiry_date__isnull', False)), fields=['expiry_date', 'id'], name='stocklot_expiry_idx'), models.Index(fields=['product', 'expiry_date', 'received_at'], name='stocklot_fefo_idx')],
+            },
+        ),
+        migrations.RunPython(open_initial_lots, migrations.RunPython.noop),
+    ]
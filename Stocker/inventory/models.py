@@ -1,10 +1,39 @@
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .search import search_queryset
 
 # Create your models here.
 
+DEFAULT_REORDER_LEVEL = 5
+
+
+class SearchQuerySet(models.QuerySet):
+
+    def search(self, query, ranked=False):
+        return search_queryset(self, query, ranked=ranked)
+
+
+class RollupQuerySet(SearchQuerySet):
+
+    def with_rollup(self):
+        # Read the precomputed stock totals instead of aggregating products.
+        return self.annotate(
+            product_count=Coalesce('stock_rollup__product_count', 0),
+            total_stock=Coalesce('stock_rollup__total_stock', 0),
+            low_stock_count=Coalesce('stock_rollup__low_stock_count', 0),
+            stock_value=Coalesce('stock_rollup__stock_value', models.Value(0, output_field=models.DecimalField())),
+        )
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
+    reorder_level = models.PositiveIntegerField(default=DEFAULT_REORDER_LEVEL, help_text="Low-stock threshold for products without their own.")
+
+    objects = RollupQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -16,9 +45,38 @@ class Supplier(models.Model):
     logo = models.ImageField(upload_to='logos/', blank=True, null=True)
     website = models.URLField(blank=True, null=True)
 
+    objects = RollupQuerySet.as_manager()
+
     def __str__(self):
         return self.name
     
+class ProductQuerySet(SearchQuerySet):
+
+    def for_list(self):
+        return self.select_related('category').prefetch_related('suppliers')
+
+    def supplied_by(self, supplier_id):
+        # A subquery instead of joining the M2M keeps one row per product.
+        links = Product.suppliers.through.objects.filter(supplier_id=supplier_id)
+        return self.filter(id__in=links.values('product_id'))
+
+    def low_stock(self):
+        # Matches the condition of product_low_stock_idx, so the index can serve it.
+        return self.filter(quantity_in_stock__lte=models.F('reorder_level'))
+
+    def filter_for_list(self, query=None, category=None, supplier=None, low_stock=False):
+        products = self
+        if query:
+            products = products.search(query)
+        if low_stock:
+            products = products.low_stock()
+        if category:
+            products = products.filter(category_id=category)
+        if supplier:
+            products = products.supplied_by(supplier)
+        return products
+
+
 class Product(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -27,22 +85,203 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     suppliers = models.ManyToManyField(Supplier)
     quantity_in_stock = models.PositiveIntegerField()
+    # Expiry given to received stock that doesn't name its own; each StockLot keeps its own date.
     expiry_date = models.DateField(null=True, blank=True)
+    # The effective threshold; copied from the category unless the product sets its own.
+    reorder_level = models.PositiveIntegerField(default=DEFAULT_REORDER_LEVEL, blank=True)
+    inherits_reorder_level = models.BooleanField(default=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['quantity_in_stock'], name='product_low_stock_idx', condition=models.Q(quantity_in_stock__lte=models.F('reorder_level'))),
+            models.Index(fields=['expiry_date'], name='product_expiry_idx', condition=models.Q(expiry_date__isnull=False)),
+        ]
 
     def __str__(self):
         return self.name
-    
+
+    def save(self, *args, **kwargs):
+        self.resolve_reorder_level()
+        super().save(*args, **kwargs)
+
+    def set_reorder_level(self, level=None):
+        """Give the product its own reorder level, or ``None`` to follow its category's."""
+        self.inherits_reorder_level = level is None
+        if level is not None:
+            self.reorder_level = int(level)
+
+    def resolve_reorder_level(self):
+        if (self.inherits_reorder_level or self.reorder_level is None) and self.category_id:
+            self.inherits_reorder_level = True
+            self.reorder_level = (
+                self.category.reorder_level if Product.category.is_cached(self)
+                else Category.objects.filter(pk=self.category_id).values_list('reorder_level', flat=True).first()
+            )
+        return self.reorder_level
 
     def is_low_stock(self):
-        return self.quantity_in_stock <= 5
+        return self.quantity_in_stock <= self.reorder_level
     
 
 class StockUpdate(models.Model):
+    MOVEMENT = 'movement'
+    CHECKPOINT = 'checkpoint'
+    KIND_CHOICES = [(MOVEMENT, 'Movement'), (CHECKPOINT, 'Checkpoint')]
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     updated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     quantity_change = models.IntegerField()
     timestamp = models.DateTimeField(auto_now_add=True)
     note = models.TextField(blank=True)
+    # A checkpoint stands in for archived movements: their net change, and the
+    # product's stock as of its timestamp.
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=MOVEMENT)
+    balance = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'timestamp'], name='stockupdate_product_time_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['product'], condition=models.Q(kind='checkpoint'), name='stockupdate_one_checkpoint_per_product'),
+        ]
+
+    def __str__(self):
+        # Only use the product's name if it was already loaded, so printing a row never queries.
+        product = self.product.name if StockUpdate.product.is_cached(self) else self.product_id
+        return f"{product} | {self.quantity_change} | {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+class StockLotQuerySet(models.QuerySet):
+
+    def expiring_within(self, days:int, today=None):
+        # Already expired lots are included; the expiry index serves the range.
+        cutoff = (today or timezone.localdate()) + timedelta(days=days)
+        return self.filter(expiry_date__isnull=False, expiry_date__lte=cutoff)
+
+
+class StockLot(models.Model):
+    """A received batch of a product's stock. A product's lots add up to its
+    ``quantity_in_stock`` and are depleted first-expired-first-out by
+    ``inventory.lots``; empty lots are deleted."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='lots')
+    quantity = models.PositiveIntegerField()
+    expiry_date = models.DateField(null=True, blank=True)
+    received_at = models.DateTimeField(default=timezone.now)
+
+    objects = StockLotQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expiry_date', 'id'], name='stocklot_expiry_idx', condition=models.Q(expiry_date__isnull=False)),
+            models.Index(fields=['product', 'expiry_date', 'received_at'], name='stocklot_fefo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} | {self.quantity} | expires {self.expiry_date or '-'}"
+
+    def is_expired(self):
+        return self.expiry_date is not None and self.expiry_date < timezone.localdate()
+
+
+class LowStockNotification(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at'], name='lowstock_pending_idx', condition=models.Q(sent_at__isnull=True)),
+        ]
+        constraints = [
+            # At most one unsent alert per product; later alerts refresh it instead.
+            models.UniqueConstraint(fields=['product'], condition=models.Q(sent_at__isnull=True), name='lowstock_one_pending_per_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} | {'sent' if self.sent_at else 'pending'}"
+
+
+class StockRollup(models.Model):
+    product_count = models.PositiveIntegerField(default=0)
+    total_stock = models.BigIntegerField(default=0)
+    low_stock_count = models.PositiveIntegerField(default=0)
+    stock_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class CategoryStockRollup(StockRollup):
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='stock_rollup')
+
+    def __str__(self):
+        return f"{self.category_id} | {self.product_count} products | {self.total_stock} in stock"
+
+
+class SupplierStockRollup(StockRollup):
+    supplier = models.OneToOneField(Supplier, on_delete=models.CASCADE, primary_key=True, related_name='stock_rollup')
+
+    def __str__(self):
+        return f"{self.supplier_id} | {self.product_count} products | {self.total_stock} in stock"
+
+
+class MovementRollup(models.Model):
+    """Net stock movement of one product over one period, kept up to date by
+    ``inventory.history`` whenever ledger rows are written."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    period_start = models.DateField()
+    quantity_in = models.BigIntegerField(default=0)
+    quantity_out = models.BigIntegerField(default=0)
+    movements = models.PositiveIntegerField(default=0)
+    closing_quantity = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.product_id} | {self.period_start} | +{self.quantity_in} -{self.quantity_out}"
+
+
+class DailyMovementRollup(MovementRollup):
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'period_start'], name='daily_movement_product_period'),
+        ]
+
+
+class WeeklyMovementRollup(MovementRollup):
+    """``period_start`` is the Monday of the week."""
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'period_start'], name='weekly_movement_product_period'),
+        ]
+
+
+class ReorderForecast(models.Model):
+    """Latest demand forecast per product, replaced by ``refresh_forecasts``."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='forecast')
+    daily_velocity = models.FloatField()
+    demand_stddev = models.FloatField()
+    days_to_stockout = models.FloatField(null=True, blank=True)
+    reorder_point = models.PositiveIntegerField()
+    suggested_quantity = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['days_to_stockout'], name='forecast_stockout_idx', condition=models.Q(suggested_quantity__gt=0)),
+        ]
 
     def __str__(self):
-        return f"{self.product.name} | {self.quantity_change} | {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.product_id} | {self.daily_velocity:.2f}/day | reorder {self.suggested_quantity}"
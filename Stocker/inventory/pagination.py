@@ -0,0 +1,178 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import HttpRequest
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _cursor_value(value):
+    # Full precision: DjangoJSONEncoder would cut datetimes to milliseconds.
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(direction:str, values:list):
+    raw = json.dumps([direction, values], separators=(',', ':'), default=_cursor_value).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token:str):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(token)
+    return direction, values
+
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list:list, paginator, has_next:bool, has_previous:bool):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor('next', self.paginator.key(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor('prev', self.paginator.key(self.object_list[0]))
+
+
+class CursorPaginator:
+    """Keyset paginator: pages are found by seeking past the last row's
+    ``ordering`` values, so page 1000 costs the same as page 1 and no
+    ``COUNT(*)`` is run. ``ordering`` must end with a unique field; fields
+    may be descending, e.g. ``('-timestamp', '-id')``.
+    """
+
+    def __init__(self, queryset, per_page:int, ordering=('name', 'id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def key(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _seek(self, values:list, forward:bool):
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(values)
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            lookup = 'gt' if forward != field.startswith('-') else 'lt'
+            step = Q(**{f'{field.lstrip("-")}__{lookup}': values[i]})
+            for previous, value in zip(self.fields[:i], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def _query(self, cursor:str=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        direction, values = decode_cursor(cursor) if cursor else ('next', None)
+        if direction == 'prev':
+            reverse = [f[1:] if f.startswith('-') else f'-{f}' for f in self.ordering]
+            queryset = queryset.filter(self._seek(values, forward=False)).order_by(*reverse)
+        elif values is not None:
+            queryset = queryset.filter(self._seek(values, forward=True))
+        return queryset[:self.per_page + 1], direction, values
+
+    def _build(self, rows:list, direction:str, values):
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=more)
+        return CursorPage(rows, self, has_next=more, has_previous=values is not None)
+
+    def page(self, cursor:str=None):
+        queryset, direction, values = self._query(cursor)
+        return self._build(list(queryset), direction, values)
+
+    async def apage(self, cursor:str=None):
+        queryset, direction, values = self._query(cursor)
+        return self._build([row async for row in queryset], direction, values)
+
+    def get_page(self, cursor:str=None):
+        try:
+            return self.page(cursor)
+        except (InvalidCursor, ValueError, ValidationError):
+            # Includes well-formed tokens whose values don't fit the fields.
+            return self.page(None)
+
+    async def aget_page(self, cursor:str=None):
+        try:
+            return await self.apage(cursor)
+        except (InvalidCursor, ValueError, ValidationError):
+            return await self.apage(None)
+
+
+def use_cursor_pagination(request:HttpRequest):
+    return getattr(settings, 'CURSOR_PAGINATION', False) or 'cursor' in request.GET
+
+
+def paginate(request:HttpRequest, queryset, per_page:int=10, ordering=('name', 'id')):
+    """Return the requested page of ``queryset``.
+
+    Offset pages are used by default; cursor pages are used when
+    ``settings.CURSOR_PAGINATION`` is on or the request carries a cursor.
+    """
+    if use_cursor_pagination(request):
+        return CursorPaginator(queryset, per_page, ordering).get_page(request.GET.get('cursor'))
+
+    page = Paginator(queryset.order_by(*ordering), per_page).get_page(request.GET.get('page'))
+    page.nearby_pages = range(max(page.number - 2, 1), min(page.number + 2, page.paginator.num_pages) + 1)
+    return page
+
+
+async def apaginate(request:HttpRequest, queryset, per_page:int=10, ordering=('name', 'id')):
+    """``paginate`` for async views: the count and the page rows are read with the async ORM."""
+    if use_cursor_pagination(request):
+        return await CursorPaginator(queryset, per_page, ordering).aget_page(request.GET.get('cursor'))
+
+    paginator = Paginator(queryset.order_by(*ordering), per_page)
+    # Fill the cached count so get_page doesn't run a blocking COUNT(*).
+    paginator.count = await paginator.object_list.acount()
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = [obj async for obj in page.object_list]
+    page.nearby_pages = range(max(page.number - 2, 1), min(page.number + 2, page.paginator.num_pages) + 1)
+    return page
@@ -0,0 +1,106 @@
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 500
+# The same statement run this many times in one request is reported as an N+1.
+DEFAULT_DUPLICATE_THRESHOLD = 5
+
+
+def is_enabled():
+    return getattr(settings, 'REQUEST_PROFILING', False)
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts and times every query of a request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            # Parameters are left out, so a query repeated per row shows up as one statement.
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold:int):
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+    def record(self):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+
+def percentile(values:list, p:float):
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return None
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+class RequestStats:
+    """Rolling window of the last ``window`` requests per URL name, kept in
+    this process's memory."""
+
+    def __init__(self, window:int=DEFAULT_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.duplicates = defaultdict(Counter)
+
+    def add(self, name:str, wall:float, queries:int, sql:float, duplicates=()):
+        with self.lock:
+            self.samples[name].append((wall, queries, sql))
+            for statement, count in duplicates:
+                self.duplicates[name][statement] += count
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.duplicates.clear()
+
+    def summary(self):
+        with self.lock:
+            samples = {name: list(rows) for name, rows in self.samples.items()}
+            duplicates = {name: counter.most_common(5) for name, counter in self.duplicates.items()}
+        report = {}
+        for name, rows in sorted(samples.items()):
+            walls, queries, sql = (sorted(column) for column in zip(*rows))
+            report[name] = {
+                'requests': len(rows),
+                'wall_ms': {f'p{p}': round(percentile(walls, p) * 1000, 2) for p in (50, 95, 99)},
+                'sql_ms': {f'p{p}': round(percentile(sql, p) * 1000, 2) for p in (50, 95, 99)},
+                'queries': {'p50': percentile(queries, 50), 'p95': percentile(queries, 95), 'max': queries[-1]},
+                'duplicate_queries': [{'sql': statement, 'count': count} for statement, count in duplicates.get(name, [])],
+            }
+        return report
+
+
+stats = RequestStats(getattr(settings, 'REQUEST_PROFILING_WINDOW', DEFAULT_WINDOW))
+
+
+def server_timing(wall:float, recorder:QueryRecorder, duplicates:list):
+    metrics = [
+        f'total;dur={wall * 1000:.1f}',
+        f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+    ]
+    if duplicates:
+        metrics.append(f'dup;desc="{sum(count for _, count in duplicates)} repeated queries"')
+    return ', '.join(metrics)
@@ -0,0 +1,77 @@
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+from .caching import bump_versions, get_versions
+
+
+SESSION_KEY = '_group_names'
+# Re-read groups at least this often, in case a version bump happened in
+# another process's local cache.
+ROLE_CACHE_TTL = 300
+
+
+def _user_version(user_id:int):
+    return f'user_groups:{user_id}'
+
+
+def get_group_names(request):
+    """Names of the current user's groups, cached in the session.
+
+    The entry is dropped when the user's membership or any group changes,
+    see ``invalidate_user_groups``.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+    versions = list(get_versions('group', _user_version(user.pk)))
+    session = getattr(request, 'session', None)
+    cached = session.get(SESSION_KEY) if session is not None else None
+    if cached and cached[0] == user.pk and cached[1] == versions and time.time() - cached[2] < ROLE_CACHE_TTL:
+        return frozenset(cached[3])
+    names = frozenset(user.groups.values_list('name', flat=True))
+    if session is not None:
+        session[SESSION_KEY] = [user.pk, versions, time.time(), sorted(names)]
+    return names
+
+
+def has_group(request, name:str):
+    names = getattr(request, 'group_names', None)
+    if names is None:
+        names = request.group_names = get_group_names(request)
+    return name in names
+
+
+async def ahas_group(request, name:str):
+    return await sync_to_async(has_group)(request, name)
+
+
+def group_required(name:str):
+    """Like ``user_passes_test``, for membership of the group ``name``.
+    Works on sync and async views."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if await ahas_group(request, name):
+                    return await view(request, *args, **kwargs)
+                return redirect_to_login(request.get_full_path())
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if has_group(request, name):
+                return view(request, *args, **kwargs)
+            return redirect_to_login(request.get_full_path())
+        return wrapper
+    return decorator
+
+
+def invalidate_user_groups(*user_ids:int):
+    """Drop cached group names for ``user_ids``, or for everyone when none are given."""
+    if user_ids:
+        bump_versions(*[_user_version(user_id) for user_id in user_ids])
+    else:
+        bump_versions('group')
@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.utils import timezone
+
+
+FIELDS = ('product_count', 'total_stock', 'low_stock_count', 'stock_value')
+
+
+def contribution(quantity, price, reorder_level, count:int=1):
+    """What one product adds to each rollup it belongs to."""
+    quantity = int(quantity)
+    price = Decimal(str(price))
+    return (count, quantity, int(quantity <= int(reorder_level)), price * quantity)
+
+
+def difference(new, old):
+    return tuple(n - o for n, o in zip(new, old))
+
+
+def combine(deltas:dict, key, delta):
+    current = deltas.get(key)
+    deltas[key] = delta if current is None else tuple(c + d for c, d in zip(current, delta))
+
+
+def _models(apps):
+    return (
+        apps.get_model('inventory', 'Product'),
+        apps.get_model('inventory', 'Category'),
+        apps.get_model('inventory', 'Supplier'),
+        apps.get_model('inventory', 'CategoryStockRollup'),
+        apps.get_model('inventory', 'SupplierStockRollup'),
+    )
+
+
+def apply_deltas(model, deltas:dict, rebuild_missing:bool=True):
+    """Add per-key ``(count, stock, low, value)`` deltas to rollup rows in one UPDATE.
+
+    Keys without a rollup row yet are rebuilt from the catalog instead, unless
+    ``rebuild_missing`` is false: when a product goes in a cascade, a missing
+    row means its category or supplier is being deleted too.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    changes = {}
+    for i, field in enumerate(FIELDS):
+        if len(deltas) == 1:
+            (value,) = [delta[i] for delta in deltas.values()]
+            changes[field] = F(field) + Value(value)
+        else:
+            changes[field] = F(field) + Case(
+                *[When(pk=pk, then=Value(delta[i])) for pk, delta in deltas.items()],
+                default=Value(0),
+                output_field=model._meta.get_field(field),
+            )
+    updated = model.objects.filter(pk__in=deltas).update(updated_at=timezone.now(), **changes)
+    if updated < len(deltas) and rebuild_missing:
+        if model._meta.model_name == 'categorystockrollup':
+            rebuild_rollups(category_ids=list(deltas), supplier_ids=[])
+        else:
+            rebuild_rollups(category_ids=[], supplier_ids=list(deltas))
+
+
+def apply_product_change(category_deltas:dict, supplier_deltas:dict, rebuild_missing:bool=True):
+    from .models import CategoryStockRollup, SupplierStockRollup
+    apply_deltas(CategoryStockRollup, category_deltas, rebuild_missing)
+    apply_deltas(SupplierStockRollup, supplier_deltas, rebuild_missing)
+
+
+def supplier_ids_for(product_ids):
+    from .models import Product
+    links = {}
+    for product_id, supplier_id in Product.suppliers.through.objects.filter(product_id__in=product_ids).values_list('product_id', 'supplier_id'):
+        links.setdefault(product_id, []).append(supplier_id)
+    return links
+
+
+def record_stock_changes(changes):
+    """Apply stock changes of
+    ``(product_id, category_id, price, reorder_level, old_quantity, new_quantity)``."""
+    changes = [change for change in changes if change[4] != change[5]]
+    if not changes:
+        return
+    links = supplier_ids_for([change[0] for change in changes])
+    category_deltas, supplier_deltas = {}, {}
+    for product_id, category_id, price, reorder_level, old_quantity, new_quantity in changes:
+        delta = difference(contribution(new_quantity, price, reorder_level), contribution(old_quantity, price, reorder_level))
+        combine(category_deltas, category_id, delta)
+        for supplier_id in links.get(product_id, []):
+            combine(supplier_deltas, supplier_id, delta)
+    apply_product_change(category_deltas, supplier_deltas)
+
+
+def _totals(queryset, key:str, prefix:str='', reorder_level=None):
+    value = ExpressionWrapper(
+        F(f'{prefix}price') * F(f'{prefix}quantity_in_stock'),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+    rows = queryset.values(key).annotate(
+        product_count=Count('pk'),
+        total_stock=Sum(f'{prefix}quantity_in_stock'),
+        low_stock_count=Count('pk', filter=Q(**{f'{prefix}quantity_in_stock__lte': reorder_level or F(f'{prefix}reorder_level')})),
+        stock_value=Sum(value),
+    ).order_by()
+    return {row[key]: row for row in rows}
+
+
+def rebuild_rollups(category_ids=None, supplier_ids=None, apps=global_apps):
+    """Recompute rollup rows from the catalog; ``None`` ids mean every row."""
+    Product, Category, Supplier, CategoryStockRollup, SupplierStockRollup = _models(apps)
+    Through = Product.suppliers.through
+    # Migrations that run before products had their own levels use the old fixed one.
+    fixed_level = None if any(field.name == 'reorder_level' for field in Product._meta.get_fields()) else 5
+    targets = (
+        (Category, CategoryStockRollup, 'category_id', category_ids, Product.objects.all(), 'category_id', ''),
+        (Supplier, SupplierStockRollup, 'supplier_id', supplier_ids, Through.objects.all(), 'supplier_id', 'product__'),
+    )
+    with transaction.atomic():
+        for owner, rollup, field, ids, source, key, prefix in targets:
+            owners = owner.objects.all()
+            if ids is not None:
+                if not ids:
+                    continue
+                owners = owners.filter(pk__in=ids)
+                source = source.filter(**{f'{key}__in': ids})
+            totals = _totals(source, key, prefix, fixed_level)
+            pks = list(owners.values_list('pk', flat=True))
+            if ids is None:
+                rollup.objects.all().delete()
+            else:
+                rollup.objects.filter(pk__in=ids).delete()
+            rollup.objects.bulk_create([
+                rollup(**{field: pk}, **{name: totals.get(pk, {}).get(name) or 0 for name in FIELDS})
+                for pk in pks
+            ], batch_size=1000)
@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+
+REPLICA_ALIAS = 'replica'
+# Only catalog data goes to the replica; sessions and auth always read the
+# primary, so a fresh login is never lost to replication lag.
+ROUTED_APPS = {'inventory'}
+PIN_COOKIE = 'db_pin'
+
+_read_alias = ContextVar('read_alias', default=None)
+_request_writes = ContextVar('request_writes', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def reading_from_replica():
+    return _read_alias.get() == REPLICA_ALIAS
+
+
+class ReplicaRouter:
+    """Send reads made under ``use_replica`` to the replica; everything else,
+    and every write, goes to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in ROUTED_APPS:
+            return _read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None and model._meta.app_label in ROUTED_APPS:
+            writes.add(model._meta.label)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica gets its schema from the primary.
+        return db != REPLICA_ALIAS
+
+
+@contextmanager
+def use_replica():
+    token = _read_alias.set(REPLICA_ALIAS if replica_configured() else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def track_writes():
+    """Collect the labels of the routed models written while active."""
+    writes = set()
+    token = _request_writes.set(writes)
+    try:
+        yield writes
+    finally:
+        _request_writes.reset(token)
+
+
+def _pinned(iterator):
+    iterator = iter(iterator)
+    while True:
+        with use_replica():
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+async def _apinned(iterator):
+    iterator = aiter(iterator)
+    while True:
+        with use_replica():
+            try:
+                chunk = await anext(iterator)
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+def _on_replica(response):
+    # Streaming bodies are read after the view returns, outside its context.
+    if response.streaming:
+        content = response.streaming_content
+        response.streaming_content = _apinned(content) if response.is_async else _pinned(content)
+    return response
+
+
+def read_from_replica(view):
+    """Run a read-only view's catalog queries on the replica, unless this
+    client wrote recently (see ``ReadYourWritesMiddleware``)."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.COOKIES.get(PIN_COOKIE) or not replica_configured():
+                return await view(request, *args, **kwargs)
+            with use_replica():
+                return _on_replica(await view(request, *args, **kwargs))
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.COOKIES.get(PIN_COOKIE) or not replica_configured():
+            return view(request, *args, **kwargs)
+        with use_replica():
+            return _on_replica(view(request, *args, **kwargs))
+    return wrapper
+
+
+def replica_max_lag():
+    return getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
@@ -0,0 +1,185 @@
+import re
+import sqlite3
+from functools import cache
+
+from django.core.exceptions import SynchronousOnlyOperation
+from django.db import connections, OperationalError
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+# Tables that get a full-text index, and the columns indexed for each.
+SEARCH_INDEXES = {
+    'inventory_product': ('name', 'description'),
+    'inventory_category': ('name',),
+    'inventory_supplier': ('name',),
+}
+
+def fts_table(table:str):
+    return f'{table}_fts'
+
+
+def search_terms(text:str):
+    return re.findall(r'\w+', text or '')
+
+
+def fts_query(text:str):
+    # Every word must match, each as a prefix: "gree te" finds "Green Tea".
+    return ' '.join(f'"{term}"*' for term in search_terms(text))
+
+
+def install_search_indexes(connection):
+    """Create the search indexes for ``connection`` if they are missing.
+
+    Safe to run repeatedly; it is called from a migration and again after
+    every ``migrate`` because SQLite table rebuilds drop the sync triggers.
+    """
+    if connection.vendor == 'sqlite':
+        _install_sqlite(connection)
+        _fts_tables[_database_key(connection)] = _has_fts_tables(connection)
+    elif connection.vendor == 'postgresql':
+        _install_postgresql(connection)
+
+
+def uninstall_search_indexes(connection):
+    _fts_tables.pop(_database_key(connection), None)
+    with connection.cursor() as cursor:
+        for table, fields in SEARCH_INDEXES.items():
+            if connection.vendor == 'sqlite':
+                fts = fts_table(table)
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+                cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+            elif connection.vendor == 'postgresql':
+                for field in fields:
+                    cursor.execute(f"DROP INDEX IF EXISTS {table}_{field}_trgm")
+
+
+def _install_sqlite(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        if not set(SEARCH_INDEXES) <= existing:
+            return
+        for table, fields in SEARCH_INDEXES.items():
+            fts = fts_table(table)
+            columns = ', '.join(fields)
+            new = ', '.join(f'new.{f}' for f in fields)
+            old = ', '.join(f'old.{f}' for f in fields)
+            triggers = {f'{fts}_ai', f'{fts}_ad', f'{fts}_au'}
+            if fts in existing and triggers <= existing:
+                continue
+            if fts not in existing:
+                try:
+                    cursor.execute(
+                        f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', content_rowid='id', "
+                        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                    )
+                except OperationalError:
+                    # SQLite built without FTS5: searches fall back to LIKE.
+                    return
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); END"
+            )
+            # Only indexed columns re-index, so stock updates never touch the FTS table.
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+                f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END"
+            )
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _install_postgresql(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, fields in SEARCH_INDEXES.items():
+            for field in fields:
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_{field}_trgm ON {table} USING gin ({field} gin_trgm_ops)"
+                )
+
+
+@cache
+def sqlite_has_fts5():
+    try:
+        sqlite3.connect(':memory:').execute("CREATE VIRTUAL TABLE probe USING fts5(body)")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+# Whether each database has the FTS tables, by (alias, name). Filled when a
+# connection opens, and updated by install_search_indexes after every migrate.
+_fts_tables = {}
+
+
+def _database_key(connection):
+    return connection.alias, str(connection.settings_dict['NAME'])
+
+
+def _has_fts_tables(connection):
+    names = [fts_table(table) for table in SEARCH_INDEXES]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join(['%s'] * len(names))})", names,
+        )
+        return cursor.fetchone()[0] == len(names)
+
+
+def check_fts_tables(sender, connection, **kwargs):
+    """``connection_created`` receiver: look the FTS tables up once per database."""
+    if connection.vendor == 'sqlite' and _database_key(connection) not in _fts_tables:
+        _fts_tables[_database_key(connection)] = sqlite_has_fts5() and _has_fts_tables(connection)
+
+
+def uses_fts(connection):
+    """Whether searches on ``connection`` can use FTS5; without the tables they fall back to LIKE."""
+    if connection.vendor != 'sqlite' or not sqlite_has_fts5():
+        return False
+    key = _database_key(connection)
+    if key not in _fts_tables:
+        try:
+            _fts_tables[key] = _has_fts_tables(connection)
+        except SynchronousOnlyOperation:
+            # Queryset built in async code before this database was opened.
+            return False
+    return _fts_tables[key]
+
+
+def search_queryset(queryset, text:str, ranked:bool=False):
+    """Filter ``queryset`` to rows matching every word of ``text``.
+
+    Uses the FTS5 index on SQLite and trigram-indexed ILIKE elsewhere. With
+    ``ranked`` the best matches come first.
+    """
+    table = queryset.model._meta.db_table
+    fields = SEARCH_INDEXES[table]
+    connection = connections[queryset.db]
+    match = fts_query(text)
+
+    if match and uses_fts(connection):
+        fts = fts_table(table)
+        queryset = queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [match]))
+        if ranked:
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f'SELECT rank FROM {fts} WHERE {fts} MATCH %s AND rowid = "{table}"."id"', [match]
+            )).order_by('search_rank', 'pk')
+        return queryset
+
+    condition = Q()
+    for term in search_terms(text) or [text]:
+        any_field = Q()
+        for field in fields:
+            any_field |= Q(**{f'{field}__icontains': term})
+        condition &= any_field
+    queryset = queryset.filter(condition)
+    if ranked and connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        queryset = queryset.annotate(search_rank=TrigramSimilarity(fields[0], text)).order_by('-search_rank', 'pk')
+    return queryset
@@ -0,0 +1,338 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction, IntegrityError
+from django.db.models import F, Case, When, Value
+from django.utils import timezone
+
+from . import history, lots
+from .caching import bump_versions
+from .forms import ProductForm
+from .models import Product, StockUpdate, LowStockNotification
+from .rollups import record_stock_changes
+
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF = timedelta(seconds=30)
+OUTBOX_MAX_BACKOFF = timedelta(hours=1)
+# How long a claimed alert is left to its drain before another may retry it.
+OUTBOX_LEASE = timedelta(minutes=10)
+MAX_MOVEMENTS = 1000
+
+
+class StockError(Exception):
+    pass
+
+
+class InsufficientStock(StockError):
+    pass
+
+
+class BelowReorderLevel(StockError):
+    def __init__(self, reorder_level:int):
+        super().__init__(f"Stock must be greater than the reorder level ({reorder_level}) when adding or updating a product.")
+        self.reorder_level = reorder_level
+
+
+class StockAdjustment:
+    def __init__(self, product_id:int, name:str, old_quantity:int, new_quantity:int, stock_update:StockUpdate, reorder_level:int):
+        self.product_id = product_id
+        self.name = name
+        self.old_quantity = old_quantity
+        self.new_quantity = new_quantity
+        self.stock_update = stock_update
+        self.reorder_level = reorder_level
+
+    @property
+    def became_low_stock(self):
+        return became_low_stock(self.old_quantity, self.new_quantity, self.reorder_level)
+
+
+def became_low_stock(old_quantity:int, new_quantity:int, reorder_level:int):
+    return new_quantity <= reorder_level < old_quantity
+
+
+def product_list_queryset(params):
+    """The product list for the ``q``, ``category``, ``supplier`` and ``low_stock`` filters in ``params``."""
+    return Product.objects.for_list().filter_for_list(
+        query=params.get('q'),
+        category=params.get('category'),
+        supplier=params.get('supplier'),
+        low_stock=params.get('low_stock') == '1',
+    )
+
+
+def check_reorder_level(product:Product, quantity:int):
+    """Products are added and edited with stock above their reorder level."""
+    reorder_level = product.resolve_reorder_level()
+    if quantity <= reorder_level:
+        raise BelowReorderLevel(reorder_level)
+
+
+def create_product(form):
+    """Save a valid ``ProductForm``, new or edited; raises ``BelowReorderLevel``."""
+    product = form.save(commit=False)
+    check_reorder_level(product, product.quantity_in_stock)
+    with transaction.atomic():
+        product.save()
+        form.save_m2m()
+    return product
+
+
+def update_product(product:Product, data, files):
+    """Apply the product edit form to ``product`` and save.
+
+    Raises ``ValidationError`` with the form's errors, or ``BelowReorderLevel``.
+    """
+    form = ProductForm(data, files, instance=product)
+    if not form.is_valid():
+        raise ValidationError(form.errors.as_data())
+    return create_product(form)
+
+
+def parse_stock_form(data):
+    """``(quantity_change, expiry_date, note)`` from the stock update form."""
+    try:
+        quantity_change = int(data.get('quantity_change'))
+    except (TypeError, ValueError):
+        raise StockError("Invaild quantity.")
+    try:
+        expiry_date = date.fromisoformat(data['expiry_date']) if data.get('expiry_date') else None
+    except ValueError:
+        raise StockError("Invalid expiry date.")
+    return quantity_change, expiry_date, data.get('note', '')
+
+
+def adjust_stock(product_id:int, quantity_change:int, user=None, note:str='', expiry_date=None):
+    """Apply ``quantity_change`` to a product's stock and record it in the ledger.
+
+    The change is a single conditional ``UPDATE`` so concurrent adjustments
+    never lose updates and stock can't go negative. Added stock is received
+    as a lot expiring on ``expiry_date`` (default: the product's), removed
+    stock is drawn from the lots first expired first out. Raises
+    ``Product.DoesNotExist`` or ``InsufficientStock``.
+    """
+    with transaction.atomic():
+        updated = Product.objects.filter(
+            pk=product_id,
+            quantity_in_stock__gte=-quantity_change,
+        ).update(quantity_in_stock=F('quantity_in_stock') + quantity_change)
+        if not updated:
+            if not Product.objects.filter(pk=product_id).exists():
+                raise Product.DoesNotExist(f"Product {product_id} does not exist.")
+            raise InsufficientStock("Resulting stock can't be negative.")
+
+        # The row stays locked by our UPDATE until commit, so this reads our own write.
+        name, new_quantity, category_id, price, reorder_level, default_expiry = (
+            Product.objects.filter(pk=product_id)
+            .values_list('name', 'quantity_in_stock', 'category_id', 'price', 'reorder_level', 'expiry_date').get()
+        )
+        stock_update = StockUpdate.objects.create(
+            product_id=product_id,
+            updated_by=user,
+            quantity_change=quantity_change,
+            note=note,
+        )
+        bump_versions('product')
+        record_stock_changes([(product_id, category_id, price, reorder_level, new_quantity - quantity_change, new_quantity)])
+        history.record_movements([(product_id, quantity_change, new_quantity, stock_update.timestamp)])
+        if quantity_change > 0:
+            lots.receive([(product_id, quantity_change, expiry_date or default_expiry)])
+        else:
+            lots.deplete({product_id: -quantity_change})
+
+        adjustment = StockAdjustment(product_id, name, new_quantity - quantity_change, new_quantity, stock_update, reorder_level)
+        if adjustment.became_low_stock:
+            queue_low_stock_alert(adjustment.product_id, adjustment.name, adjustment.new_quantity)
+    return adjustment
+
+
+def _parse_movement(item):
+    if not isinstance(item, dict):
+        raise StockError("Movement must be an object.")
+    product_id, quantity_change = item.get('product_id'), item.get('quantity_change')
+    if type(product_id) is not int or type(quantity_change) is not int:
+        raise StockError("product_id and quantity_change must be integers.")
+    note = item.get('note', '')
+    if not isinstance(note, str):
+        raise StockError("note must be a string.")
+    expiry_date = item.get('expiry_date')
+    if expiry_date is not None:
+        try:
+            expiry_date = date.fromisoformat(expiry_date)
+        except (TypeError, ValueError):
+            raise StockError("expiry_date must be a YYYY-MM-DD date.")
+    return product_id, quantity_change, note, expiry_date
+
+
+def apply_stock_movements(movements:list, user=None):
+    """Apply a batch of ``{product_id, quantity_change, note, expiry_date}`` movements.
+
+    All products are locked with one query and every movement is checked in
+    order against the running balance. If any movement is invalid nothing is
+    written. Otherwise all deltas go out as one ``UPDATE`` and the ledger rows
+    as one ``bulk_create``. Receipts become lots before any stock is drawn
+    from the lots, first expired first out. Returns ``(ok, results)`` with
+    one result per movement.
+    """
+    if len(movements) > MAX_MOVEMENTS:
+        raise StockError(f"At most {MAX_MOVEMENTS} movements per request.")
+
+    parsed, results = [], []
+    for index, item in enumerate(movements):
+        try:
+            parsed.append(_parse_movement(item))
+            results.append({'index': index, 'status': 'ok'})
+        except StockError as e:
+            parsed.append(None)
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
+
+    with transaction.atomic():
+        ids = {movement[0] for movement in parsed if movement}
+        products = Product.objects.select_for_update().only('id', 'name', 'quantity_in_stock', 'category_id', 'price', 'reorder_level', 'expiry_date').in_bulk(ids)
+        balances = {pk: product.quantity_in_stock for pk, product in products.items()}
+        for movement, result in zip(parsed, results):
+            if movement is None:
+                continue
+            product_id, quantity_change = movement[:2]
+            result['product_id'] = product_id
+            if product_id not in balances:
+                result.update(status='error', error="Product does not exist.")
+            elif balances[product_id] + quantity_change < 0:
+                result.update(status='error', error="Resulting stock can't be negative.")
+            else:
+                balances[product_id] += quantity_change
+                result['quantity_in_stock'] = balances[product_id]
+
+        if any(result['status'] == 'error' for result in results):
+            for result in results:
+                result.pop('quantity_in_stock', None)
+            return False, results
+
+        deltas = {pk: balances[pk] - products[pk].quantity_in_stock for pk in balances}
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if deltas:
+            # Relative update, so even backends without row locks can't lose a write.
+            Product.objects.filter(pk__in=deltas).update(quantity_in_stock=F('quantity_in_stock') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                default=Value(0),
+            ))
+        stock_updates = StockUpdate.objects.bulk_create([
+            StockUpdate(product_id=product_id, updated_by=user, quantity_change=quantity_change, note=note)
+            for product_id, quantity_change, note, _ in parsed
+        ])
+        bump_versions('product', 'stockupdate')
+        history.record_movements([
+            (update.product_id, update.quantity_change, result['quantity_in_stock'], update.timestamp)
+            for update, result in zip(stock_updates, results)
+        ])
+        receipts, drawn = {}, {}
+        for product_id, quantity_change, _, expiry_date in parsed:
+            if quantity_change > 0:
+                key = (product_id, expiry_date or products[product_id].expiry_date)
+                receipts[key] = receipts.get(key, 0) + quantity_change
+            else:
+                drawn[product_id] = drawn.get(product_id, 0) - quantity_change
+        lots.receive([(product_id, quantity, expiry_date) for (product_id, expiry_date), quantity in receipts.items()])
+        lots.deplete(drawn)
+        record_stock_changes([
+            (pk, products[pk].category_id, products[pk].price, products[pk].reorder_level, products[pk].quantity_in_stock, balances[pk])
+            for pk in deltas
+        ])
+        for pk in deltas:
+            old_quantity, new_quantity = products[pk].quantity_in_stock, balances[pk]
+            if became_low_stock(old_quantity, new_quantity, products[pk].reorder_level):
+                queue_low_stock_alert(pk, products[pk].name, new_quantity)
+    return True, results
+
+
+def queue_low_stock_alert(product_id:int, name:str, quantity:int):
+    """Write a low-stock alert to the outbox; ``drain_outbox`` sends it later.
+
+    Call inside the stock change's transaction so the alert exists only if
+    the change commits. A product keeps a single pending alert, refreshed
+    with the latest quantity.
+    """
+    subject = f"Low Stock Alert: {name}"
+    message = f"{name} has only {quantity} left in stock."
+
+    def refresh():
+        # A new alert starts over, so one that ran out of attempts is sent again.
+        return LowStockNotification.objects.filter(product_id=product_id, sent_at__isnull=True).update(
+            subject=subject, message=message, attempts=0, next_attempt_at=timezone.now(),
+        )
+
+    if not refresh():
+        try:
+            with transaction.atomic():
+                LowStockNotification.objects.create(product_id=product_id, subject=subject, message=message)
+        except IntegrityError:
+            # Another writer queued one first; refresh theirs instead.
+            refresh()
+
+
+def backoff_delay(attempts:int):
+    return min(OUTBOX_BACKOFF * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF)
+
+
+def drain_outbox(batch_size:int=OUTBOX_BATCH_SIZE, max_attempts:int=OUTBOX_MAX_ATTEMPTS):
+    """Send due outbox alerts over one mail connection; returns (sent, failed).
+
+    Alerts are claimed in a short transaction that leases them for
+    ``OUTBOX_LEASE``, sent with no transaction open, then recorded in a
+    second one, so a slow mail server never holds database locks. Failed
+    alerts are retried with exponential backoff until ``max_attempts``; an
+    alert claimed by a drain that died is retried once its lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        pending = list(
+            LowStockNotification.objects
+            .select_for_update(skip_locked=True)
+            .filter(sent_at__isnull=True, next_attempt_at__lte=now, attempts__lt=max_attempts)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if not pending:
+            return 0, 0
+        for notification in pending:
+            notification.attempts += 1
+            notification.next_attempt_at = now + OUTBOX_LEASE
+        LowStockNotification.objects.bulk_update(pending, ['attempts', 'next_attempt_at'])
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        connection_error = e
+    else:
+        connection_error = None
+    for notification in pending:
+        try:
+            if connection_error:
+                raise connection_error
+            EmailMessage(
+                subject=notification.subject,
+                body=notification.message,
+                from_email=settings.EMAIL_HOST_USER,
+                to=[settings.EMAIL_HOST_USER],
+                connection=connection,
+            ).send()
+        except Exception as e:
+            notification.last_error = str(e)
+            notification.next_attempt_at = timezone.now() + backoff_delay(notification.attempts)
+            failed += 1
+        else:
+            notification.sent_at = timezone.now()
+            notification.last_error = ''
+            sent += 1
+    if not connection_error:
+        connection.close()
+
+    with transaction.atomic():
+        # attempts is left alone: a refresh may have reset it since the claim.
+        LowStockNotification.objects.bulk_update(pending, ['last_error', 'next_attempt_at', 'sent_at'])
+    return sent, failed
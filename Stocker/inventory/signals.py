@@ -0,0 +1,183 @@
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+
+from . import lots, roles, rollups, thumbnails
+from .caching import bump_versions
+from .models import Product, Category, Supplier, StockUpdate, CategoryStockRollup, SupplierStockRollup
+
+
+def bump_model_version(sender, **kwargs):
+    bump_versions(sender._meta.model_name)
+
+
+def bump_product_suppliers(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_versions('product', 'supplier')
+
+
+def create_rollup(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollup = CategoryStockRollup if sender is Category else SupplierStockRollup
+        rollup.objects.get_or_create(pk=instance.pk)
+
+
+def snapshot_product(sender, instance, raw=False, **kwargs):
+    instance._rollup_snapshot = None
+    if instance.pk and not raw:
+        instance._rollup_snapshot = (
+            Product.objects.filter(pk=instance.pk).values_list('category_id', 'price', 'quantity_in_stock', 'reorder_level').first()
+        )
+
+
+def update_product_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = rollups.contribution(instance.quantity_in_stock, instance.price, instance.reorder_level)
+    snapshot = getattr(instance, '_rollup_snapshot', None)
+    if snapshot is None:
+        rollups.apply_product_change({int(instance.category_id): new}, {})
+        return
+    old_category, old_price, old_quantity, old_level = snapshot
+    old = rollups.contribution(old_quantity, old_price, old_level)
+    if old_category != int(instance.category_id):
+        category_deltas = {old_category: tuple(-v for v in old), int(instance.category_id): new}
+    else:
+        category_deltas = {old_category: rollups.difference(new, old)}
+    supplier_deltas = {}
+    delta = rollups.difference(new, old)
+    if any(delta):
+        for supplier_id in rollups.supplier_ids_for([instance.pk]).get(instance.pk, []):
+            supplier_deltas[supplier_id] = delta
+    rollups.apply_product_change(category_deltas, supplier_deltas)
+
+
+def sync_product_lots(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    snapshot = getattr(instance, '_rollup_snapshot', None)
+    old_quantity = snapshot[2] if snapshot else 0
+    lots.reconcile([(instance.pk, old_quantity, int(instance.quantity_in_stock), instance.expiry_date)])
+
+
+def capture_deleted_product(sender, instance, **kwargs):
+    instance._rollup_suppliers = rollups.supplier_ids_for([instance.pk]).get(instance.pk, [])
+
+
+def remove_product_rollups(sender, instance, **kwargs):
+    removed = tuple(-v for v in rollups.contribution(instance.quantity_in_stock, instance.price, instance.reorder_level))
+    rollups.apply_product_change(
+        {instance.category_id: removed},
+        {supplier_id: removed for supplier_id in getattr(instance, '_rollup_suppliers', [])},
+        rebuild_missing=False,
+    )
+
+
+def update_supplier_rollups(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        Through = Product.suppliers.through
+        field = 'product_id' if reverse else 'supplier_id'
+        owner = 'supplier_id' if reverse else 'product_id'
+        instance._rollup_cleared = set(Through.objects.filter(**{owner: instance.pk}).values_list(field, flat=True))
+        return
+    if action == 'post_clear':
+        pk_set, sign = getattr(instance, '_rollup_cleared', set()), -1
+    elif action in ('post_add', 'post_remove'):
+        sign = 1 if action == 'post_add' else -1
+    else:
+        return
+    if not pk_set:
+        return
+
+    if reverse:
+        # supplier.product_set.add(...): one supplier, many products.
+        total = (0, 0, 0, 0)
+        for quantity, price, level in Product.objects.filter(pk__in=pk_set).values_list('quantity_in_stock', 'price', 'reorder_level'):
+            total = tuple(t + v for t, v in zip(total, rollups.contribution(quantity, price, level)))
+        rollups.apply_product_change({}, {instance.pk: tuple(sign * v for v in total)})
+    else:
+        delta = tuple(sign * v for v in rollups.contribution(instance.quantity_in_stock, instance.price, instance.reorder_level))
+        rollups.apply_product_change({}, {supplier_id: delta for supplier_id in pk_set})
+
+
+def snapshot_category(sender, instance, raw=False, **kwargs):
+    instance._previous_reorder_level = None
+    if instance.pk and not raw:
+        instance._previous_reorder_level = (
+            Category.objects.filter(pk=instance.pk).values_list('reorder_level', flat=True).first()
+        )
+
+
+def propagate_reorder_level(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_reorder_level', None)
+    if raw or previous is None or previous == instance.reorder_level:
+        return
+    followers = Product.objects.filter(category=instance, inherits_reorder_level=True)
+    product_ids = list(followers.values_list('pk', flat=True))
+    if product_ids:
+        followers.update(reorder_level=instance.reorder_level)
+        # Low-stock counts depend on the level; recount the affected rollups.
+        supplier_ids = {pk for ids in rollups.supplier_ids_for(product_ids).values() for pk in ids}
+        rollups.rebuild_rollups(category_ids=[instance.pk], supplier_ids=list(supplier_ids))
+        bump_versions('product')
+
+
+def mark_new_upload(sender, instance, raw=False, **kwargs):
+    image = getattr(instance, thumbnails.IMAGE_FIELDS[sender._meta.model_name])
+    instance._thumbnails_pending = bool(image) and not image._committed and not raw
+
+
+def generate_and_bump(name:str, model_name:str):
+    thumbnails.generate_on_upload(name)
+    # Cached fragments rendered before the thumbnails existed used the original.
+    bump_versions(model_name)
+
+
+def generate_upload_thumbnails(sender, instance, raw=False, **kwargs):
+    if getattr(instance, '_thumbnails_pending', False):
+        instance._thumbnails_pending = False
+        name = getattr(instance, thumbnails.IMAGE_FIELDS[sender._meta.model_name]).name
+        model_name = sender._meta.model_name
+        transaction.on_commit(lambda: generate_and_bump(name, model_name))
+
+
+def invalidate_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        roles.invalidate_user_groups(instance.pk)
+    elif pk_set:
+        roles.invalidate_user_groups(*pk_set)
+    else:
+        roles.invalidate_user_groups()
+
+
+def invalidate_groups(sender, **kwargs):
+    roles.invalidate_user_groups()
+
+
+def connect():
+    for model in (Product, Category, Supplier, StockUpdate):
+        post_save.connect(bump_model_version, sender=model, dispatch_uid=f'bump_{model._meta.model_name}_save')
+        post_delete.connect(bump_model_version, sender=model, dispatch_uid=f'bump_{model._meta.model_name}_delete')
+    m2m_changed.connect(bump_product_suppliers, sender=Product.suppliers.through, dispatch_uid='bump_product_suppliers')
+
+    for model in (Category, Supplier):
+        post_save.connect(create_rollup, sender=model, dispatch_uid=f'create_{model._meta.model_name}_rollup')
+    pre_save.connect(snapshot_product, sender=Product, dispatch_uid='snapshot_product_rollups')
+    post_save.connect(update_product_rollups, sender=Product, dispatch_uid='update_product_rollups')
+    post_save.connect(sync_product_lots, sender=Product, dispatch_uid='sync_product_lots')
+    pre_delete.connect(capture_deleted_product, sender=Product, dispatch_uid='capture_deleted_product_rollups')
+    post_delete.connect(remove_product_rollups, sender=Product, dispatch_uid='remove_product_rollups')
+    m2m_changed.connect(update_supplier_rollups, sender=Product.suppliers.through, dispatch_uid='update_supplier_rollups')
+
+    pre_save.connect(snapshot_category, sender=Category, dispatch_uid='snapshot_category_reorder_level')
+    post_save.connect(propagate_reorder_level, sender=Category, dispatch_uid='propagate_reorder_level')
+
+    for model in (Product, Supplier):
+        pre_save.connect(mark_new_upload, sender=model, dispatch_uid=f'mark_{model._meta.model_name}_upload')
+        post_save.connect(generate_upload_thumbnails, sender=model, dispatch_uid=f'{model._meta.model_name}_thumbnails')
+
+    m2m_changed.connect(invalidate_group_members, sender=User.groups.through, dispatch_uid='invalidate_group_members')
+    post_save.connect(invalidate_groups, sender=Group, dispatch_uid='invalidate_groups_save')
+    post_delete.connect(invalidate_groups, sender=Group, dispatch_uid='invalidate_groups_delete')
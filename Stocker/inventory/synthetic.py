@@ -0,0 +1,141 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .caching import bump_versions
+from .history import rebuild_history
+from .models import Category, Product, StockLot, StockUpdate, Supplier
+from .rollups import rebuild_rollups
+
+
+GENERATE_BATCH_SIZE = 5000
+ADJECTIVES = ('Fresh', 'Organic', 'Classic', 'Premium', 'Light', 'Spicy', 'Frozen', 'Smoked', 'Sweet', 'Salted')
+NOUNS = ('Milk', 'Cheese', 'Yogurt', 'Bread', 'Coffee', 'Tea', 'Juice', 'Rice', 'Pasta', 'Honey', 'Dates', 'Olives')
+REORDER_LEVELS = (5, 10, 20)
+
+
+def _batched(iterable, size:int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def clear_catalog(using:str='default'):
+    """Empty every inventory table, the way ``flush`` does: no per-row deletes or signals.
+
+    Rollups and caches are left stale; ``generate_dataset`` rebuilds them.
+    """
+    connection = connections[using]
+    tables = [model._meta.db_table for model in apps.get_app_config('inventory').get_models(include_auto_created=True)]
+    with transaction.atomic(using=using):
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables))
+    bump_versions('product', 'category', 'supplier', 'stockupdate')
+
+
+def generate_dataset(products:int=10_000, categories:int=100, suppliers:int=200, stock_updates:int=100_000,
+                     days:int=365, seed:int=42, end=None, batch_size:int=GENERATE_BATCH_SIZE, log=None):
+    """Fill an empty catalog with a synthetic one; the same arguments give the same rows.
+
+    Ledger rows are spread evenly over the ``days`` before ``end`` (default:
+    today), with a few hot products taking most of the movements. Each product
+    ends with the stock its ledger adds up to, held in one lot. Rollups and
+    movement history are rebuilt at the end. Returns the row counts.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    end = end or timezone.localdate()
+    end_at = timezone.make_aware(datetime.combine(end, time()))
+
+    levels = [rng.choice(REORDER_LEVELS) for _ in range(categories)]
+    for batch in _batched((Category(name=f"Category {i:05d}", reorder_level=levels[i]) for i in range(categories)), batch_size):
+        Category.objects.bulk_create(batch)
+    category_ids = list(Category.objects.order_by('pk').values_list('pk', flat=True))
+    for batch in _batched((
+        Supplier(name=f"Supplier {i:05d}", email=f"supplier{i}@example.com", phone=f"05{i:08d}")
+        for i in range(suppliers)
+    ), batch_size):
+        Supplier.objects.bulk_create(batch)
+    supplier_ids = list(Supplier.objects.order_by('pk').values_list('pk', flat=True))
+    log(f"{categories} categories, {suppliers} suppliers")
+
+    expiries = []
+
+    def catalog():
+        for i in range(products):
+            category = rng.randrange(categories)
+            expiry = end + timedelta(days=rng.randint(-30, 365)) if rng.random() < 0.5 else None
+            expiries.append(expiry)
+            yield Product(
+                name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i:07d}",
+                description=" ".join(rng.choices(ADJECTIVES + NOUNS, k=8)).lower(),
+                price=Decimal(rng.randint(50, 50_000)) / 100,
+                category_id=category_ids[category],
+                quantity_in_stock=0,
+                reorder_level=levels[category],
+                expiry_date=expiry,
+            )
+
+    for batch in _batched(catalog(), batch_size):
+        with transaction.atomic():
+            Product.objects.bulk_create(batch)
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    Through = Product.suppliers.through
+    links = (
+        Through(product_id=product_id, supplier_id=supplier_id)
+        for product_id in product_ids
+        for supplier_id in rng.sample(supplier_ids, min(rng.randint(1, 3), len(supplier_ids)))
+    )
+    for batch in _batched(links, batch_size):
+        Through.objects.bulk_create(batch)
+    log(f"{products} products")
+
+    balances = [0] * products
+    span = timedelta(days=days)
+
+    def ledger():
+        for n in range(stock_updates):
+            # Squaring skews picks towards the first products, as real demand is.
+            i = int(products * rng.random() ** 2)
+            if balances[i] and rng.random() < 0.7:
+                change = -rng.randint(1, min(balances[i], 20))
+            else:
+                change = rng.randint(10, 200)
+            balances[i] += change
+            yield StockUpdate(
+                product_id=product_ids[i], quantity_change=change,
+                timestamp=end_at - span + span * n / stock_updates, note='synthetic',
+            )
+
+    for written, batch in enumerate(_batched(ledger(), batch_size), start=1):
+        timestamps = [update.timestamp for update in batch]
+        with transaction.atomic():
+            # bulk_create stamps auto_now_add fields with now; put the spread back.
+            StockUpdate.objects.bulk_create(batch)
+            for update, timestamp in zip(batch, timestamps):
+                update.timestamp = timestamp
+            StockUpdate.objects.bulk_update(batch, ['timestamp'], batch_size=1000)
+        if written % 100 == 0:
+            log(f"{written * batch_size} stock updates")
+    log(f"{stock_updates} stock updates")
+
+    stocked = [(pk, quantity, expiry) for pk, quantity, expiry in zip(product_ids, balances, expiries) if quantity]
+    for batch in _batched(stocked, batch_size):
+        with transaction.atomic():
+            Product.objects.bulk_update([Product(pk=pk, quantity_in_stock=quantity) for pk, quantity, _ in batch], ['quantity_in_stock'], batch_size=1000)
+            StockLot.objects.bulk_create([
+                StockLot(product_id=pk, quantity=quantity, expiry_date=expiry, received_at=end_at) for pk, quantity, expiry in batch
+            ])
+    rebuild_rollups()
+    rebuild_history()
+    bump_versions('product', 'category', 'supplier', 'stockupdate')
+    log("rollups and movement history rebuilt")
+    return {
+        'categories': categories, 'suppliers': suppliers, 'products': products,
+        'stock_updates': stock_updates, 'lots': len(stocked),
+    }
@@ -0,0 +1,16 @@
+from django import template
+
+from inventory.caching import get_versions
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def cache_version(*names:str):
+    """Version stamp for ``{% cache %}`` keys, e.g. ``{% cache_version 'product' as version %}``.
+
+    Saving or deleting any of the named models changes the stamp, so fragments
+    keyed on it are never served stale.
+    """
+    return '.'.join(str(version) for version in get_versions(*names))
@@ -0,0 +1,34 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from inventory.thumbnails import WIDTHS, thumbnail_name, thumbnails_ready
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(image, ext:str='webp'):
+    """``srcset`` value listing every thumbnail width of ``image`` in ``ext``."""
+    if not image or not thumbnails_ready(image.name):
+        return ''
+    return ', '.join(f'{default_storage.url(thumbnail_name(image.name, width, ext))} {width}w' for width in WIDTHS)
+
+
+@register.simple_tag
+def responsive_image(image, alt:str='', sizes:str='100vw', **attrs):
+    """A ``<picture>`` serving WebP thumbnails with a JPEG fallback.
+
+    Extra keyword arguments become ``<img>`` attributes, e.g. ``class="img-fluid"``.
+    Until the thumbnails exist the original upload is used.
+    """
+    extra = format_html(''.join(f' {key.replace("_", "-")}="{{}}"' for key in attrs), *attrs.values())
+    if not thumbnails_ready(image.name):
+        return format_html('<img src="{}" alt="{}" loading="lazy"{}>', image.url, alt, extra)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy"{}></picture>',
+        srcset(image, 'webp'), sizes,
+        default_storage.url(thumbnail_name(image.name, WIDTHS[1], 'jpg')), srcset(image, 'jpg'), sizes, alt, extra,
+    )
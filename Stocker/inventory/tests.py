@@ -1,3 +1,1394 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User, Group, Permission
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection, connections, transaction, OperationalError
+from django.db.models import Sum
+from django.db.models.signals import pre_delete
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import forecasting, profiling
+from .caching import acached_for_versions, bump_versions, cached_for_versions
+from .importer import import_products_csv
+from .ledger import compact_ledger, open_archive
+from .synthetic import clear_catalog, generate_dataset
+from .middleware import ProfilingMiddleware, ReadYourWritesMiddleware
+from .pagination import CursorPaginator, encode_cursor
+from .history import rebuild_history
+from .models import (
+    Product, Category, Supplier, StockUpdate, LowStockNotification, CategoryStockRollup, SupplierStockRollup,
+    DailyMovementRollup, WeeklyMovementRollup, ReorderForecast, StockLot,
+)
+from .rollups import rebuild_rollups, FIELDS
+from .search import install_search_indexes, sqlite_has_fts5, uninstall_search_indexes, uses_fts
+from . import routers
+from .routers import ReplicaRouter, read_from_replica, reading_from_replica, use_replica, REPLICA_ALIAS, PIN_COOKIE
+from .services import adjust_stock, apply_stock_movements, drain_outbox, InsufficientStock, OUTBOX_LEASE
+from .thumbnails import WIDTHS, generate_thumbnails, thumbnail_name
+from PIL import Image
+from stocker.database import database_settings
 
 # Create your tests here.
+
+def seed_catalog(count:int):
+    """Add ``count`` products spread over shared categories and suppliers.
+
+    Every third product is low on stock and every other one expires soon, so
+    report views have rows to render.
+    """
+    categories = [Category.objects.get_or_create(name=f"Category {i}")[0] for i in range(2)]
+    suppliers = [
+        Supplier.objects.get_or_create(name=f"Supplier {i}", defaults={'email': f"s{i}@example.com", 'phone': "0500000000"})[0]
+        for i in range(3)
+    ]
+    start = Product.objects.count()
+    soon = date.today() + timedelta(days=7)
+    for i in range(start, start + count):
+        product = Product.objects.create(
+            name=f"Product {i}",
+            description="",
+            category=categories[i % 2],
+            quantity_in_stock=3 if i % 3 == 0 else 10 + i,
+            expiry_date=soon if i % 2 else None,
+        )
+        product.suppliers.set(suppliers[: (i % 3) + 1])
+    return categories, suppliers
+
+
+class QueryCountHarness:
+    """Mixin for TestCase: fail when a view's query count grows with the catalog."""
+
+    catalog_sizes = (3, 30)
+
+    def count_queries(self, url:str):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return len(ctx)
+
+    def assertConstantQueries(self, url:str):
+        # Warm per-session state such as the cached group names.
+        self.client.get(url)
+        counts = []
+        seeded = 0
+        for size in self.catalog_sizes:
+            seed_catalog(size - seeded)
+            seeded = size
+            counts.append(self.count_queries(url))
+        self.assertEqual(len(set(counts)), 1, f"{url} ran {counts} queries for catalogs of {self.catalog_sizes} products")
+        return counts[0]
+
+
+class ProductListQueryTests(QueryCountHarness, TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username="employee", password="pass")
+        user.groups.add(Group.objects.create(name="Employee"))
+        self.client.force_login(user)
+
+    def test_product_list_queries_are_constant(self):
+        self.assertConstantQueries(reverse('inventory:product_list'))
+
+    def test_filtered_product_list_queries_are_constant(self):
+        _, suppliers = seed_catalog(1)
+        self.assertConstantQueries(reverse('inventory:product_list') + f"?supplier={suppliers[0].id}&q=Product")
+
+    def test_supplier_filter_does_not_duplicate_products(self):
+        _, suppliers = seed_catalog(6)
+        response = self.client.get(reverse('inventory:product_list') + f"?supplier={suppliers[0].id}")
+        names = [p.name for p in response.context['products']]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(response.context['products'].paginator.count, 6)
+
+HEADER = "Product Name,Description,Price,Category,Suppliers,Quantity In Stock,Expiry Date\n"
+
+
+class ProductImportTests(TestCase):
+
+    def setUp(self):
+        Supplier.objects.create(name="Almarai", email="a@example.com", phone="1")
+        Supplier.objects.create(name="Nestle", email="n@example.com", phone="2")
+
+    def run_import(self, body, batch_size=2):
+        return import_products_csv(io.StringIO(HEADER + body), batch_size=batch_size)
+
+    def test_creates_products_categories_and_supplier_links(self):
+        result = self.run_import(
+            'Milk,Fresh,5.50,Dairy,"Almarai, Nestle",20,2030-01-01\n'
+            'Yogurt,,3,Dairy,Almarai,10,N/A\n'
+            'Pen,,1,Office,,100,\n'
+        )
+        self.assertEqual((result.created, result.updated, result.errors), (3, 0, []))
+        self.assertEqual(Category.objects.count(), 2)
+        milk = Product.objects.get(name="Milk")
+        self.assertEqual(sorted(milk.suppliers.values_list('name', flat=True)), ["Almarai", "Nestle"])
+        self.assertIsNone(Product.objects.get(name="Yogurt").expiry_date)
+
+    def test_updates_existing_products_and_replaces_suppliers(self):
+        self.run_import('Milk,,5,Dairy,"Almarai, Nestle",20,\n')
+        result = self.run_import('Milk,Skimmed,6,Dairy,Nestle,30,\n')
+        self.assertEqual((result.created, result.updated), (0, 1))
+        milk = Product.objects.get(name="Milk")
+        self.assertEqual((milk.description, milk.quantity_in_stock), ("Skimmed", 30))
+        self.assertEqual(list(milk.suppliers.values_list('name', flat=True)), ["Nestle"])
+
+    def test_bad_rows_are_reported_without_aborting(self):
+        result = self.run_import(
+            'Milk,,5,Dairy,Almarai,20,\n'
+            ',,5,Dairy,,1,\n'
+            'Cheese,,5,Dairy,Unknown Co,1,\n'
+            'Butter,,5,Dairy,,-3,\n'
+            'Eggs,,abc,Dairy,,1,\n'
+            'Bread,,2,Bakery,,12,\n'
+        )
+        self.assertEqual(result.created, 2)
+        self.assertEqual(sorted(line for line, _ in result.errors), [3, 4, 5, 6])
+        self.assertEqual(set(Product.objects.values_list('name', flat=True)), {"Milk", "Bread"})
+
+    def test_prices_the_column_cannot_hold_are_row_errors(self):
+        result = self.run_import(
+            'Milk,,5.25,Dairy,,20,\n'
+            'Butter,,-1,Dairy,,1,\n'
+            'Eggs,,123456789012,Dairy,,1,\n'
+            'Cream,,1.234,Dairy,,1,\n'
+            'Yogurt,,NaN,Dairy,,1,\n'
+            'Bread,,2,Bakery,,12,\n',
+            batch_size=10,
+        )
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5, 6])
+        self.assertEqual(result.errors[0][1], "Price can't be negative.")
+        self.assertEqual(Product.objects.get(name="Milk").price, Decimal('5.25'))
+
+    def test_file_that_is_not_utf8_imports_nothing(self):
+        body = (HEADER + 'Milk,,5,Dairy,Almarai,20,\nCaf\xe9,,5,Dairy,,1,\n').encode('latin-1')
+        result = import_products_csv(io.BytesIO(body), batch_size=1)
+        self.assertEqual((result.processed, result.errors), (0, [(3, "The file is not UTF-8 encoded; nothing was imported.")]))
+        self.assertFalse(Product.objects.exists())
+
+    def test_batch_queries_do_not_grow_with_rows(self):
+        body = "".join(f'Item {i},,1,Dairy,Almarai,5,\n' for i in range(50))
+        with self.assertNumQueries(19):
+            self.run_import(body, batch_size=50)
+
+    def test_management_command_imports_file(self):
+        import tempfile
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(HEADER + 'Milk,,5,Dairy,Almarai,20,\n')
+        out = io.StringIO()
+        call_command('import_products', f.name, stdout=out)
+        self.assertIn("Imported 1 products", out.getvalue())
+        self.assertTrue(Product.objects.filter(name="Milk").exists())
+
+
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        seed_catalog(25)
+        Product.objects.filter(name="Product 7").update(name="Product 1")
+
+    def walk(self, paginator):
+        pages, page = [], paginator.get_page()
+        while True:
+            pages.append([p.pk for p in page])
+            if not page.has_next():
+                return pages, page
+            page = paginator.get_page(page.next_cursor)
+
+    def test_walks_every_row_once_in_order(self):
+        paginator = CursorPaginator(Product.objects.all(), 10)
+        pages, last = self.walk(paginator)
+        expected = list(Product.objects.order_by('name', 'id').values_list('pk', flat=True))
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), expected)
+
+        page = paginator.get_page(last.previous_cursor)
+        self.assertEqual([p.pk for p in page], pages[1])
+        page = paginator.get_page(page.previous_cursor)
+        self.assertEqual([p.pk for p in page], pages[0])
+        self.assertFalse(page.has_previous())
+
+    def test_deep_page_is_a_single_query(self):
+        paginator = CursorPaginator(Product.objects.all(), 10, ordering=('id',))
+        cursor = encode_cursor('next', [Product.objects.order_by('id')[19].pk])
+        with self.assertNumQueries(1):
+            page = paginator.get_page(cursor)
+            self.assertEqual(len(page), 5)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        paginator = CursorPaginator(Product.objects.all(), 10)
+        self.assertEqual(list(paginator.get_page("not-a-cursor")), list(paginator.get_page()))
+
+    def test_list_view_switches_to_cursor_mode(self):
+        user = User.objects.create_user(username="employee", password="pass")
+        user.groups.add(Group.objects.create(name="Employee"))
+        self.client.force_login(user)
+        with self.settings(CURSOR_PAGINATION=True):
+            response = self.client.get(reverse('inventory:product_list') + "?q=Product")
+        products = response.context['products']
+        self.assertTrue(products.is_cursor)
+        self.assertContains(response, f"cursor={products.next_cursor}")
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Beverages")
+
+    def make(self, name, description=""):
+        return Product.objects.create(name=name, description=description, category=self.category, quantity_in_stock=10)
+
+    def names(self, queryset):
+        return sorted(queryset.values_list('name', flat=True))
+
+    def test_prefix_match_on_every_word(self):
+        self.make("Green Tea")
+        self.make("Green Apple")
+        self.make("Black Tea")
+        self.assertEqual(self.names(Product.objects.search("gre te")), ["Green Tea"])
+        self.assertEqual(self.names(Product.objects.search("tea")), ["Black Tea", "Green Tea"])
+
+    def test_matches_description_and_ranks_name_hits(self):
+        self.make("Kettle", "boils water for tea")
+        self.make("Tea Tea Tea")
+        ranked = Product.objects.search("tea", ranked=True)
+        self.assertEqual([p.name for p in ranked], ["Tea Tea Tea", "Kettle"])
+
+    def test_index_follows_updates_deletes_and_bulk_writes(self):
+        product = self.make("Coffee")
+        product.name = "Espresso"
+        product.save()
+        self.assertEqual(self.names(Product.objects.search("coffee")), [])
+        Product.objects.bulk_create([Product(name="Coffee Beans", description="", category=self.category, quantity_in_stock=1)])
+        Product.objects.filter(name="Espresso").update(description="strong coffee")
+        self.assertEqual(self.names(Product.objects.search("coffee")), ["Coffee Beans", "Espresso"])
+        Product.objects.filter(name="Espresso").delete()
+        self.assertEqual(self.names(Product.objects.search("coffee")), ["Coffee Beans"])
+
+    def test_category_and_supplier_search(self):
+        Supplier.objects.create(name="Almarai Dairy", email="a@example.com", phone="1")
+        self.assertEqual(self.names(Category.objects.search("bev")), ["Beverages"])
+        self.assertEqual(self.names(Supplier.objects.search("dair")), ["Almarai Dairy"])
+
+    def test_punctuation_only_query_falls_back_to_contains(self):
+        self.make("Half-Price")
+        self.assertEqual(self.names(Product.objects.search("-")), ["Half-Price"])
+
+    def test_missing_fts_tables_fall_back_to_contains(self):
+        self.make("Green Tea")
+        uninstall_search_indexes(connection)
+        self.addCleanup(install_search_indexes, connection)
+        self.assertFalse(uses_fts(connection))
+        self.assertEqual(self.names(Product.objects.search("tea")), ["Green Tea"])
+        install_search_indexes(connection)
+        self.assertEqual(uses_fts(connection), connection.vendor == 'sqlite' and sqlite_has_fts5())
+        self.assertEqual(self.names(Product.objects.search("gre")), ["Green Tea"])
+
+
+class StockAdjustmentTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Dairy")
+        self.product = Product.objects.create(name="Milk", description="", category=category, quantity_in_stock=8)
+
+    def test_adjustment_updates_stock_and_ledger(self):
+        adjustment = adjust_stock(self.product.id, -2, note="sold")
+        self.product.refresh_from_db()
+        self.assertEqual((adjustment.old_quantity, adjustment.new_quantity), (8, 6))
+        self.assertEqual(self.product.quantity_in_stock, 6)
+        self.assertEqual(StockUpdate.objects.get().note, "sold")
+
+    def test_negative_result_is_rejected_without_ledger_row(self):
+        with self.assertRaises(InsufficientStock):
+            adjust_stock(self.product.id, -9)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity_in_stock, 8)
+        self.assertFalse(StockUpdate.objects.exists())
+
+    def test_missing_product(self):
+        with self.assertRaises(Product.DoesNotExist):
+            adjust_stock(self.product.id + 1, 1)
+
+    def test_low_stock_alert_only_when_crossing_threshold(self):
+        adjust_stock(self.product.id, -3)
+        adjust_stock(self.product.id, -1)
+        self.assertEqual(LowStockNotification.objects.count(), 1)
+        self.assertEqual(mail.outbox, [])
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError("smtp down")
+
+
+class ClaimCheckingEmailBackend(BaseEmailBackend):
+    # Records how the outbox row looks while its mail is being sent.
+    seen = []
+
+    def send_messages(self, messages):
+        notification = LowStockNotification.objects.get()
+        self.seen.append((notification.attempts, notification.next_attempt_at > timezone.now()))
+        return len(messages)
+
+
+@override_settings(EMAIL_HOST_USER="manager@example.com")
+class LowStockOutboxTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Dairy")
+        self.product = Product.objects.create(name="Milk", description="", category=category, quantity_in_stock=8)
+
+    def test_drain_sends_queued_alert_once(self):
+        adjust_stock(self.product.id, -4)
+        self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(drain_outbox(), (0, 0))
+        self.assertEqual([m.subject for m in mail.outbox], ["Low Stock Alert: Milk"])
+        self.assertEqual(mail.outbox[0].body, "Milk has only 4 left in stock.")
+
+    def test_pending_alert_is_deduplicated_per_product(self):
+        adjust_stock(self.product.id, -4)
+        adjust_stock(self.product.id, 10)
+        adjust_stock(self.product.id, -12)
+        self.assertEqual(LowStockNotification.objects.count(), 1)
+        drain_outbox()
+        self.assertEqual([m.body for m in mail.outbox], ["Milk has only 2 left in stock."])
+
+    def test_alert_is_not_queued_when_stock_change_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                adjust_stock(self.product.id, -4)
+                raise RuntimeError
+        self.assertFalse(LowStockNotification.objects.exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        adjust_stock(self.product.id, -4)
+        with self.settings(EMAIL_BACKEND='inventory.tests.FailingEmailBackend'):
+            self.assertEqual(drain_outbox(), (0, 1))
+        notification = LowStockNotification.objects.get()
+        self.assertEqual((notification.attempts, notification.last_error), (1, "smtp down"))
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+        self.assertEqual(drain_outbox(), (0, 0))
+
+        LowStockNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_exhausted_alert_is_sent_when_stock_drops_again(self):
+        adjust_stock(self.product.id, -4)
+        with self.settings(EMAIL_BACKEND='inventory.tests.FailingEmailBackend'):
+            self.assertEqual(drain_outbox(max_attempts=1), (0, 1))
+        LowStockNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(max_attempts=1), (0, 0))
+
+        adjust_stock(self.product.id, 10)
+        adjust_stock(self.product.id, -12)
+        self.assertEqual(drain_outbox(max_attempts=1), (1, 0))
+        self.assertEqual([m.body for m in mail.outbox], ["Milk has only 2 left in stock."])
+
+    def test_alert_is_claimed_before_it_is_sent(self):
+        adjust_stock(self.product.id, -4)
+        ClaimCheckingEmailBackend.seen = []
+        with self.settings(EMAIL_BACKEND='inventory.tests.ClaimCheckingEmailBackend'):
+            self.assertEqual(drain_outbox(), (1, 0))
+        # Leased with the attempt counted, so a second drain skips it meanwhile.
+        self.assertEqual(ClaimCheckingEmailBackend.seen, [(1, True)])
+        self.assertIsNotNone(LowStockNotification.objects.get().sent_at)
+
+    def test_expired_claim_is_retried(self):
+        adjust_stock(self.product.id, -4)
+        LowStockNotification.objects.update(attempts=1, next_attempt_at=timezone.now() + OUTBOX_LEASE)
+        self.assertEqual(drain_outbox(), (0, 0))
+        LowStockNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(LowStockNotification.objects.get().attempts, 2)
+
+    def test_update_stock_view_does_not_send_mail_inline(self):
+        user = User.objects.create_superuser(username="admin", password="pass")
+        self.client.force_login(user)
+        with self.settings(EMAIL_BACKEND='inventory.tests.FailingEmailBackend'):
+            response = self.client.post(reverse('inventory:update_stock', args=[self.product.id]), {'quantity_change': -4})
+        self.assertRedirects(response, reverse('inventory:product_list'), fetch_redirect_response=False)
+        self.assertEqual(LowStockNotification.objects.count(), 1)
+
+    def test_send_notifications_command(self):
+        adjust_stock(self.product.id, -4)
+        out = io.StringIO()
+        call_command('send_notifications', stdout=out)
+        self.assertIn("Sent 1 alerts", out.getvalue())
+
+
+class StockMovementBatchTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Dairy")
+        self.products = [
+            Product.objects.create(name=f"Item {i}", description="", category=category, quantity_in_stock=10)
+            for i in range(3)
+        ]
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+
+    def post(self, movements):
+        return self.client.post(reverse('inventory:stock_movements'), json.dumps({'movements': movements}), content_type='application/json')
+
+    def test_batch_is_applied_with_a_constant_number_of_queries(self):
+        movements = [{'product_id': p.id, 'quantity_change': 5, 'note': 'pallet 7'} for p in self.products]
+        movements.append({'product_id': self.products[0].id, 'quantity_change': -2})
+        with self.assertNumQueries(14):
+            ok, results = apply_stock_movements(movements)
+        self.assertTrue(ok)
+        self.assertEqual([r['quantity_in_stock'] for r in results], [15, 15, 15, 13])
+        self.assertEqual(sorted(Product.objects.values_list('quantity_in_stock', flat=True)), [13, 15, 15])
+        self.assertEqual(StockUpdate.objects.count(), 4)
+
+    def test_any_invalid_movement_rejects_the_whole_batch(self):
+        response = self.post([
+            {'product_id': self.products[0].id, 'quantity_change': 3},
+            {'product_id': self.products[1].id, 'quantity_change': -11},
+            {'product_id': 999999, 'quantity_change': 1},
+            {'product_id': self.products[2].id, 'quantity_change': "2"},
+        ])
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertFalse(body['applied'])
+        self.assertEqual([r['status'] for r in body['results']], ['ok', 'error', 'error', 'error'])
+        self.assertEqual(body['results'][1]['error'], "Resulting stock can't be negative.")
+        self.assertEqual(set(Product.objects.values_list('quantity_in_stock', flat=True)), {10})
+        self.assertFalse(StockUpdate.objects.exists())
+
+    def test_endpoint_applies_movements_and_queues_alerts(self):
+        response = self.post([{'product_id': self.products[0].id, 'quantity_change': -6, 'note': 'scan'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'index': 0, 'status': 'ok', 'product_id': self.products[0].id, 'quantity_in_stock': 4}])
+        self.assertEqual(StockUpdate.objects.get().note, 'scan')
+        self.assertTrue(LowStockNotification.objects.filter(product=self.products[0]).exists())
+
+    def test_malformed_payload(self):
+        response = self.client.post(reverse('inventory:stock_movements'), "nope", content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class StockRollupTests(TestCase):
+
+    def setUp(self):
+        self.categories, self.suppliers = seed_catalog(12)
+
+    def snapshot(self):
+        return (
+            {r.pk: tuple(getattr(r, f) for f in FIELDS) for r in CategoryStockRollup.objects.all()},
+            {r.pk: tuple(getattr(r, f) for f in FIELDS) for r in SupplierStockRollup.objects.all()},
+        )
+
+    def assertRollupsMatchCatalog(self):
+        incremental = self.snapshot()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_product_and_supplier_edits_keep_rollups_exact(self):
+        product = Product.objects.get(name="Product 4")
+        product.quantity_in_stock = 2
+        product.price = "3.50"
+        product.category = self.categories[0]
+        product.save()
+        product.suppliers.set([self.suppliers[2]])
+        self.suppliers[0].product_set.add(product)
+        Product.objects.get(name="Product 5").suppliers.clear()
+        Product.objects.get(name="Product 6").delete()
+        self.assertRollupsMatchCatalog()
+
+    def test_stock_paths_keep_rollups_exact(self):
+        products = list(Product.objects.order_by('id')[:3])
+        adjust_stock(products[0].id, 7)
+        apply_stock_movements([
+            {'product_id': products[1].id, 'quantity_change': -products[1].quantity_in_stock},
+            {'product_id': products[2].id, 'quantity_change': 4},
+        ])
+        import_products_csv(io.StringIO(HEADER + 'Product 2,,9.99,Category 1,Supplier 2,1,\nNew,,2,Category 9,Supplier 0,40,\n'))
+        self.assertRollupsMatchCatalog()
+
+    def test_reorder_level_changes_keep_rollups_exact(self):
+        product = Product.objects.get(name="Product 4")
+        product.set_reorder_level(20)
+        product.save()
+        category = self.categories[1]
+        category.reorder_level = 12
+        category.save()
+        adjust_stock(Product.objects.get(name="Product 5").id, -1)
+        self.assertRollupsMatchCatalog()
+
+    def test_deleting_category_or_supplier_with_products(self):
+        self.categories[0].delete()
+        self.suppliers[0].delete()
+        connection.check_constraints()
+        self.assertFalse(CategoryStockRollup.objects.filter(pk=self.categories[0].pk).exists())
+        self.assertRollupsMatchCatalog()
+
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+        response = self.client.post(reverse('users:category_delete', args=[self.categories[1].pk]))
+        self.assertRedirects(response, reverse('users:category_list'), fetch_redirect_response=False)
+        connection.check_constraints()
+        self.assertEqual((Product.objects.count(), CategoryStockRollup.objects.count()), (0, 0))
+
+    def test_rollup_values(self):
+        Product.objects.update(price=2)
+        rebuild_rollups()
+        rollup = CategoryStockRollup.objects.get(pk=self.categories[0].pk)
+        products = Product.objects.filter(category=self.categories[0])
+        stock = sum(p.quantity_in_stock for p in products)
+        self.assertEqual(rollup.product_count, len(products))
+        self.assertEqual(rollup.total_stock, stock)
+        self.assertEqual(rollup.low_stock_count, sum(p.quantity_in_stock <= p.reorder_level for p in products))
+        self.assertEqual(rollup.stock_value, 2 * stock)
+
+    def test_new_category_and_supplier_get_rollup_rows(self):
+        category = Category.objects.create(name="Frozen")
+        supplier = Supplier.objects.create(name="Cold Co", email="c@example.com", phone="1")
+        self.assertEqual(CategoryStockRollup.objects.get(pk=category.pk).product_count, 0)
+        self.assertEqual(SupplierStockRollup.objects.get(pk=supplier.pk).product_count, 0)
+
+
+class SharedProductViewTests(TestCase):
+    """Both URL trees route to the same product views; run them under each namespace."""
+
+    namespaces = ('inventory', 'users')
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Dairy", reorder_level=5)
+        self.supplier = Supplier.objects.create(name="Almarai", email="a@example.com", phone="1")
+        self.product = Product.objects.create(name="Milk", description="", category=self.category, quantity_in_stock=10)
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+        Group.objects.create(name="Employee").user_set.add(User.objects.get(username="admin"))
+
+    def test_stock_update_redirects_within_namespace(self):
+        for namespace in self.namespaces:
+            with self.subTest(namespace=namespace):
+                url = reverse(f'{namespace}:update_stock', args=[self.product.id])
+                self.assertRedirects(self.client.post(url, {'quantity_change': 'x'}), url, fetch_redirect_response=False)
+                self.assertRedirects(self.client.post(url, {'quantity_change': -100}), url, fetch_redirect_response=False)
+                response = self.client.post(url, {'quantity_change': 2, 'note': "delivery"})
+                self.assertRedirects(response, reverse(f'{namespace}:product_list'), fetch_redirect_response=False)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity_in_stock, 14)
+
+    def test_stock_update_of_missing_product_is_404(self):
+        for namespace in self.namespaces:
+            with self.subTest(namespace=namespace):
+                url = reverse(f'{namespace}:update_stock', args=[999])
+                self.assertEqual(self.client.get(url).status_code, 404)
+                self.assertEqual(self.client.post(url, {'quantity_change': 1}).status_code, 404)
+
+    def test_add_rejects_stock_at_reorder_level(self):
+        for namespace in self.namespaces:
+            with self.subTest(namespace=namespace):
+                url = reverse(f'{namespace}:product_add')
+                data = {
+                    'name': f"Cheese {namespace}", 'description': "Hard", 'price': "2", 'category': self.category.id,
+                    'suppliers': [self.supplier.id], 'quantity_in_stock': 5,
+                }
+                self.assertRedirects(self.client.post(url, data), url, fetch_redirect_response=False)
+                response = self.client.post(url, {**data, 'quantity_in_stock': 6})
+                self.assertRedirects(response, reverse(f'{namespace}:product_list'), fetch_redirect_response=False)
+        self.assertEqual(Product.objects.filter(name__startswith="Cheese").count(), 2)
+
+    def test_update_reports_invalid_fields(self):
+        data = {
+            'name': "Milk", 'description': "Fresh", 'price': "2", 'category': self.category.id,
+            'suppliers': [self.supplier.id], 'quantity_in_stock': 20,
+        }
+        for namespace in self.namespaces:
+            url = reverse(f'{namespace}:product_update', args=[self.product.id])
+            for quantity, error in (('', "This field is required."), ('lots', "Enter a whole number.")):
+                with self.subTest(namespace=namespace, quantity=quantity):
+                    response = self.client.post(url, {**data, 'price': "9", 'quantity_in_stock': quantity})
+                    self.assertRedirects(response, url, fetch_redirect_response=False)
+                    self.assertIn(f"Quantity in stock: {error}", [str(m) for m in get_messages(response.wsgi_request)])
+            self.product.refresh_from_db()
+            self.assertEqual((self.product.price, self.product.quantity_in_stock), (0, 10))
+        response = self.client.post(reverse('users:product_update', args=[self.product.id]), data)
+        self.assertRedirects(response, reverse('users:product_list'), fetch_redirect_response=False)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.description, self.product.quantity_in_stock), ("Fresh", 20))
+        self.assertEqual(list(self.product.suppliers.all()), [self.supplier])
+
+    def test_views_render_their_namespace_template(self):
+        for namespace, template in (('inventory', 'inventory/product_update.html'), ('users', 'users/update_product.html')):
+            with self.subTest(namespace=namespace):
+                response = self.client.get(reverse(f'{namespace}:product_update', args=[self.product.id]))
+                self.assertTemplateUsed(response, template)
+
+    def test_only_the_employee_tree_requires_the_group(self):
+        outsider = User.objects.create_user(username="outsider", password="pass")
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(reverse('users:product_list')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('inventory:product_list')).status_code, 302)
+
+
+class ReorderLevelTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Dairy", reorder_level=10)
+        self.milk = Product.objects.create(name="Milk", description="", category=self.category, quantity_in_stock=12)
+        self.cheese = Product.objects.create(name="Cheese", description="", category=self.category, quantity_in_stock=12)
+        self.cheese.set_reorder_level(2)
+        self.cheese.save()
+
+    def test_products_follow_category_unless_overridden(self):
+        self.assertEqual(self.milk.reorder_level, 10)
+        self.category.reorder_level = 15
+        self.category.save()
+        self.milk.refresh_from_db()
+        self.cheese.refresh_from_db()
+        self.assertEqual((self.milk.reorder_level, self.cheese.reorder_level), (15, 2))
+        self.assertEqual(list(Product.objects.low_stock()), [self.milk])
+        self.assertTrue(self.milk.is_low_stock())
+
+    def test_clearing_override_returns_to_category_level(self):
+        self.cheese.set_reorder_level(None)
+        self.cheese.save()
+        self.assertEqual(self.cheese.reorder_level, 10)
+
+    def test_alert_uses_product_level(self):
+        adjust_stock(self.milk.id, -2)
+        adjust_stock(self.cheese.id, -2)
+        self.assertEqual(list(LowStockNotification.objects.values_list('product_id', flat=True)), [self.milk.id])
+
+    def test_update_view_checks_product_level(self):
+        user = User.objects.create_user(username="staff", password="pass")
+        user.user_permissions.add(*Permission.objects.filter(codename='change_product'))
+        self.client.force_login(user)
+        supplier = Supplier.objects.create(name="Almarai", email="a@example.com", phone="1")
+        data = {
+            'name': "Milk", 'description': "Fresh", 'price': "1", 'category': self.category.id,
+            'suppliers': [supplier.id], 'quantity_in_stock': 9,
+        }
+        self.client.post(reverse('inventory:product_update', args=[self.milk.id]), data)
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.quantity_in_stock, 12)
+        self.client.post(reverse('inventory:product_update', args=[self.milk.id]), {**data, 'reorder_level': 3})
+        self.milk.refresh_from_db()
+        self.assertEqual((self.milk.quantity_in_stock, self.milk.reorder_level, self.milk.inherits_reorder_level), (9, 3, False))
+
+
+class StockLotTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Dairy")
+        self.product = Product.objects.create(
+            name="Yogurt", description="", category=category, quantity_in_stock=10, expiry_date=date(2030, 6, 1),
+        )
+
+    def lots(self):
+        return list(StockLot.objects.filter(product=self.product).order_by('expiry_date').values_list('expiry_date', 'quantity'))
+
+    def test_new_stock_opens_a_lot(self):
+        self.assertEqual(self.lots(), [(date(2030, 6, 1), 10)])
+
+    def test_depletion_takes_earliest_expiry_first(self):
+        adjust_stock(self.product.id, 5, expiry_date=date(2030, 1, 1))
+        adjust_stock(self.product.id, 5, expiry_date=date(2031, 1, 1))
+        adjust_stock(self.product.id, -7)
+        self.assertEqual(self.lots(), [(date(2030, 6, 1), 8), (date(2031, 1, 1), 5)])
+        apply_stock_movements([
+            {'product_id': self.product.id, 'quantity_change': 2, 'expiry_date': '2029-12-01'},
+            {'product_id': self.product.id, 'quantity_change': -11},
+        ])
+        self.assertEqual(self.lots(), [(date(2031, 1, 1), 4)])
+
+    def test_lots_follow_direct_stock_edits(self):
+        self.product.quantity_in_stock = 4
+        self.product.save()
+        self.product.expiry_date = date(2030, 9, 1)
+        self.product.quantity_in_stock = 6
+        self.product.save()
+        self.assertEqual(self.lots(), [(date(2030, 6, 1), 4), (date(2030, 9, 1), 2)])
+
+    def test_lots_always_add_up_to_stock(self):
+        rng = random.Random(7)
+        for _ in range(30):
+            change = rng.randint(-6, 6) or 1
+            try:
+                adjust_stock(self.product.id, change, expiry_date=date(2030, 1, 1) + timedelta(days=rng.randint(0, 400)))
+            except InsufficientStock:
+                pass
+        self.product.refresh_from_db()
+        self.assertEqual(StockLot.objects.filter(product=self.product).aggregate(total=Sum('quantity'))['total'] or 0, self.product.quantity_in_stock)
+        self.assertFalse(StockLot.objects.filter(quantity=0).exists())
+
+    def test_expiring_within(self):
+        adjust_stock(self.product.id, 3, expiry_date=date(2030, 5, 20))
+        expiring = StockLot.objects.expiring_within(7, today=date(2030, 5, 18))
+        self.assertEqual(list(expiring.values_list('quantity', flat=True)), [3])
+
+
+class StockHistoryTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Dairy")
+        self.product = Product.objects.create(name="Milk", description="", category=category, quantity_in_stock=50)
+        self.client.force_login(User.objects.create_user(username="clerk", password="pass"))
+
+    def snapshot(self):
+        fields = ('product_id', 'period_start', 'quantity_in', 'quantity_out', 'movements', 'closing_quantity')
+        return [
+            sorted(model.objects.values_list(*fields)) for model in (DailyMovementRollup, WeeklyMovementRollup)
+        ]
+
+    def test_writes_maintain_daily_and_weekly_rollups(self):
+        adjust_stock(self.product.id, 10)
+        adjust_stock(self.product.id, -25)
+        apply_stock_movements([
+            {'product_id': self.product.id, 'quantity_change': 5},
+            {'product_id': self.product.id, 'quantity_change': -1},
+        ])
+        daily = DailyMovementRollup.objects.get()
+        self.assertEqual(
+            (daily.quantity_in, daily.quantity_out, daily.movements, daily.closing_quantity),
+            (15, 26, 4, 39),
+        )
+        self.assertEqual(WeeklyMovementRollup.objects.get().period_start.weekday(), 0)
+
+        incremental = self.snapshot()
+        rebuild_history()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_rebuild_walks_closing_quantities_back_from_current_stock(self):
+        for days_ago, change in ((9, 20), (8, -5), (1, 7)):
+            update = StockUpdate.objects.create(product=self.product, quantity_change=change)
+            StockUpdate.objects.filter(pk=update.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+        rebuild_history()
+        closing = list(DailyMovementRollup.objects.order_by('period_start').values_list('closing_quantity', flat=True))
+        self.assertEqual(closing, [48, 43, 50])
+
+    def test_rebuild_in_product_batches_matches_writes(self):
+        others = [
+            Product.objects.create(name=f"Cheese {i}", description="", category=self.product.category, quantity_in_stock=5)
+            for i in range(4)
+        ]
+        for product in [self.product, *others]:
+            adjust_stock(product.id, 3)
+            adjust_stock(product.id, -1)
+        incremental = self.snapshot()
+        with CaptureQueriesContext(connection) as ctx:
+            rebuild_history(batch_size=2)
+        self.assertEqual(incremental, self.snapshot())
+        # Three batches of products, one grouped ledger read each.
+        self.assertEqual(sum('GROUP BY' in q['sql'] for q in ctx.captured_queries), 3)
+
+    def test_chart_reads_rollups_only(self):
+        adjust_stock(self.product.id, 10)
+        url = reverse('inventory:stock_history_chart', args=[self.product.id])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'period': 'week'})
+        self.assertFalse(any('inventory_stockupdate' in q['sql'] for q in ctx.captured_queries))
+        bucket = response.json()['buckets'][0]
+        self.assertEqual((bucket['in'], bucket['net'], bucket['closing_quantity']), (10, 10, 60))
+        self.assertEqual(self.client.get(url, {'period': 'month'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'soon'}).status_code, 400)
+
+    def test_timeline_is_keyset_paginated_newest_first(self):
+        for i in range(30):
+            adjust_stock(self.product.id, 1, note=f"move {i}")
+        url = reverse('inventory:stock_history', args=[self.product.id])
+        first = self.client.get(url).context['movements']
+        self.assertEqual([m.note for m in first][:2], ["move 29", "move 28"])
+        second = self.client.get(url, {'cursor': first.next_cursor}).context['movements']
+        self.assertEqual([m.note for m in second], [f"move {i}" for i in range(4, -1, -1)])
+        self.assertFalse(second.has_next())
+        back = self.client.get(url, {'cursor': second.previous_cursor}).context['movements']
+        self.assertEqual([m.note for m in back], [m.note for m in first])
+
+
+class LedgerCompactionTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Dairy")
+        self.milk = Product.objects.create(name="Milk", description="", category=category, quantity_in_stock=100)
+        self.eggs = Product.objects.create(name="Eggs", description="", category=category, quantity_in_stock=40)
+        self.user = User.objects.create_user(username="clerk", password="pass")
+        for days_ago, product, change in ((40, self.milk, 10), (35, self.milk, -4), (31, self.eggs, 6), (2, self.milk, 5)):
+            self.move(product, change, days_ago)
+        self.cutoff = timezone.now() - timedelta(days=30)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.archive = os.path.join(directory, "ledger.csv.gz")
+
+    def move(self, product, change, days_ago):
+        update = StockUpdate.objects.create(product=product, updated_by=self.user, quantity_change=change, note=f"{change}")
+        StockUpdate.objects.filter(pk=update.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+
+    def ledger_totals(self):
+        return dict(StockUpdate.objects.values_list('product_id').annotate(total=Sum('quantity_change')).order_by())
+
+    def test_old_movements_fold_into_checkpoints(self):
+        totals = self.ledger_totals()
+        with open_archive(self.archive) as write:
+            archived = compact_ledger(self.cutoff, write, batch_size=2)
+        self.assertEqual(archived, 3)
+        self.assertEqual(self.ledger_totals(), totals)
+
+        checkpoint = StockUpdate.objects.get(product=self.milk, kind=StockUpdate.CHECKPOINT)
+        self.assertEqual((checkpoint.quantity_change, checkpoint.balance, checkpoint.timestamp), (6, 95, self.cutoff))
+        self.assertEqual(StockUpdate.objects.get(product=self.eggs, kind=StockUpdate.CHECKPOINT).balance, 40)
+        self.assertEqual(StockUpdate.objects.filter(kind=StockUpdate.MOVEMENT).count(), 1)
+
+        with gzip.open(self.archive, 'rt') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([(r['product_name'], r['quantity_change'], r['updated_by']) for r in rows], [
+            ("Milk", "10", "clerk"), ("Milk", "-4", "clerk"), ("Eggs", "6", "clerk"),
+        ])
+
+    def test_each_batch_is_on_disk_before_it_is_deleted(self):
+        on_disk = []
+        with open_archive(self.archive) as archive:
+            def write(batch):
+                archive(batch)
+                # A complete gzip member, readable while the batch's delete is uncommitted.
+                with gzip.open(self.archive, 'rt') as f:
+                    on_disk.append(len(list(csv.DictReader(f))))
+            with mock.patch('inventory.ledger.os.fsync', wraps=os.fsync) as fsync:
+                compact_ledger(self.cutoff, write, batch_size=2)
+        self.assertEqual(on_disk, [2, 3])
+        self.assertEqual(fsync.call_count, 2)
+
+    def test_rebuilding_history_keeps_compacted_periods(self):
+        def history():
+            fields = ('product_id', 'period_start', 'quantity_in', 'quantity_out', 'movements', 'closing_quantity')
+            return [sorted(model.objects.values_list(*fields)) for model in (DailyMovementRollup, WeeklyMovementRollup)]
+
+        rebuild_history()
+        before = history()
+        compact_ledger(self.cutoff)
+        rebuild_history()
+        self.assertEqual(history(), before)
+        archived_day = timezone.localdate(timezone.now() - timedelta(days=40))
+        self.assertTrue(DailyMovementRollup.objects.filter(product=self.milk, period_start=archived_day).exists())
+
+    def test_later_runs_extend_the_same_checkpoint(self):
+        compact_ledger(self.cutoff)
+        self.move(self.milk, 3, 20)
+        compact_ledger(timezone.now() - timedelta(days=10))
+        checkpoint = StockUpdate.objects.get(product=self.milk, kind=StockUpdate.CHECKPOINT)
+        self.assertEqual((checkpoint.quantity_change, checkpoint.balance), (9, 95))
+
+    def test_command_writes_jsonl(self):
+        out = io.StringIO()
+        call_command('compact_ledger', days=30, format='jsonl', output_dir=os.path.dirname(self.archive), stdout=out)
+        (name,) = os.listdir(os.path.dirname(self.archive))
+        self.assertTrue(name.endswith(".jsonl.gz"))
+        with gzip.open(os.path.join(os.path.dirname(self.archive), name), 'rt') as f:
+            self.assertEqual([json.loads(line)['quantity_change'] for line in f], [10, -4, 6])
+
+    def test_str_does_not_query(self):
+        update = StockUpdate.objects.filter(kind=StockUpdate.MOVEMENT).first()
+        with self.assertNumQueries(0):
+            str(update)
+
+
+class ReorderForecastTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Dairy")
+        self.milk = Product.objects.create(name="Milk", description="", category=category, quantity_in_stock=100)
+        self.salt = Product.objects.create(name="Salt", description="", category=category, quantity_in_stock=3)
+        today = timezone.localdate()
+        DailyMovementRollup.objects.bulk_create([
+            DailyMovementRollup(product=self.milk, period_start=today - timedelta(days=i), quantity_out=10, movements=1)
+            for i in range(10)
+        ] + [
+            # Outside the 90 day window.
+            DailyMovementRollup(product=self.salt, period_start=today - timedelta(days=200), quantity_out=50, movements=1),
+        ])
+
+    def test_velocity_stockout_and_reorder_quantity(self):
+        out = io.StringIO()
+        call_command('refresh_forecasts', stdout=out)
+        self.assertIn("Forecast 2 products", out.getvalue())
+        milk = ReorderForecast.objects.get(product=self.milk)
+        self.assertEqual(
+            (milk.daily_velocity, milk.demand_stddev, milk.days_to_stockout, milk.reorder_point, milk.suggested_quantity),
+            (10, 0, 10, 70, 270),
+        )
+        salt = ReorderForecast.objects.get(product=self.salt)
+        self.assertEqual((salt.daily_velocity, salt.days_to_stockout, salt.suggested_quantity), (0, None, 0))
+
+    @skipIf(forecasting.np is None, "numpy is not installed")
+    def test_numpy_and_python_paths_agree(self):
+        rng = random.Random(7)
+        columns = [[rng.randint(0, 500) for _ in range(200)] for _ in range(2)]
+        squares = [c * rng.randint(1, 40) for c in columns[1]]
+        observed = [rng.randint(1, 90) for _ in range(200)]
+        fast = list(forecasting._forecast_numpy(columns[0], columns[1], squares, observed, 7, 30))
+        slow = list(forecasting._forecast_python(columns[0], columns[1], squares, observed, 7, 30))
+        for a, b in zip(fast, slow):
+            self.assertEqual(a[3:], b[3:])
+            for x, y in zip(a[:3], b[:3]):
+                if x is None or y is None:
+                    self.assertEqual(x, y)
+                else:
+                    self.assertAlmostEqual(x, y)
+
+
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="employee", password="pass")
+        user.groups.add(Group.objects.create(name="Employee"))
+        self.client.force_login(user)
+        self.categories, _ = seed_catalog(3)
+        self.url = reverse('inventory:product_list')
+
+    def get(self, url:str):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response.content.decode(), len(ctx)
+
+    def test_warm_list_skips_dropdown_queries(self):
+        self.get(self.url)
+        bump_versions('category', 'supplier')
+        _, cold = self.get(self.url)
+        content, warm = self.get(self.url)
+        self.assertEqual(cold - warm, 2)
+        self.assertIn("Category 1</option>", content)
+
+    def test_missing_entry_does_not_release_another_refreshers_lock(self):
+        cache.add('report:lock', 1)
+        self.assertEqual(cached_for_versions('report', ['product'], lambda: 1, 60), 1)
+        cache.delete('report')
+
+        async def acompute():
+            return 2
+        self.assertEqual(async_to_sync(acached_for_versions)('report', ['product'], acompute, 60), 2)
+        self.assertEqual(cache.get('report:lock'), 1)
+
+    def test_edits_invalidate_fragments(self):
+        self.get(self.url)
+        category = self.categories[0]
+        category.name = "Renamed"
+        category.save()
+        product = Product.objects.get(name="Product 1")
+        adjust_stock(product.id, 100)
+        content, _ = self.get(self.url)
+        self.assertIn("Renamed</option>", content)
+        self.assertIn(f"In Stock: {product.quantity_in_stock + 100}", content)
+
+    def test_detail_fragment_follows_category(self):
+        product = Product.objects.get(name="Product 0")
+        url = reverse('inventory:product_detail', args=[product.id])
+        _, cold = self.get(url)
+        _, warm = self.get(url)
+        self.assertLess(warm, cold)
+        product.category.name = "Dairy"
+        product.category.save()
+        self.assertIn("Dairy", self.get(url)[0])
+
+
+class RoleCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.employees = Group.objects.create(name="Employee")
+        self.admins = Group.objects.create(name="Admin")
+        self.user = User.objects.create_user(username="employee", password="pass")
+        self.user.groups.add(self.employees)
+        self.url = reverse('inventory:product_list')
+
+    def group_queries(self, url:str):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, [q for q in ctx.captured_queries if 'auth_user_groups' in q['sql']]
+
+    def test_groups_are_loaded_once_per_session(self):
+        self.client.force_login(self.user)
+        _, first = self.group_queries(self.url)
+        response, second = self.group_queries(self.url)
+        self.assertEqual((len(first), len(second)), (1, 0))
+        self.assertFalse(response.context['is_admin'])
+
+    def test_membership_changes_invalidate(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.admins.user_set.add(self.user)
+        self.assertTrue(self.client.get(self.url).context['is_admin'])
+        self.user.groups.remove(self.employees)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_login_redirect_uses_one_group_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('users:login'), {'identifier': "employee", 'password': "pass"})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(sum('auth_user_groups' in q['sql'] for q in ctx.captured_queries), 1)
+
+
+def png_upload(name:str="photo.png", size=(1200, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class SyntheticDatasetTests(TestCase):
+
+    def generate(self, **options):
+        return generate_dataset(products=40, categories=3, suppliers=5, stock_updates=400, days=30, end=date(2030, 1, 31), **options)
+
+    def test_ledger_adds_up_to_stock_and_lots(self):
+        counts = self.generate()
+        self.assertEqual(Product.objects.count(), counts['products'])
+        self.assertEqual(StockUpdate.objects.count(), counts['stock_updates'])
+        ledger = dict(StockUpdate.objects.values('product_id').annotate(total=Sum('quantity_change')).values_list('product_id', 'total'))
+        lots = dict(StockLot.objects.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+        for pk, quantity in Product.objects.values_list('pk', 'quantity_in_stock'):
+            self.assertEqual((ledger.get(pk, 0), lots.get(pk, 0)), (quantity, quantity))
+        timestamps = StockUpdate.objects.order_by('pk').values_list('timestamp', flat=True)
+        self.assertEqual(timezone.localdate(timestamps.first()), date(2030, 1, 1))
+        self.assertEqual(list(timestamps), sorted(timestamps))
+        self.assertEqual(CategoryStockRollup.objects.aggregate(total=Sum('total_stock'))['total'], sum(ledger.values()))
+
+    def test_same_seed_gives_same_rows(self):
+        def rows():
+            return list(Product.objects.order_by('pk').values_list('name', 'price', 'quantity_in_stock', 'expiry_date'))
+
+        self.generate(seed=3)
+        first = rows()
+        clear_catalog()
+        self.generate(seed=3)
+        self.assertEqual(rows(), first)
+
+    def test_clear_option_empties_the_catalog_without_per_row_deletes(self):
+        self.generate()
+        deleted = []
+        pre_delete.connect(lambda sender, **kwargs: deleted.append(sender), weak=False, dispatch_uid='test_clear')
+        self.addCleanup(pre_delete.disconnect, dispatch_uid='test_clear')
+        call_command(
+            'generate_dataset', clear=True, products=5, categories=2, suppliers=2, stock_updates=20, stdout=io.StringIO(),
+        )
+        self.assertEqual(deleted, [])
+        self.assertEqual((Product.objects.count(), Category.objects.count(), StockUpdate.objects.count()), (5, 2, 20))
+        self.assertEqual(CategoryStockRollup.objects.aggregate(total=Sum('product_count'))['total'], 5)
+        # Ledger rows saved normally still get stamped with now.
+        self.assertTrue(StockUpdate._meta.get_field('timestamp').auto_now_add)
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_bench_views_writes_json(self):
+        self.generate()
+        path = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command('bench_views', repeat=2, output=path, only=['product_list', 'update_stock', 'inventory_report_csv'], stdout=io.StringIO())
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(set(report['scenarios']), {'product_list', 'update_stock', 'inventory_report_csv'})
+        self.assertLessEqual(report['scenarios']['product_list']['p50_ms'], report['scenarios']['product_list']['p99_ms'])
+        # The benchmark's stock updates were rolled back.
+        self.assertEqual(StockUpdate.objects.count(), 400)
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        profiling.stats.clear()
+        seed_catalog(6)
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+
+    def test_disabled_middleware_drops_out(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: HttpResponse())
+        self.client.force_login(self.admin)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('users:product_list')).headers)
+
+    @override_settings(REQUEST_PROFILING=True)
+    def test_requests_are_timed_per_url_name(self):
+        self.client.force_login(self.admin)
+        for _ in range(3):
+            response = self.client.get(reverse('users:product_list'))
+        self.assertRegex(response.headers['Server-Timing'], r'total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"')
+        stats = self.client.get(reverse('users:profiling_stats')).json()
+        self.assertTrue(stats['enabled'])
+        view = stats['views']['users:product_list']
+        self.assertEqual(view['requests'], 3)
+        self.assertLessEqual(view['wall_ms']['p50'], view['wall_ms']['p99'])
+        self.assertEqual(view['duplicate_queries'], [])
+
+    @override_settings(REQUEST_PROFILING=True)
+    def test_repeated_queries_are_reported(self):
+        def per_row_view(request):
+            for product in Product.objects.all():
+                product.category.name
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        with self.assertLogs('inventory.profiling', 'WARNING'):
+            response = ProfilingMiddleware(per_row_view)(request)
+        self.assertIn('dup;desc="6 repeated queries"', response.headers['Server-Timing'])
+        (statement,) = profiling.stats.summary()['<unresolved>']['duplicate_queries']
+        self.assertIn('inventory_category', statement['sql'])
+
+    def test_stats_are_admin_only(self):
+        user = User.objects.create_user(username="staff", password="pass")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('users:profiling_stats')).status_code, 302)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual([profiling.percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertIsNone(profiling.percentile([], 50))
+
+
+class ThumbnailTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.category = Category.objects.create(name="Snacks")
+
+    def create_product(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                name="Chips", description="", category=self.category, quantity_in_stock=10, image=png_upload(),
+            )
+
+    def test_upload_generates_webp_and_jpeg_thumbnails(self):
+        product = self.create_product()
+        for width in WIDTHS:
+            for ext, fmt in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(thumbnail_name(product.image.name, width, ext)) as f:
+                    image = Image.open(f)
+                    self.assertEqual((image.format, image.width), (fmt, width))
+
+    def test_sources_differing_only_in_extension_get_their_own_thumbnails(self):
+        self.assertNotEqual(thumbnail_name('products/shoe.png', 320, 'webp'), thumbnail_name('products/shoe.jpg', 320, 'webp'))
+        default_storage.save('products/shoe.png', png_upload(size=(400, 400)))
+        default_storage.save('products/shoe.jpg', png_upload(size=(400, 200)))
+        generate_thumbnails('products/shoe.png')
+        self.assertEqual(generate_thumbnails('products/shoe.jpg'), len(WIDTHS) * 2)
+        with default_storage.open(thumbnail_name('products/shoe.jpg', 320, 'webp')) as f:
+            self.assertEqual(Image.open(f).size, (320, 160))
+
+    def test_saving_without_new_upload_does_not_regenerate(self):
+        product = self.create_product()
+        with mock.patch('inventory.thumbnails.generate_on_upload') as generate, self.captureOnCommitCallbacks(execute=True):
+            product.quantity_in_stock = 3
+            product.save()
+        generate.assert_not_called()
+
+    def test_responsive_image_tag(self):
+        product = self.create_product()
+        html = Template('{% load responsive_images %}{% responsive_image image alt="Chips" sizes="50vw" class="card-img-top" %}').render(
+            Context({'image': product.image})
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f'{thumbnail_name(product.image.name, 640, "webp")} 640w', html)
+        self.assertIn('class="card-img-top"', html)
+        self.assertNotIn(f'src="{product.image.url}"', html)
+
+    def test_missing_thumbnails_fall_back_to_original_and_backfill(self):
+        product = Product.objects.create(
+            name="Chips", description="", category=self.category, quantity_in_stock=10, image=png_upload(),
+        )
+        supplier = Supplier.objects.create(name="Crunch", email="c@example.com", phone="1", logo=png_upload("logo.png", (300, 300)))
+        html = Template('{% load responsive_images %}{% responsive_image image %}').render(Context({'image': product.image}))
+        self.assertIn(f'src="{product.image.url}"', html)
+
+        out = io.StringIO()
+        call_command('generate_thumbnails', workers=2, stdout=out)
+        self.assertIn("Checked 2 images, wrote 12 thumbnails, 0 failed.", out.getvalue())
+        self.assertTrue(default_storage.exists(thumbnail_name(supplier.logo.name, 160, 'jpg')))
+        html = Template('{% load responsive_images %}{% responsive_image image %}').render(Context({'image': product.image}))
+        self.assertIn('<picture>', html)
+
+
+class StockAdjustmentConcurrencyTests(TransactionTestCase):
+
+    def test_ledger_matches_stock_under_contention(self):
+        category = Category.objects.create(name="Dairy")
+        product = Product.objects.create(name="Milk", description="", category=category, quantity_in_stock=50)
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(25):
+                    change = rng.choice([-7, -3, -1, 2, 5])
+                    while True:
+                        try:
+                            adjust_stock(product.id, change)
+                        except InsufficientStock:
+                            pass
+                        except OperationalError:
+                            # SQLite reports a busy database instead of waiting; try again.
+                            time.sleep(0.001)
+                            continue
+                        break
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        ledger = StockUpdate.objects.filter(product=product).aggregate(total=Sum('quantity_change'))['total'] or 0
+        self.assertGreaterEqual(product.quantity_in_stock, 0)
+        self.assertEqual(50 + ledger, product.quantity_in_stock)
+
+
+class ReplicaRoutingTests(TestCase):
+    """Routing decisions only; nothing here queries a replica."""
+
+    def setUp(self):
+        seed_catalog(3)
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+        patcher = mock.patch.object(routers, 'replica_configured', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_marked_catalog_reads_are_routed(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        with use_replica():
+            self.assertEqual(router.db_for_read(Product), REPLICA_ALIAS)
+            self.assertIsNone(router.db_for_read(User))
+            self.assertIsNone(router.db_for_write(Product))
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, 'inventory'))
+
+    def test_streamed_body_is_read_from_replica_too(self):
+        seen = []
+
+        @read_from_replica
+        def view(request):
+            seen.append(reading_from_replica())
+
+            def rows():
+                for _ in range(2):
+                    seen.append(reading_from_replica())
+                    yield b"row"
+            return StreamingHttpResponse(rows())
+
+        response = view(RequestFactory().get('/'))
+        seen.append(reading_from_replica())
+        b"".join(response.streaming_content)
+        self.assertEqual(seen, [True, False, True, True])
+
+    async def test_async_views_and_bodies_are_routed(self):
+        seen = []
+
+        @read_from_replica
+        async def view(request):
+            seen.append(reading_from_replica())
+
+            async def rows():
+                seen.append(reading_from_replica())
+                yield b"row"
+            return StreamingHttpResponse(rows())
+
+        response = await view(RequestFactory().get('/'))
+        self.assertEqual([chunk async for chunk in response.streaming_content], [b"row"])
+        self.assertEqual(seen, [True, True])
+
+    def test_pinned_client_reads_the_primary(self):
+        seen = []
+        view = read_from_replica(lambda request: seen.append(reading_from_replica()) or HttpResponse())
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        view(request)
+        self.assertEqual(seen, [False])
+
+    def test_catalog_writes_pin_the_client(self):
+        product = Product.objects.get(name="Product 1")
+        response = self.client.get(reverse('users:product_list'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.client.post(reverse('users:update_stock', args=[product.id]), {'quantity_change': 1})
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        # Deleting is a GET here; the router sees the write all the same.
+        self.client.cookies.pop(PIN_COOKIE)
+        response = self.client.get(reverse('users:product_delete', args=[product.id]))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_middleware_drops_out_without_replica(self):
+        routers.replica_configured.return_value = False
+        with self.assertRaises(MiddlewareNotUsed):
+            ReadYourWritesMiddleware(lambda request: HttpResponse())
+
+
+@skipUnless(REPLICA_ALIAS in connections, "Set DATABASE_REPLICA_NAME to run against a replica alias.")
+class ReplicaDatabaseTests(TransactionTestCase):
+    """Run with DATABASE_REPLICA_NAME set; in tests the replica mirrors the default database."""
+    databases = '__all__'
+
+    def setUp(self):
+        seed_catalog(3)
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+
+    def test_reports_and_exports_query_the_replica(self):
+        for name in ('inventory_report', 'supplier_report', 'inventory_report_csv'):
+            with self.subTest(view=name), CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+                response = self.client.get(reverse(f'users:{name}'))
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                self.assertTrue(replica.captured_queries)
+                self.assertTrue(all('"inventory_' in query['sql'] for query in replica.captured_queries))
+
+
+class DatabaseSettingsTests(TestCase):
+
+    def test_sqlite_is_tuned_by_default(self):
+        config = database_settings({}, '/data/db.sqlite3')
+        self.assertEqual(config['NAME'], '/data/db.sqlite3')
+        self.assertIn('PRAGMA journal_mode=WAL', config['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA synchronous=NORMAL', config['OPTIONS']['init_command'])
+        self.assertEqual((config['OPTIONS']['timeout'], config['OPTIONS']['transaction_mode']), (20, 'IMMEDIATE'))
+        self.assertNotIn('OPTIONS', database_settings({'SQLITE_TUNING': 'False'}, '/data/db.sqlite3'))
+
+    def test_postgres_keeps_connections_or_pools_them(self):
+        env = {'DATABASE_ENGINE': 'postgres', 'DATABASE_NAME': 'stock', 'DATABASE_HOST': 'db'}
+        config = database_settings(env, None)
+        self.assertEqual((config['NAME'], config['HOST'], config['CONN_MAX_AGE']), ('stock', 'db', 60))
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        pooled = database_settings({**env, 'DATABASE_POOL': 'True', 'DATABASE_POOL_MAX_SIZE': '20'}, None)
+        self.assertEqual(pooled['CONN_MAX_AGE'], 0)
+        self.assertEqual(pooled['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20})
+        with self.assertRaises(ImproperlyConfigured):
+            database_settings({'DATABASE_ENGINE': 'oracle'}, None)
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite pragmas")
+    def test_pragmas_are_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            busy_timeout = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+        self.assertEqual((busy_timeout, synchronous), (20_000, 1))
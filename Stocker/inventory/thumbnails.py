@@ -0,0 +1,120 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (160, 320, 640)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Model -> image field that gets thumbnails.
+IMAGE_FIELDS = {'product': 'image', 'supplier': 'logo'}
+
+
+def thumbnail_name(name:str, width:int, ext:str):
+    """``products/shoe.png`` -> ``products/thumbs/shoe.png-320w.webp``.
+
+    The source extension stays in the name so ``shoe.png`` and ``shoe.jpg``
+    don't share thumbnails.
+    """
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, 'thumbs', f'{filename}-{width}w.{ext}')
+
+
+def _ready_key(name:str):
+    # v2: thumbnails named before the source extension was kept don't count.
+    return f'inventory:thumbs:v2:{name}'
+
+
+def _flatten(image:Image.Image):
+    # JPEG has no alpha; put transparent images on white.
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_thumbnails(name:str, force:bool=False, storage=default_storage):
+    """Write every width/format thumbnail of the stored image ``name``.
+
+    Existing thumbnails are kept unless ``force``. Returns how many files
+    were written.
+    """
+    targets = [
+        (width, ext) for width in WIDTHS for ext in FORMATS
+        if force or not storage.exists(thumbnail_name(name, width, ext))
+    ]
+    if targets:
+        with storage.open(name, 'rb') as f:
+            original = ImageOps.exif_transpose(Image.open(f))
+            original.load()
+        rgba = original.convert('RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        flat = _flatten(original)
+        for width, ext in targets:
+            image = (rgba if ext == 'webp' else flat).copy()
+            image.thumbnail((width, width * 4), Image.LANCZOS)
+            buffer = BytesIO()
+            fmt, options = FORMATS[ext]
+            image.save(buffer, fmt, **options)
+            target = thumbnail_name(name, width, ext)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+    cache.set(_ready_key(name), True, timeout=None)
+    return len(targets)
+
+
+def thumbnails_ready(name:str, storage=default_storage):
+    """Whether the thumbnails of ``name`` exist; positive answers are cached."""
+    if cache.get(_ready_key(name)):
+        return True
+    ready = all(storage.exists(thumbnail_name(name, width, ext)) for width in WIDTHS for ext in FORMATS)
+    if ready:
+        cache.set(_ready_key(name), True, timeout=None)
+    return ready
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _generate(name:str, force:bool):
+    try:
+        return name, generate_thumbnails(name, force=force), None
+    except Exception as e:
+        return name, 0, str(e)
+
+
+def generate_many(names, workers:int=None, force:bool=False):
+    """Generate thumbnails for many images, yielding ``(name, written, error)``.
+
+    Resizing is CPU bound, so with more than one worker the images are spread
+    over a process pool.
+    """
+    names = list(names)
+    if workers == 1 or len(names) < 2:
+        for name in names:
+            yield _generate(name, force)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        yield from pool.map(_generate, names, [force] * len(names), chunksize=8)
+
+
+def generate_on_upload(name:str):
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        # A bad upload shouldn't fail the save; templates fall back to the original.
+        logger.exception("Could not generate thumbnails for %s", name)
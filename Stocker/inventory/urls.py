@@ -5,11 +5,14 @@ app_name = 'inventory'
 
 urlpatterns = [
     #Product
-    path('',views.product_list, name='product_list'),
-    path('products/add/', views.product_add, name='product_add'),
-    path('<int:product_id>/', views.product_detail, name='product_detail'),
-    path('<int:product_id>/edit/', views.product_update, name='product_update'),
+    path('',views.ProductListView.as_view(namespace=app_name, template_name='inventory/product_list.html', group='Employee'), name='product_list'),
+    path('products/add/', views.ProductAddView.as_view(namespace=app_name, template_name='inventory/product_add.html'), name='product_add'),
+    path('<int:product_id>/', views.ProductDetailView.as_view(namespace=app_name, template_name='inventory/product_detail.html'), name='product_detail'),
+    path('<int:product_id>/edit/', views.ProductUpdateView.as_view(namespace=app_name, template_name='inventory/product_update.html'), name='product_update'),
     #path('products/<int:pk>/delete/', views.product_delete, name='product_delete'),
-    path('<int:product_id>/update_stock/', views.update_stock, name='update_stock'),
+    path('<int:product_id>/update_stock/', views.StockUpdateView.as_view(namespace=app_name, template_name='inventory/stock_update.html'), name='update_stock'),
+    path('stock/movements/', views.stock_movements, name='stock_movements'),
+    path('<int:product_id>/history/', views.stock_history, name='stock_history'),
+    path('<int:product_id>/history/chart/', views.stock_history_chart, name='stock_history_chart'),
 
 ]
@@ -1,153 +1,208 @@
-from django.shortcuts import render , redirect
-from django.http import HttpRequest, HttpResponse
+from django.shortcuts import render , redirect, get_object_or_404, aget_object_or_404
+from django.http import Http404, HttpRequest, JsonResponse
+from django.views import View
+from django.views.decorators.http import require_POST
 from .models import Product, Category, Supplier, StockUpdate
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from .forms import ProductForm, CategoryForm, SupplierForm
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.contrib.auth.decorators import user_passes_test
-from django.core.mail import send_mail
-from stocker import settings
+from .history import PERIODS, rollup_model
+from .asyncutils import arender
+from .pagination import CursorPaginator, apaginate
+from .roles import group_required
+from .services import (
+    adjust_stock, apply_stock_movements, create_product, parse_stock_form, product_list_queryset, update_product,
+    BelowReorderLevel, StockError,
+)
+import json
+from datetime import date, timedelta
+from django.utils import timezone
 
 
 # Create your views here.
 
-def is_employee(user):
-    return user.groups.filter(name='Employee').exists()
+HISTORY_PAGE_SIZE = 25
+HISTORY_DEFAULT_SPAN = {'day': timedelta(days=90), 'week': timedelta(weeks=52)}
 
 
 @login_required
 @permission_required('inventory.change_product', raise_exception=True)
-def update_stock(request:HttpRequest, product_id:int):
-    product = Product.objects.get(pk = product_id)
-    if request.method == 'POST':
-        try:
-            quantity_change = int(request.POST.get('quantity_change'))
-        except:
-            messages.error(request,"Invaild quantity.")
-            return redirect('inventory:update_stock', product_id=product.id)
-        
-        old_quantity = product.quantity_in_stock
-        product.quantity_in_stock += quantity_change
-
-
-        if product.quantity_in_stock < 0 :
-            messages.error(request, "Resulting stock can't be negative.")
-            return redirect('inventory:update_stock', product_id=product.id)
-        
-        product.save()
-        
-        StockUpdate.objects.create(
-            product=product,
-            updated_by = request.user,
-            quantity_change = quantity_change,
-            note=request.POST.get('note','')
-        )
-        
-        if product.quantity_in_stock <= 5 and old_quantity > 5:
-            send_mail(
-                subject = f"Low Stock Alert: {product.name}",
-                message = f"{product.name} has only {product.quantity_in_stock} left in stock.",
-                from_email= settings.EMAIL_HOST_USER,
-                recipient_list = [settings.EMAIL_HOST_USER],
-                fail_silently = False,
-            )
+@require_POST
+def stock_movements(request:HttpRequest):
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': "Invalid JSON."}, status=400)
+    movements = payload.get('movements') if isinstance(payload, dict) else payload
+    if not isinstance(movements, list):
+        return JsonResponse({'error': "Expected a list of movements."}, status=400)
+
+    try:
+        ok, results = apply_stock_movements(movements, user=request.user)
+    except StockError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'applied': ok, 'results': results}, status=200 if ok else 400)
 
 
-        messages.success(request, "Stock updated successfully.")
-        return redirect('inventory:product_list')
-    return render(request, 'inventory/stock_update.html', {'product':product})
+@login_required
+def stock_history(request:HttpRequest, product_id:int):
+    product = get_object_or_404(Product, pk=product_id)
+    movements = StockUpdate.objects.filter(product=product).select_related('updated_by')
+    page = CursorPaginator(movements, HISTORY_PAGE_SIZE, ordering=('-timestamp', '-id')).get_page(request.GET.get('cursor'))
+    return render(request, 'inventory/stock_history.html', {'product': product, 'movements': page})
+
 
+@login_required
+def stock_history_chart(request:HttpRequest, product_id:int):
+    """Net movement per day or week, read from the movement rollups."""
+    product = get_object_or_404(Product.objects.only('id', 'name'), pk=product_id)
+    period = request.GET.get('period', 'day')
+    if period not in PERIODS:
+        return JsonResponse({'error': f"period must be one of {', '.join(PERIODS)}."}, status=400)
+    try:
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else end - HISTORY_DEFAULT_SPAN[period]
+    except ValueError:
+        return JsonResponse({'error': "start and end must be YYYY-MM-DD dates."}, status=400)
+
+    buckets = rollup_model(period).objects.filter(
+        product_id=product.id, period_start__range=(start, end),
+    ).order_by('period_start').values_list('period_start', 'quantity_in', 'quantity_out', 'movements', 'closing_quantity')
+    return JsonResponse({
+        'product_id': product.id,
+        'name': product.name,
+        'period': period,
+        'start': start,
+        'end': end,
+        'buckets': [
+            {'period_start': period_start, 'in': quantity_in, 'out': quantity_out, 'net': quantity_in - quantity_out,
+             'movements': movements, 'closing_quantity': closing}
+            for period_start, quantity_in, quantity_out, movements, closing in buckets
+        ],
+    })
 
 
 #Product
-@login_required
-@user_passes_test(is_employee)
-def product_list(request:HttpRequest):
-    query = request.GET.get('q')
-    products = Product.objects.all()
-    category = request.GET.get('category')
-    supplier = request.GET.get('supplier')
-    if query:
-        products = products.filter(name__icontains=query)
-    if category:
-        products = products.filter(category__id=category)
-    if supplier:
-        products = products.filter(suppliers__id=supplier)
-    paginator = Paginator(products, 10)
-    page = request.GET.get('page')
-    products =  paginator.get_page(page)
-    context = {
-        "products": products,
-        "categories": Category.objects.all(),
-        "suppliers": Supplier.objects.all(),
-    }
-    return render(request, 'inventory/product_list.html', context)
+class ProductView(View):
+    """Base for the product views both URL trees share; each tree passes its
+    own ``namespace`` and ``template_name`` to ``as_view``.
 
+    Access checks are applied as the function decorators, which, unlike the
+    auth mixins, also work for the async views.
+    """
+    namespace = None
+    template_name = None
+    permission = None
+    group = None
 
-@login_required
-@permission_required('inventory.add_product', raise_exception=True)
-def product_add(request:HttpRequest):
-    categories = Category.objects.all()
-    suppliers = Supplier.objects.all()
-    if request.method == "POST":
-        form = ProductForm(request.POST, request.FILES)
-        if form.is_valid():
-            if int(request.POST.get('quantity_in_stock')) <= 5:
-                messages.error(request, "Stock must be greater than 5 when adding or updating a product.")
-                return redirect('inventory:product_add')
-            form.save()
-            messages.success(request, "Product added successfully")
-            return redirect('inventory:product_list')
-    else:
-        form = ProductForm()
-    return render(request, 'inventory/product_add.html', {'form':form , 'categories':categories, 'suppliers':suppliers})
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        group = initkwargs.get('group', cls.group)
+        permission = initkwargs.get('permission', cls.permission)
+        if group:
+            view = group_required(group)(view)
+        if permission:
+            view = permission_required(permission, raise_exception=True)(view)
+        return login_required(view)
 
+    def redirect(self, name:str, **kwargs):
+        return redirect(f'{self.namespace}:{name}', **kwargs)
 
-@login_required
-def product_detail(request, product_id:int):
-    product = Product.objects.get(pk = product_id)
-    return render(request, 'inventory/product_detail.html', {'product':product})
 
+class ProductListView(ProductView):
+
+    async def get(self, request:HttpRequest):
+        products = await apaginate(request, product_list_queryset(request.GET), 10)
+        context = {
+            "products": products,
+            "categories": Category.objects.all(),
+            "suppliers": Supplier.objects.all(),
+        }
+        return await arender(request, self.template_name, context)
+
+
+class ProductDetailView(ProductView):
+
+    async def get(self, request:HttpRequest, product_id:int):
+        product = await aget_object_or_404(Product.objects.select_related('category'), pk = product_id)
+        return await arender(request, self.template_name, {'product':product})
 
-@login_required
-@permission_required('inventory.change_product', raise_exception=True)
-def product_update(request:HttpRequest, product_id:int):
-    product = Product.objects.get(pk = product_id)
-    if request.method == 'POST':
-        product.name = request.POST.get('name')
-        product.description = request.POST.get('description')
-        product.price = request.POST.get('price')
-        product.category_id = request.POST.get('category')
-        product.quantity_in_stock = request.POST.get('quantity_in_stock')
-        product.expiry_date = request.POST.get('expiry_date') or None
-
-        if 'image' in request.FILES:
-            product.image = request.FILES['image'] 
-        
-        if int(request.POST.get('quantity_in_stock')) <= 5:
-                messages.error(request, "Stock must be greater than 5 when adding or updating a product.")
-                return redirect('inventory:product_update', product_id = product.id)
-
-        product.save()
-        product.suppliers.set(request.POST.getlist('suppliers'))
 
+class ProductAddView(ProductView):
+    permission = 'inventory.add_product'
+
+    def get(self, request:HttpRequest, form=None):
+        context = {'form':form or ProductForm(), 'categories':Category.objects.all(), 'suppliers':Supplier.objects.all()}
+        return render(request, self.template_name, context)
+
+    def post(self, request:HttpRequest):
+        form = ProductForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return self.get(request, form)
+        try:
+            create_product(form)
+        except BelowReorderLevel as e:
+            messages.error(request, str(e))
+            return self.redirect('product_add')
+        messages.success(request, "Product added successfully")
+        return self.redirect('product_list')
+
+
+class ProductUpdateView(ProductView):
+    permission = 'inventory.change_product'
+
+    def get(self, request:HttpRequest, product_id:int):
+        context = {
+            'product': get_object_or_404(Product, pk = product_id),
+            'category_choices': list(Category.objects.values_list('id', 'name')),
+            'suppliers': Supplier.objects.all(),
+        }
+        return render(request, self.template_name, context)
+
+    def post(self, request:HttpRequest, product_id:int):
+        product = get_object_or_404(Product, pk = product_id)
+        try:
+            update_product(product, request.POST, request.FILES)
+        except ValidationError as e:
+            for field, errors in e.message_dict.items():
+                label = ProductForm.base_fields[field].label if field in ProductForm.base_fields else None
+                for error in errors:
+                    messages.error(request, f"{label}: {error}" if label else error)
+            return self.redirect('product_update', product_id = product.id)
+        except BelowReorderLevel as e:
+            messages.error(request, str(e))
+            return self.redirect('product_update', product_id = product.id)
         messages.success(request, "Product updated successfully.")
-        return redirect('inventory:product_list')
-    
-    context = {
-        'product': product,
-        'category_choices': [(c.id, c.name) for c in Category.objects.all()],
-        'suppliers': Supplier.objects.all(),
-    }
+        return self.redirect('product_list')
 
-    return render(request, 'inventory/product_update.html', context)
 
-@login_required
-@permission_required('inventory.delete_product', raise_exception=True)
-def product_delete(request:HttpRequest, product_id:int):
-    product = Product.objects.get(pk = product_id)
-    product.delete()
-    messages.success(request, "Product deleted successfully")
-    return redirect('inventory:product_list')
\ No newline at end of file
+class ProductDeleteView(ProductView):
+    permission = 'inventory.delete_product'
+
+    def get(self, request:HttpRequest, product_id:int):
+        get_object_or_404(Product, pk = product_id).delete()
+        messages.success(request, "Product deleted successfully")
+        return self.redirect('product_list')
+
+    post = get
+
+
+class StockUpdateView(ProductView):
+    permission = 'inventory.change_product'
+
+    def get(self, request:HttpRequest, product_id:int):
+        return render(request, self.template_name, {'product':get_object_or_404(Product, pk = product_id)})
+
+    def post(self, request:HttpRequest, product_id:int):
+        try:
+            quantity_change, expiry_date, note = parse_stock_form(request.POST)
+            adjust_stock(product_id, quantity_change, user=request.user, note=note, expiry_date=expiry_date)
+        except Product.DoesNotExist:
+            raise Http404("No Product matches the given query.")
+        except StockError as e:
+            messages.error(request, str(e))
+            return self.redirect('update_stock', product_id=product_id)
+        messages.success(request, "Stock updated successfully.")
+        return self.redirect('product_list')
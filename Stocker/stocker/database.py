@@ -0,0 +1,77 @@
+"""Build ``DATABASES`` entries from environment variables.
+
+``DATABASE_ENGINE`` picks the backend (``sqlite``, the default, or
+``postgres``). Postgres reads ``DATABASE_NAME``/``USER``/``PASSWORD``/``HOST``/
+``PORT``, keeps connections for ``DATABASE_CONN_MAX_AGE`` seconds with health
+checks, or, with ``DATABASE_POOL=True``, hands them out from a psycopg pool
+(``DATABASE_POOL_MIN_SIZE``/``MAX_SIZE``) instead. SQLite runs in WAL mode
+with the pragmas below unless ``SQLITE_TUNING=False``.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+
+SQLITE_BUSY_TIMEOUT = 20
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE_KB = 64 * 1024
+POSTGRES_CONN_MAX_AGE = 60
+
+
+def _flag(env, name:str, default:bool):
+    return env.get(name, str(default)) == 'True'
+
+
+def sqlite_settings(env, name):
+    config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}
+    if not _flag(env, 'SQLITE_TUNING', True):
+        return config
+    mmap_size = int(env.get('SQLITE_MMAP_SIZE', SQLITE_MMAP_SIZE))
+    config['OPTIONS'] = {
+        # Readers no longer block the writer, and NORMAL only syncs at
+        # checkpoints, which is still crash safe in WAL mode.
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f'PRAGMA mmap_size={mmap_size};'
+            f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};'
+            'PRAGMA temp_store=MEMORY;'
+        ),
+        # Seconds a writer waits for the lock instead of failing with
+        # "database is locked".
+        'timeout': int(env.get('SQLITE_BUSY_TIMEOUT', SQLITE_BUSY_TIMEOUT)),
+        # Take the write lock at BEGIN. A deferred transaction that reads and
+        # then writes can't wait for the lock and fails immediately.
+        'transaction_mode': 'IMMEDIATE',
+    }
+    return config
+
+
+def postgres_settings(env):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('DATABASE_NAME', 'stocker'),
+        'USER': env.get('DATABASE_USER', ''),
+        'PASSWORD': env.get('DATABASE_PASSWORD', ''),
+        'HOST': env.get('DATABASE_HOST', ''),
+        'PORT': env.get('DATABASE_PORT', ''),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if _flag(env, 'DATABASE_POOL', False):
+        # Pooled connections are returned to the pool after each request;
+        # Django refuses a pool combined with persistent connections.
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS'] = {'pool': {
+            'min_size': int(env.get('DATABASE_POOL_MIN_SIZE', 2)),
+            'max_size': int(env.get('DATABASE_POOL_MAX_SIZE', 10)),
+        }}
+    else:
+        config['CONN_MAX_AGE'] = int(env.get('DATABASE_CONN_MAX_AGE', POSTGRES_CONN_MAX_AGE))
+    return config
+
+
+def database_settings(env, default_sqlite_path):
+    engine = env.get('DATABASE_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        return sqlite_settings(env, env.get('DATABASE_NAME', default_sqlite_path))
+    if engine == 'postgres':
+        return postgres_settings(env)
+    raise ImproperlyConfigured(f"DATABASE_ENGINE must be 'sqlite' or 'postgres', not {engine!r}.")
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from .database import database_settings
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,11 +46,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventory.middleware.RoleMiddleware',
+    'inventory.middleware.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,10 +82,36 @@ WSGI_APPLICATION = 'stocker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Environment driven; see stocker/database.py for the variables. SQLite in
+# WAL mode by default.
 DATABASES = {
+    'default': database_settings(os.environ, BASE_DIR / 'db.sqlite3'),
+}
+
+# Optional read replica for the views marked with inventory.routers.read_from_replica.
+# For a local stand-in point DATABASE_REPLICA_NAME at a second SQLite file and
+# refresh it with the sync_replica command. A client that just wrote reads the
+# primary for DATABASE_REPLICA_MAX_LAG seconds.
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        'HOST': os.environ.get('DATABASE_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['inventory.routers.ReplicaRouter']
+DATABASE_REPLICA_MAX_LAG = int(os.environ.get('DATABASE_REPLICA_MAX_LAG', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared cache
+# (e.g. redis) when running several workers so invalidation reaches all of them.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -138,3 +168,16 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
+# Seconds before a stalled SMTP connection fails, so send_notifications can't hang.
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', 10))
+
+# List views use keyset (cursor) pagination instead of page numbers when enabled.
+CURSOR_PAGINATION = os.environ.get('CURSOR_PAGINATION', 'False') == 'True'
+
+# Per-request timings and query counts (Server-Timing header, users:profiling_stats).
+# Off by default; when off the middleware removes itself at startup.
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'False') == 'True'
+REQUEST_PROFILING_WINDOW = int(os.environ.get('REQUEST_PROFILING_WINDOW', 500))
+
+# compact_ledger writes archived stock movements here.
+LEDGER_ARCHIVE_DIR = os.environ.get('LEDGER_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
@@ -0,0 +1,112 @@
+import csv
+from collections import defaultdict
+
+from django.http import HttpRequest, StreamingHttpResponse
+
+from inventory.models import Product, Supplier
+
+
+EXPORT_CHUNK_SIZE = 2000
+STREAM_BLOCK_ROWS = 500
+
+
+class Echo:
+    # csv.writer only needs an object with write(); hand every line straight back
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename:str, header:list, rows):
+    """Stream ``rows`` as CSV; ``rows`` may be a sync or an async iterable.
+
+    Lines go out in blocks of ``STREAM_BLOCK_ROWS``: one write per row costs
+    more than the row itself, above all under ASGI.
+    """
+    writer = csv.writer(Echo())
+
+    if hasattr(rows, '__aiter__'):
+        async def lines():
+            block = [writer.writerow(header)]
+            async for row in rows:
+                block.append(writer.writerow(row))
+                if len(block) >= STREAM_BLOCK_ROWS:
+                    yield "".join(block)
+                    block = []
+            yield "".join(block)
+    else:
+        def lines():
+            block = [writer.writerow(header)]
+            for row in rows:
+                block.append(writer.writerow(row))
+                if len(block) >= STREAM_BLOCK_ROWS:
+                    yield "".join(block)
+                    block = []
+            yield "".join(block)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# Plain tuples rather than model instances: at tens of thousands of rows the
+# cost of building Products and prefetch caches dwarfs the queries.
+PRODUCT_COLUMNS = ('id', 'name', 'category__name', 'quantity_in_stock', 'expiry_date', 'image')
+
+
+def _product_chunk(after:int, chunk_size:int):
+    return Product.objects.filter(id__gt=after).order_by('id').values_list(*PRODUCT_COLUMNS)[:chunk_size]
+
+
+def _supplier_names(product_ids:list):
+    return (
+        Product.suppliers.through.objects.filter(product_id__in=product_ids)
+        .order_by('product_id', 'id').values_list('product_id', 'supplier__name')
+    )
+
+
+def _inventory_lines(request:HttpRequest, products:list, links):
+    names = defaultdict(list)
+    for product_id, name in links:
+        names[product_id].append(name)
+    storage = Product._meta.get_field('image').storage
+    for product_id, name, category, quantity, expiry_date, image in products:
+        image_url = request.build_absolute_uri(storage.url(image)) if image else ''
+        yield [name, category, ", ".join(names[product_id]), quantity, expiry_date or 'N/A', image_url]
+
+
+def inventory_rows(request:HttpRequest, chunk_size:int=EXPORT_CHUNK_SIZE):
+    after = 0
+    while products := list(_product_chunk(after, chunk_size)):
+        links = list(_supplier_names([row[0] for row in products]))
+        yield from _inventory_lines(request, products, links)
+        if len(products) < chunk_size:
+            return
+        after = products[-1][0]
+
+
+async def ainventory_rows(request:HttpRequest, chunk_size:int=EXPORT_CHUNK_SIZE):
+    after = 0
+    while products := [row async for row in _product_chunk(after, chunk_size)]:
+        links = [link async for link in _supplier_names([row[0] for row in products])]
+        for line in _inventory_lines(request, products, links):
+            yield line
+        if len(products) < chunk_size:
+            return
+        after = products[-1][0]
+
+
+def _supplier_line(request:HttpRequest, s:Supplier):
+    logo_url = request.build_absolute_uri(s.logo.url) if s.logo else ''
+    return [s.name, s.email or '', s.phone or '', s.product_count or 0, s.total_stock or 0, logo_url]
+
+
+def supplier_rows(request:HttpRequest, chunk_size:int=EXPORT_CHUNK_SIZE):
+    suppliers = Supplier.objects.with_rollup().order_by('id')
+    for s in suppliers.iterator(chunk_size=chunk_size):
+        yield _supplier_line(request, s)
+
+
+async def asupplier_rows(request:HttpRequest, chunk_size:int=EXPORT_CHUNK_SIZE):
+    suppliers = Supplier.objects.with_rollup().order_by('id')
+    async for s in suppliers.aiterator(chunk_size=chunk_size):
+        yield _supplier_line(request, s)
@@ -1,4 +1,13 @@
 from django import forms
 
+from inventory.importer import invalid_utf8_line
+
 class ProductImportForm(forms.Form):
-    csv_file = forms.FileField()
\ No newline at end of file
+    csv_file = forms.FileField()
+
+    def clean_csv_file(self):
+        csv_file = self.cleaned_data['csv_file']
+        line = invalid_utf8_line(csv_file)
+        if line:
+            raise forms.ValidationError(f"Line {line} is not UTF-8 text. Save the file as CSV UTF-8 and upload it again.")
+        return csv_file
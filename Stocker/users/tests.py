@@ -1,3 +1,303 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from inventory.models import Product, Category, Supplier, StockLot
+from inventory.forecasting import refresh_forecasts
+from inventory.rollups import rebuild_rollups
+from inventory.services import adjust_stock, apply_stock_movements
+from inventory.tests import seed_catalog, QueryCountHarness
+from users.exports import inventory_rows
+from users.views import REPORT_LOW_STOCK_LIMIT
 
 # Create your tests here.
+
+
+class ReportCsvTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", password="pass", is_staff=True)
+        self.client.force_login(self.admin)
+
+    def test_inventory_csv_streams_every_product(self):
+        seed_catalog(5)
+        response = self.client.get(reverse('users:inventory_report_csv'))
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertIn('"Supplier 0, Supplier 1"', lines[2])
+
+    def test_inventory_csv_query_count_is_independent_of_rows(self):
+        seed_catalog(5)
+        response = self.client.get(reverse('users:inventory_report_csv'))
+        with self.assertNumQueries(2):
+            b"".join(response.streaming_content)
+        seed_catalog(40)
+        response = self.client.get(reverse('users:inventory_report_csv'))
+        with self.assertNumQueries(2):
+            b"".join(response.streaming_content)
+
+    def test_supplier_csv_streams_aggregates(self):
+        seed_catalog(3)
+        response = self.client.get(reverse('users:supplier_report_csv'))
+        self.assertTrue(response.streaming)
+        with self.assertNumQueries(1):
+            lines = b"".join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith("Supplier 0,s0@example.com,0500000000,3,"))
+
+
+class AsyncViewTests(TestCase):
+    """The read views under ASGI, where they run on the event loop."""
+
+    def setUp(self):
+        cache.clear()
+        seed_catalog(5)
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+
+    async def test_read_views_render_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        product = await Product.objects.order_by('id').afirst()
+        for url in (
+            reverse('users:product_list'), reverse('users:product_detail', args=[product.id]),
+            reverse('users:inventory_report'), reverse('users:supplier_report'), reverse('users:admin_dashboard'),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(reverse('users:inventory_report'))
+        self.assertEqual(response.context['total_low_stock'], 2)
+        self.assertEqual(len(response.context['low_stock_products']), 2)
+
+    async def test_missing_product_is_404(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('users:product_detail', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_csv_streams_asynchronously_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('users:inventory_report_csv'))
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        lines = body.decode().strip().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertIn('"Supplier 0, Supplier 1"', lines[2])
+
+    def test_csv_rows_match_across_chunks(self):
+        self.client.force_login(self.admin)
+        request = self.client.get(reverse('users:product_list')).wsgi_request
+        self.assertEqual(list(inventory_rows(request, chunk_size=2)), list(inventory_rows(request)))
+
+
+class ProductImportViewTests(TestCase):
+
+    def test_admin_can_upload_csv(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        admin = User.objects.create_superuser(username="admin", password="pass")
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile("products.csv", b"Product Name,Category,Quantity In Stock\nMilk,Dairy,20\n,Dairy,1\n")
+        response = self.client.post(reverse('users:import_products_csv'), {'csv_file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 1)
+        self.assertEqual(response.context['result'].errors, [(3, "Product name is required.")])
+
+    def test_upload_that_is_not_utf8_is_rejected(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+        upload = SimpleUploadedFile("products.csv", "Product Name,Category,Quantity In Stock\nMilk,Dairy,20\nCaf\xe9,Dairy,1\n".encode('cp1252'))
+        response = self.client.post(reverse('users:import_products_csv'), {'csv_file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'csv_file', "Line 3 is not UTF-8 text. Save the file as CSV UTF-8 and upload it again.")
+        self.assertFalse(Product.objects.exists())
+
+
+class ListAndReportQueryTests(QueryCountHarness, TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+
+    def test_list_views_queries_are_constant(self):
+        for name in ('product_list', 'category_list', 'supplier_list'):
+            with self.subTest(view=name):
+                self.assertConstantQueries(reverse(f'users:{name}'))
+
+    def test_report_views_queries_are_constant(self):
+        for name in ('admin_dashboard', 'inventory_report', 'supplier_report', 'inventory_report_csv', 'supplier_report_csv'):
+            with self.subTest(view=name):
+                self.assertConstantQueries(reverse(f'users:{name}'))
+
+
+class ExpiringReportTests(TestCase):
+
+    def test_report_pages_through_lots_by_expiry(self):
+        category = Category.objects.create(name="Dairy")
+        product = Product.objects.create(name="Milk", description="", category=category, quantity_in_stock=0)
+        today = timezone.localdate()
+        StockLot.objects.bulk_create([
+            StockLot(product=product, quantity=1, expiry_date=today + timedelta(days=i % 40)) for i in range(120)
+        ])
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse('users:expiring_report'), {'days': 10, **({'cursor': cursor} if cursor else {})})
+            lots = response.context['lots']
+            self.assertLessEqual(len(lots), 50)
+            seen += [lot.expiry_date for lot in lots]
+            if not lots.has_next():
+                break
+            cursor = lots.next_cursor
+        self.assertEqual(seen, sorted(today + timedelta(days=i % 40) for i in range(120) if i % 40 <= 10))
+
+    def test_inventory_report_expiring_soon_card_counts_every_lot(self):
+        category = Category.objects.create(name="Dairy")
+        product = Product.objects.create(name="Milk", description="", category=category, quantity_in_stock=0)
+        today = timezone.localdate()
+        StockLot.objects.bulk_create(
+            [StockLot(product=product, quantity=1, expiry_date=today + timedelta(days=i % 20)) for i in range(40)]
+            + [StockLot(product=product, quantity=1, expiry_date=today + timedelta(days=60))]
+        )
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+        response = self.client.get(reverse('users:inventory_report'))
+        # More than the report lists, so the card must show the count, not the page.
+        self.assertEqual(response.context['expiring_count'], 40)
+        self.assertContains(response, '<p class="card-text text-center text-dark fs-4">40</p>', html=True)
+
+
+class LowStockReportTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Dairy", reorder_level=5)
+        Product.objects.bulk_create([
+            Product(name=f"Low {i:02d}", description="", category=category, quantity_in_stock=i % 5, reorder_level=5)
+            for i in range(30)
+        ] + [Product(name="Plenty", description="", category=category, quantity_in_stock=50, reorder_level=5)])
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+
+    def test_inventory_report_lists_lowest_and_links_to_the_rest(self):
+        response = self.client.get(reverse('users:inventory_report'))
+        products = response.context['low_stock_products']
+        self.assertEqual(len(products), REPORT_LOW_STOCK_LIMIT)
+        self.assertEqual([p.quantity_in_stock for p in products], sorted(p.quantity_in_stock for p in products))
+        self.assertEqual(response.context['low_stock_count'], 30)
+        self.assertContains(response, f"Showing the {REPORT_LOW_STOCK_LIMIT} lowest of 30 low stock products.")
+        self.assertContains(response, reverse('users:product_list') + "?low_stock=1")
+
+    def test_product_list_filters_to_low_stock(self):
+        response = self.client.get(reverse('users:product_list'), {'low_stock': '1'})
+        self.assertEqual(response.context['products'].paginator.count, 30)
+        self.assertContains(response, "&low_stock=1")
+
+
+class ReorderReportTests(TestCase):
+
+    def test_inventory_report_lists_soonest_stockouts(self):
+        seed_catalog(6)
+        for name, used in (("Product 1", 5), ("Product 2", 10), ("Product 4", 1)):
+            product = Product.objects.get(name=name)
+            adjust_stock(product.id, -used)
+        refresh_forecasts()
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+        self.client.get(reverse('users:inventory_report'))
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('users:inventory_report'))
+        names = [forecast.product.name for forecast in response.context['reorder_suggestions']]
+        self.assertEqual(names, ["Product 2", "Product 1", "Product 4"])
+
+
+class ReportIndexUsageTests(TestCase):
+    """EXPLAIN the queries the report views actually run and check the indexes are used."""
+
+    def setUp(self):
+        cache.clear()
+        seed_catalog(20)
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+
+    def query_plans(self, url, marker):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                if marker in query['sql']:
+                    cursor.execute("EXPLAIN QUERY PLAN " + query['sql'])
+                    plans.append(" ".join(str(row[-1]) for row in cursor.fetchall()))
+        self.assertTrue(plans, f"no query containing {marker!r} was run")
+        return plans
+
+    def assertPlansUse(self, plans, index):
+        for plan in plans:
+            self.assertIn(index, plan)
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+    def test_low_stock_queries_use_partial_index(self):
+        # The dashboard's totals share one aggregate scan; its low-stock list must still seek the index.
+        for name, marker in (('inventory_report', '<= ("inventory_product"."reorder_level")'), ('admin_dashboard', '<= ("inventory_product"."reorder_level") ORDER BY')):
+            with self.subTest(view=name):
+                plans = self.query_plans(reverse(f'users:{name}'), marker)
+                self.assertPlansUse(plans, 'product_low_stock_idx')
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+    def test_expiring_queries_use_expiry_index(self):
+        for name in ('inventory_report', 'expiring_report'):
+            with self.subTest(view=name):
+                plans = self.query_plans(reverse(f'users:{name}'), '"inventory_stocklot"."expiry_date" <=')
+                self.assertPlansUse(plans, 'stocklot_expiry_idx')
+                self.assertNotIn('TEMP B-TREE', plans[0])
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+    def test_product_list_page_is_read_in_index_order(self):
+        plans = self.query_plans(reverse('users:product_list'), 'LIMIT 10')
+        self.assertPlansUse(plans, 'product_name_id_idx')
+        self.assertNotIn('TEMP B-TREE', plans[0])
+
+
+class AdminDashboardCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        seed_catalog(30)
+        self.client.force_login(User.objects.create_superuser(username="admin", password="pass"))
+        self.url = reverse('users:admin_dashboard')
+
+    def test_repeat_hits_are_served_from_cache(self):
+        self.client.get(self.url)
+        cache.delete('users:admin_dashboard')
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(self.url)
+        self.assertEqual(len(cold) - len(warm), 4)
+        self.assertEqual(response.context['total_products'], 30)
+
+    def test_low_stock_list_is_bounded(self):
+        Product.objects.update(quantity_in_stock=1)
+        rebuild_rollups()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_low_stock'], 30)
+        self.assertEqual(len(response.context['low_stock_items']), 20)
+
+    def test_writes_invalidate_cached_numbers(self):
+        self.client.get(self.url)
+        Category.objects.create(name="Frozen")
+        self.assertEqual(self.client.get(self.url).context['total_categories'], 3)
+
+        product = Product.objects.get(name="Product 1")
+        adjust_stock(product.id, -product.quantity_in_stock)
+        self.assertEqual(self.client.get(self.url).context['total_low_stock'], 11)
+
+        apply_stock_movements([{'product_id': product.id, 'quantity_change': 50}])
+        self.assertEqual(self.client.get(self.url).context['total_low_stock'], 10)
+
+    def test_stale_value_is_served_while_another_request_refreshes(self):
+        self.client.get(self.url)
+        Category.objects.create(name="Frozen")
+        cache.add('users:admin_dashboard:lock', 1)
+        self.assertEqual(self.client.get(self.url).context['total_categories'], 2)
+        cache.delete('users:admin_dashboard:lock')
+        self.assertEqual(self.client.get(self.url).context['total_categories'], 3)
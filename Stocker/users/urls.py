@@ -1,4 +1,5 @@
 from . import views
+from inventory import views as inventory_views
 from django.urls import path
 
 app_name = "users"
@@ -12,12 +13,12 @@ urlpatterns = [
 
 
     #Products
-    path('products/',views.product_list, name='product_list'),
-    path('products/add/', views.product_add, name='product_add'),
-    path('<int:product_id>/', views.product_detail, name='product_detail'),
-    path('<int:product_id>/edit/', views.product_update, name='product_update'),
-    path('products/<int:product_id>/delete/', views.product_delete, name='product_delete'),
-    path('<int:product_id>/update_stock/', views.update_stock, name='update_stock'),
+    path('products/',inventory_views.ProductListView.as_view(namespace=app_name, template_name='users/product_list.html'), name='product_list'),
+    path('products/add/', inventory_views.ProductAddView.as_view(namespace=app_name, template_name='users/add_product.html'), name='product_add'),
+    path('<int:product_id>/', inventory_views.ProductDetailView.as_view(namespace=app_name, template_name='users/detail_product.html'), name='product_detail'),
+    path('<int:product_id>/edit/', inventory_views.ProductUpdateView.as_view(namespace=app_name, template_name='users/update_product.html'), name='product_update'),
+    path('products/<int:product_id>/delete/', inventory_views.ProductDeleteView.as_view(namespace=app_name), name='product_delete'),
+    path('<int:product_id>/update_stock/', inventory_views.StockUpdateView.as_view(namespace=app_name, template_name='users/update_stock.html'), name='update_stock'),
 
     #Category
     path('category/',views.category_list, name='category_list'),
@@ -34,7 +35,9 @@ urlpatterns = [
     #Reports
     path('reports/inventory/', views.inventory_report , name='inventory_report'),
     path('reports/suppliers/', views.supplier_report , name='supplier_report'),
+    path('reports/expiring/', views.expiring_report , name='expiring_report'),
+    path('reports/profiling/', views.profiling_stats , name='profiling_stats'),
     path('reports/inventory/csv/',views.inventory_report_csv, name='inventory_report_csv'),
     path('reports/supplier/csv/',views.supplier_report_csv, name='supplier_report_csv'),
-    #path('reports/inventory/import/',views.import_products_csv, name='import_products_csv'),
+    path('reports/inventory/import/',views.import_products_csv, name='import_products_csv'),
 ]
@@ -1,18 +1,26 @@
 from django.shortcuts import render, redirect
-from django.http import HttpRequest, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.contrib.auth.models import User, Group
 from django.contrib.auth import authenticate, login as auth_login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test, permission_required
 from django.contrib import messages
-from inventory.models import Product, Category, Supplier, StockUpdate
-from inventory.forms import ProductForm, SupplierForm, CategoryForm
-from django.core.paginator import Paginator
+from inventory.models import Product, Category, Supplier, StockUpdate, CategoryStockRollup, ReorderForecast, StockLot
+from inventory.forms import SupplierForm, CategoryForm
+from inventory.pagination import CursorPaginator, paginate
+from inventory.caching import acached_for_versions, cached_for_versions
+from inventory.asyncutils import alist, arender
+from inventory.roles import has_group
+from inventory.routers import read_from_replica
+from inventory import profiling
 from django.db.models import Q, F ,Count, Sum
-from django.utils.timezone import now, timedelta
+from django.db.models.functions import Coalesce
 from django.core.mail import send_mail
-import csv
 from stocker import settings
 from .forms import ProductImportForm
+from .exports import stream_csv, inventory_rows, ainventory_rows, supplier_rows, asupplier_rows
+from inventory.importer import import_products_csv as import_products_csv_file
+import asyncio
 import json
 
 # Create your views here.
@@ -62,9 +70,9 @@ def login_view(request:HttpResponse):
         
         if user is not None:
             auth_login(request,user)
-            if user.groups.filter(name='Employee').exists():
+            if has_group(request, 'Employee'):
                 return redirect("inventory:product_list")
-            elif user.groups.filter(name='Admin').exists():
+            elif has_group(request, 'Admin'):
                 return redirect("users:admin_dashboard")
             else:
                 return redirect(request.GET.get("next","/"))
@@ -77,172 +85,85 @@ def log_out(request:HttpRequest):
     logout(request)
     return redirect("users:login")
 
-@login_required
-@user_passes_test(is_admin)
-def admin_dashboard(request:HttpRequest):
-    total_products = Product.objects.count()
-    total_categories = Category.objects.count()
-    total_suppliers = Supplier.objects.count()
-    low_stock_items = Product.objects.filter(quantity_in_stock__lte=5)
-    total_low_stock = low_stock_items.count()
-
-    category_data = Category.objects.annotate(product_count = Count('product'))
-    labels = json.dumps([cat.name for cat in category_data])
-    data = json.dumps([cat.product_count for cat in category_data])
-
-    supplier_data = Supplier.objects.annotate(product_count = Count('product'))
-    supplier_labels = json.dumps([sup.name for sup in supplier_data])
-    supplier_data_values = json.dumps([sup.product_count for sup in supplier_data])
-
-    context = {
-        "total_products": total_products,
-        "total_suppliers": total_suppliers,
-        "total_categories": total_categories,
-        "low_stock_items": low_stock_items,
-        "total_low_stock": total_low_stock,
-        'labels': labels,
-        "data": data,
-        'supplier_labels': supplier_labels,
-        "supplier_data_values": supplier_data_values,
+DASHBOARD_CACHE_KEY = 'users:admin_dashboard'
+DASHBOARD_CACHE_TIMEOUT = 300
+DASHBOARD_LOW_STOCK_LIMIT = 20
+REPORT_REORDER_LIMIT = 25
+REPORT_LOW_STOCK_LIMIT = 25
+REPORT_EXPIRING_LIMIT = 25
+EXPIRING_DEFAULT_DAYS = 30
+EXPIRING_MAX_DAYS = 365
+EXPIRING_PAGE_SIZE = 50
+
+def rollup_totals(**extra):
+    return {
+        'total_products': Coalesce(Sum('product_count'), 0),
+        'total_low_stock': Coalesce(Sum('low_stock_count'), 0),
+        **extra,
     }
 
-    return render(request, "users/admin_dashboard.html", context)
-
-
-@login_required
-@permission_required('inventory.change_product', raise_exception=True)
-def update_stock(request:HttpRequest, product_id:int):
-    product = Product.objects.get(pk = product_id)
-    if request.method == 'POST':
-        try:
-            quantity_change = int(request.POST.get('quantity_change'))
-        except:
-            messages.error(request,"Invaild quantity.")
-            return redirect('users:update_stock', product_id=product.id)
-        
-        old_quantity = product.quantity_in_stock
-        product.quantity_in_stock += quantity_change
-
-
-        if product.quantity_in_stock < 0 :
-            messages.error(request, "Resulting stock can't be negative.")
-            return redirect('users:update_stock', product_id=product.id)
-        
-        product.save()
-        
-        StockUpdate.objects.create(
-            product=product,
-            updated_by = request.user,
-            quantity_change = quantity_change,
-            note=request.POST.get('note','')
-        )
-        
-        if product.quantity_in_stock <= 5 and old_quantity > 5:
-            send_mail(
-                subject = f"Low Stock Alert: {product.name}",
-                message = f"{product.name} has only {product.quantity_in_stock} left in stock.",
-                from_email= settings.EMAIL_HOST_USER,
-                recipient_list = [settings.EMAIL_HOST_USER],
-                fail_silently = False,
-            )
 
+def dashboard_queries():
+    return (
+        Category.objects.with_rollup().values_list('name', 'product_count'),
+        Supplier.objects.with_rollup().values_list('name', 'product_count'),
+        Product.objects.low_stock().order_by('quantity_in_stock', 'id').values('id', 'name', 'quantity_in_stock')[:DASHBOARD_LOW_STOCK_LIMIT],
+    )
 
-        messages.success(request, "Stock updated successfully.")
-        return redirect('users:product_list')
-    return render(request, 'users/update_stock.html', {'product':product})
 
+def dashboard_stats():
+    # Totals and chart data come from the precomputed rollups, not the catalog.
+    totals = CategoryStockRollup.objects.aggregate(**rollup_totals())
+    category_data, supplier_data, low_stock_items = (list(queryset) for queryset in dashboard_queries())
+    return build_dashboard_stats(totals, category_data, supplier_data, low_stock_items)
 
 
-#Product
-@login_required
-def product_list(request:HttpRequest):
-    query = request.GET.get('q')
-    products = Product.objects.all()
-    category = request.GET.get('category')
-    supplier = request.GET.get('supplier')
-    if query:
-        products = products.filter(name__icontains=query)
-    if category:
-        products = products.filter(category__id=category)
-    if supplier:
-        products = products.filter(suppliers__id=supplier)
-    paginator = Paginator(products, 10)
-    page = request.GET.get('page')
-    products =  paginator.get_page(page)
-    context = {
-        "products": products,
-        "categories": Category.objects.all(),
-        "suppliers": Supplier.objects.all(),
+async def adashboard_stats():
+    """``dashboard_stats`` with the four reads issued together."""
+    totals, category_data, supplier_data, low_stock_items = await asyncio.gather(
+        CategoryStockRollup.objects.aaggregate(**rollup_totals()),
+        *(alist(queryset) for queryset in dashboard_queries()),
+    )
+    return build_dashboard_stats(totals, category_data, supplier_data, low_stock_items)
+
+
+def build_dashboard_stats(totals, category_data, supplier_data, low_stock_items):
+    return {
+        **totals,
+        'total_categories': len(category_data),
+        'total_suppliers': len(supplier_data),
+        'category_labels': [name for name, _ in category_data],
+        'category_counts': [count for _, count in category_data],
+        'supplier_labels': [name for name, _ in supplier_data],
+        'supplier_counts': [count for _, count in supplier_data],
+        'low_stock_items': low_stock_items,
     }
-    return render(request, 'users/product_list.html', context)
-
-
-@login_required
-@permission_required('inventory.add_product', raise_exception=True)
-def product_add(request:HttpRequest):
-    categories = Category.objects.all()
-    suppliers = Supplier.objects.all()
-    if request.method == "POST":
-        form = ProductForm(request.POST, request.FILES)
-        if form.is_valid():
-            if int(request.POST.get('quantity_in_stock')) <= 5:
-                messages.error(request, "Stock must be greater than 5 when adding or updating a product.")
-                return redirect('users:product_add')
-            form.save()
-            messages.success(request, "Product added successfully")
-            return redirect('users:product_list')
-    else:
-        form = ProductForm()
-    return render(request, 'users/add_product.html', {'form':form , 'categories':categories, 'suppliers':suppliers})
 
 
 @login_required
-def product_detail(request, product_id:int):
-    product = Product.objects.get(pk = product_id)
-    return render(request, 'users/detail_product.html', {'product':product})
-
-
-@login_required
-@permission_required('inventory.change_product', raise_exception=True)
-def product_update(request:HttpRequest, product_id:int):
-    product = Product.objects.get(pk = product_id)
-    if request.method == 'POST':
-        product.name = request.POST.get('name')
-        product.description = request.POST.get('description')
-        product.price = request.POST.get('price')
-        product.category_id = request.POST.get('category')
-        product.quantity_in_stock = request.POST.get('quantity_in_stock')
-        product.expiry_date = request.POST.get('expiry_date') or None
-
-        if 'image' in request.FILES:
-            product.image = request.FILES['image'] 
-        
-        if int(request.POST.get('quantity_in_stock')) <= 5:
-                messages.error(request, "Stock must be greater than 5 when adding or updating a product.")
-                return redirect('users:product_update', product_id = product.id)
-
-        product.save()
-        product.suppliers.set(request.POST.getlist('suppliers'))
+@user_passes_test(is_admin)
+@read_from_replica
+async def admin_dashboard(request:HttpRequest):
+    stats = await acached_for_versions(
+        DASHBOARD_CACHE_KEY,
+        ('product', 'category', 'supplier', 'stockupdate'),
+        adashboard_stats,
+        DASHBOARD_CACHE_TIMEOUT,
+    )
 
-        messages.success(request, "Product updated successfully.")
-        return redirect('users:product_list')
-    
     context = {
-        'product': product,
-        'category_choices': [(c.id, c.name) for c in Category.objects.all()],
-        'suppliers': Supplier.objects.all(),
+        "total_products": stats['total_products'],
+        "total_suppliers": stats['total_suppliers'],
+        "total_categories": stats['total_categories'],
+        "low_stock_items": stats['low_stock_items'],
+        "total_low_stock": stats['total_low_stock'],
+        'labels': json.dumps(stats['category_labels']),
+        "data": json.dumps(stats['category_counts']),
+        'supplier_labels': json.dumps(stats['supplier_labels']),
+        "supplier_data_values": json.dumps(stats['supplier_counts']),
     }
 
-    return render(request, 'users/update_product.html', context)
-
-@login_required
-@permission_required('inventory.delete_product', raise_exception=True)
-def product_delete(request:HttpRequest, product_id:int):
-    product = Product.objects.get(pk = product_id)
-    product.delete()
-    messages.success(request, "Product deleted successfully")
-    return redirect('users:product_list')
-
+    return await arender(request, "users/admin_dashboard.html", context)
 
 
 #Category
@@ -251,10 +172,8 @@ def category_list(request:HttpRequest):
     query = request.GET.get('q')
     categories = Category.objects.all()
     if query:
-        categories = categories.filter(name__icontains=query)
-    paginator = Paginator(categories, 10)
-    page = request.GET.get('page')
-    categories =  paginator.get_page(page)
+        categories = categories.search(query)
+    categories = paginate(request, categories, 10)
     return render(request, 'users/manage_category.html', {'categories':categories})
 
 
@@ -303,12 +222,8 @@ def supplier_list(request:HttpRequest):
     query = request.GET.get('q')
     suppliers = Supplier.objects.all()
     if query:
-        suppliers = suppliers.filter(
-            Q(name__icontains=query)
-        ).distinct()
-    paginator = Paginator(suppliers, 10)
-    page = request.GET.get('page')
-    suppliers =  paginator.get_page(page)
+        suppliers = suppliers.search(query)
+    suppliers = paginate(request, suppliers, 10)
     return render(request, 'users/manage_supplier.html', {'suppliers':suppliers})
 
 
@@ -353,67 +268,111 @@ def supplier_delete(request:HttpRequest, supplier_id:int):
 
 @login_required
 @user_passes_test(is_admin)
-def inventory_report(request:HttpRequest):
-    products = Product.objects.all()
-    total_products = products.count()
-    total_stock = products.aggregate(total=Sum('quantity_in_stock'))['total'] or 0
-    low_stock_products = products.filter(quantity_in_stock__lte=5)
-
-    soon = now().date() + timedelta(days=30)
+@read_from_replica
+async def inventory_report(request:HttpRequest):
+    expiring = StockLot.objects.expiring_within(EXPIRING_DEFAULT_DAYS)
+
+    # The lowest stock and the first lots by expiry; the filtered product list
+    # and the expiring report page through the rest.
+    low_stock_products = Product.objects.low_stock().select_related('category').order_by('quantity_in_stock', 'id')[:REPORT_LOW_STOCK_LIMIT]
+    expiring_lots = expiring.select_related('product__category').order_by('expiry_date', 'id')[:REPORT_EXPIRING_LIMIT]
+
+    # Soonest stockouts first; see the refresh_forecasts command.
+    reorder_suggestions = (
+        ReorderForecast.objects.filter(suggested_quantity__gt=0).select_related('product')
+        .order_by(F('days_to_stockout').asc(nulls_last=True), 'product_id')[:REPORT_REORDER_LIMIT]
+    )
 
-    expiring_products = products.filter(expiry_date__lte=soon, expiry_date__isnull=False)
+    totals, expiring_count, low_stock_count, low_stock_products, expiring_lots, reorder_suggestions = await asyncio.gather(
+        CategoryStockRollup.objects.aaggregate(**rollup_totals(total_stock = Coalesce(Sum('total_stock'), 0))),
+        expiring.acount(),
+        Product.objects.low_stock().acount(),
+        alist(low_stock_products),
+        alist(expiring_lots),
+        alist(reorder_suggestions),
+    )
 
     context = {
-        'total_products':total_products,
-        'total_stock':total_stock,
+        'total_products':totals['total_products'],
+        'total_stock':totals['total_stock'],
+        'total_low_stock':totals['total_low_stock'],
+        'expiring_count':expiring_count,
+        'low_stock_count':low_stock_count,
         'low_stock_products':low_stock_products,
-        'expiring_products':expiring_products,
+        'expiring_lots':expiring_lots,
+        'reorder_suggestions':reorder_suggestions,
     }
-    return render(request, 'reports/inventory_report.html', context)
+    return await arender(request, 'reports/inventory_report.html', context)
 
 
 @login_required
 @user_passes_test(is_admin)
-def supplier_report(request:HttpRequest):
-    suppliers = Supplier.objects.annotate(
-        product_count = Count('product'),
-        total_stock= Sum('product__quantity_in_stock')
-    )
+@read_from_replica
+async def supplier_report(request:HttpRequest):
+    suppliers = await alist(Supplier.objects.with_rollup())
 
     context = {
         'suppliers': suppliers,
     }
-    return render(request, 'reports/supplier_report.html', context)
+    return await arender(request, 'reports/supplier_report.html', context)
 
 
 @login_required
 @user_passes_test(is_admin)
-def inventory_report_csv(request:HttpRequest):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="inventory_report.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Product Name', 'Category', 'Suppliers' ,'Quantity In Stock', 'Expiry Date'])
-
-    products = Product.objects.all()
-    for p in products:
-        supplier_names = ", ".join([s.name for s in p.suppliers.all()])
-        product_image_url = request.build_absolute_uri(p.image.url) if p.image else ''
-        writer.writerow([p.name, p.category.name, supplier_names , p.quantity_in_stock, p.expiry_date or 'N/A', product_image_url])
-    return response
+@read_from_replica
+def expiring_report(request:HttpRequest):
+    try:
+        days = min(max(int(request.GET.get('days', EXPIRING_DEFAULT_DAYS)), 0), EXPIRING_MAX_DAYS)
+    except ValueError:
+        days = EXPIRING_DEFAULT_DAYS
+    lots = StockLot.objects.expiring_within(days).select_related('product__category')
+    page = CursorPaginator(lots, EXPIRING_PAGE_SIZE, ordering=('expiry_date', 'id')).get_page(request.GET.get('cursor'))
+    return render(request, 'reports/expiring_report.html', {'lots': page, 'days': days})
+
 
 @login_required
 @user_passes_test(is_admin)
-def supplier_report_csv(request:HttpRequest):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="supplier_report.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Supplier Name', 'Email', 'Phone', 'Products Supplied' ,'Total Stock', 'Logo URL'])
-
-    suppliers = Supplier.objects.annotate(
-        product_count = Count('product'),
-        total_stock = Sum('product__quantity_in_stock')
-    )
-    for s in suppliers:
-        logo_url = request.build_absolute_uri(s.logo.url) if s.logo else ''
-        writer.writerow([s.name, s.email or '', s.phone or '', s.product_count or 0, s.total_stock or 0, logo_url])
-    return response
\ No newline at end of file
+def profiling_stats(request:HttpRequest):
+    """p50/p95/p99 timings per URL name from this process; POST clears them."""
+    if request.method == 'POST':
+        profiling.stats.clear()
+    return JsonResponse({
+        'enabled': profiling.is_enabled(),
+        'window': profiling.stats.window,
+        'views': profiling.stats.summary(),
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+@read_from_replica
+async def inventory_report_csv(request:HttpRequest):
+    header = ['Product Name', 'Category', 'Suppliers' ,'Quantity In Stock', 'Expiry Date', 'Image URL']
+    # WSGI would buffer an async body whole, so only ASGI gets the async rows.
+    rows = ainventory_rows(request) if isinstance(request, ASGIRequest) else inventory_rows(request)
+    return stream_csv('inventory_report.csv', header, rows)
+
+@login_required
+@user_passes_test(is_admin)
+@read_from_replica
+async def supplier_report_csv(request:HttpRequest):
+    header = ['Supplier Name', 'Email', 'Phone', 'Products Supplied' ,'Total Stock', 'Logo URL']
+    rows = asupplier_rows(request) if isinstance(request, ASGIRequest) else supplier_rows(request)
+    return stream_csv('supplier_report.csv', header, rows)
+
+@login_required
+@user_passes_test(is_admin)
+@permission_required('inventory.add_product', raise_exception=True)
+def import_products_csv(request:HttpRequest):
+    result = None
+    if request.method == "POST":
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            result = import_products_csv_file(form.cleaned_data['csv_file'])
+            if result.processed:
+                messages.success(request, f"Imported {result.processed} products ({result.created} created, {result.updated} updated).")
+            if result.errors:
+                messages.error(request, f"{len(result.errors)} rows could not be imported.")
+    else:
+        form = ProductImportForm()
+    return render(request, 'users/import_products.html', {'form':form, 'result':result})